@@ -0,0 +1,333 @@
+import numpy as np
+
+import Solver
+
+
+AGENTS = "agents"
+
+# Поле боя (ширина, высота), дальность огня, скорость движения и шаг по времени
+FIELD = (1.0, 0.4)
+RANGE = 0.02
+SPEED = 1.0
+TAU = 0.01
+
+# Сколько раз стрелок выбирает случайную единицу в соседних клетках, прежде чем перебрать их все,
+# и сколько пар (стрелок, единица) перебирается за раз
+ATTEMPTS = 8
+PAIRS = 1 << 18
+
+
+class Grid:
+    """
+    Равномерная сетка для поиска соседей.
+
+    Сторона клетки равна дальности огня, так что все единицы в пределах дальности от точки лежат
+    в квадрате 3x3 клетки вокруг нее. Единицы упорядочены по номеру клетки: единицы одной клетки
+    занимают отрезок start[c]:start[c] + count[c] упорядоченных массивов. Вокруг поля - пустая рамка
+    в одну клетку, поэтому соседние клетки есть у всех клеток поля.
+
+    Сетки двух сторон на одном поле устроены одинаково, поэтому номера клеток единиц одной стороны
+    (cell) годятся для запросов к сетке другой. area[c] - площадь части поля, покрытой квадратом 3x3
+    вокруг клетки c.
+    """
+
+    __slots__ = ["size", "columns", "rows", "cell", "order", "count", "start", "bounds", "area", "x", "y"]
+
+    def __init__(self, x, y, size, width, height):
+        self.size = size
+        self.columns = int(np.ceil(width / size))
+        self.rows = int(np.ceil(height / size))
+
+        self.cell = self.locate(x, y)
+
+        # Номера клеток небольшие: устойчивая сортировка коротких целых - поразрядная, O(N)
+        cells = (self.columns + 2) * (self.rows + 2)
+        self.order = np.argsort(self.cell.astype(np.uint16 if cells <= 1 << 16 else np.int64), kind="stable")
+        self.count = np.bincount(self.cell, minlength=cells)
+        start = np.cumsum(self.count) - self.count
+
+        # Для каждой клетки поля - начала отрезков клеток квадрата 3x3 вокруг нее
+        # и накопленные числа единиц в этих клетках (bounds[c, -1] - всего единиц в квадрате)
+        block = (np.arange(-1, 2)[:, None] * (self.rows + 2) + np.arange(-1, 2)).ravel()
+        inner = (np.arange(1, self.columns + 1)[:, None] * (self.rows + 2) + np.arange(1, self.rows + 1)).ravel()
+        inner = inner[:, None] + block
+
+        self.start = np.zeros((cells, 9), dtype=np.int64)
+        self.start[inner[:, 4]] = start[inner]
+        self.bounds = np.zeros((cells, 10), dtype=np.int64)
+        self.bounds[inner[:, 4], 1:] = np.cumsum(self.count[inner], axis=1)
+
+        # Крайние клетки поля могут быть неполными, клетки рамки - нулевой площади
+        widths = np.minimum(size, width - size * np.arange(self.columns))
+        heights = np.minimum(size, height - size * np.arange(self.rows))
+        area = np.zeros(cells)
+        area[inner[:, 4]] = (widths[:, None] * heights).ravel()
+        self.area = np.zeros(cells)
+        self.area[inner[:, 4]] = area[inner].sum(axis=1)
+
+        self.x = x[self.order]
+        self.y = y[self.order]
+
+    def locate(self, x, y):
+        """Номера клеток, в которые попадают точки (x, y)"""
+
+        column = np.clip((x / self.size).astype(np.intp), 0, self.columns - 1) + 1
+        row = np.clip((y / self.size).astype(np.intp), 0, self.rows - 1) + 1
+
+        return column * (self.rows + 2) + row
+
+    def around(self, cell):
+        """Число единиц в квадратах 3x3 клетки вокруг клеток cell"""
+
+        return self.bounds[cell, -1]
+
+    def unit(self, c, r):
+        """Номер r-й единицы квадрата 3x3 вокруг клетки c в упорядоченных массивах"""
+
+        bounds = self.bounds[c]
+        k = (bounds[:, 1:-1] <= r[:, None]).sum(axis=1)
+
+        return self.start[c, k] + r - bounds[np.arange(len(c)), k]
+
+    def exhaustive(self, x, y, cell, random, radius):
+        """То же, что target, но перебором всех единиц квадратов 3x3"""
+
+        # Пары (точка, единица ее квадрата): отрезки девяти клеток каждой точки подряд
+        counts = (self.bounds[cell, 1:] - self.bounds[cell, :-1]).ravel()
+        offsets = np.cumsum(counts) - counts
+        index = np.repeat(self.start[cell].ravel() - offsets, counts) + np.arange(counts.sum())
+        owner = np.repeat(np.arange(len(x)), self.bounds[cell, -1])
+
+        dx = self.x[index] - x[owner]
+        dy = self.y[index] - y[owner]
+        hit = dx * dx + dy * dy <= radius * radius
+
+        # Случайная из единиц в пределах дальности каждой точки
+        owner, index = owner[hit], index[hit]
+        hits = np.bincount(owner, minlength=len(x))
+        found = np.flatnonzero(hits)
+
+        result = np.full(len(x), -1, dtype=np.intp)
+        choice = (np.cumsum(hits) - hits)[found] + random.integers(0, hits[found])
+        result[found] = self.order[index[choice]]
+
+        return result
+
+    def target(self, x, y, cell, random, radius, exact=None):
+        """
+        Для каждой точки (x, y) из клетки cell выбирает случайную единицу не дальше radius.
+
+        Возвращает номера единиц в исходных массивах, -1 - в пределах дальности никого нет.
+        Сначала до ATTEMPTS раз единица выбирается равновероятно среди единиц квадрата 3x3 и принимается,
+        если она в пределах дальности; для оставшихся точек, отмеченных exact (по умолчанию - всех),
+        перебираются все единицы квадрата, остальные получают -1. Перебор дорог: обычно у таких точек
+        в пределах дальности никого нет. Найденная цель равновероятна среди единиц в пределах дальности.
+        """
+
+        result = np.full(len(x), -1, dtype=np.intp)
+        pending = np.flatnonzero(self.bounds[cell, -1])
+
+        for _ in range(ATTEMPTS):
+            if not len(pending):
+                return result
+
+            index = self.unit(cell[pending], random.integers(0, self.bounds[cell[pending], -1]))
+            dx = self.x[index] - x[pending]
+            dy = self.y[index] - y[pending]
+
+            hit = dx * dx + dy * dy <= radius * radius
+            result[pending[hit]] = self.order[index[hit]]
+            pending = pending[~hit]
+
+        if exact is not None:
+            pending = pending[exact[pending]]
+
+        # Остальные точки - частями, чтобы пар (точка, единица ее квадрата) было не больше PAIRS за раз
+        sizes = self.bounds[cell[pending], -1]
+        total = np.cumsum(sizes)
+        first = 0
+        while first < len(pending):
+            last = max(int(np.searchsorted(total, total[first] - sizes[first] + PAIRS, side="right")), first + 1)
+            part = pending[first:last]
+            result[part] = self.exhaustive(x[part], y[part], cell[part], random, radius)
+            first = last
+
+        return result
+
+
+class Force:
+    """
+    Единицы одной стороны: координаты и полоса поля [left, right], в которой она развертывается.
+
+    Массивы не меняются после шага: каждый шаг создает новые, так что их можно показывать
+    из другого потока.
+    """
+
+    __slots__ = ["x", "y", "left", "right", "advance"]
+
+    def __init__(self, number, left, right, advance, height, random):
+        self.left = left
+        self.right = right
+        # Регулярные части наступают на противника, партизаны перемещаются случайно
+        self.advance = advance
+
+        self.x, self.y = self.deploy(number, height, random)
+
+    def deploy(self, number, height, random):
+        """Координаты number новых единиц в своей полосе поля"""
+
+        return (random.uniform(self.left, self.right, number).astype(np.float32),
+                random.uniform(0, height, number).astype(np.float32))
+
+    def __len__(self):
+        return len(self.x)
+
+
+class Simulation:
+    """
+    Бой отдельных единиц на поле FIELD.
+
+    Параметры те же, что у модели Ланчестера, но это скорости для одной единицы за единицу времени:
+    alpha - вероятность небоевых потерь, beta - вероятность поразить противника, если он есть
+    в пределах дальности range, gamma - число подкреплений. Для партизан (model = PARTISAN) огонь регулярной
+    армии неприцельный: вероятность поражения - beta2, умноженная на плотность партизан вокруг стрелка
+    (в квадрате 3x3 клетки сетки) и на площадь поля.
+
+    Стреляют только единицы, рядом с которыми есть противник, так что бой идет по линии соприкосновения
+    и в общем случае заканчивается позже, чем по уравнениям Ланчестера. Уравнениям он соответствует
+    в среднем, только когда каждая единица достает до всех единиц противника (range не меньше диагонали
+    поля) или когда стороны равномерно перемешаны по полю.
+
+    Все расчеты шага векторизованы по единицам; соседи ищутся по сетке Grid, так что шаг стоит
+    O(N log N) на сортировку единиц по клеткам и O(1) на каждый запрос.
+    """
+
+    __slots__ = ["model", "alpha", "beta", "gamma", "width", "height", "range", "speed", "tau", "random",
+                 "forces", "t"]
+
+    def __init__(self, x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, model=Solver.REGULAR, seed=None,
+                 **options):
+        self.model = model
+        self.alpha = alpha1, alpha2
+        self.beta = beta1, beta2
+        self.gamma = gamma1, gamma2
+
+        self.width, self.height = options.get("field", FIELD)
+        self.range = options.get("range", RANGE)
+        self.speed = options.get("speed", SPEED)
+        self.tau = options.get("tau", TAU)
+        self.random = np.random.default_rng(seed)
+
+        width = self.width
+        army2 = Force(int(y0), 0, width, False, self.height, self.random) if model == Solver.PARTISAN \
+            else Force(int(y0), 0.6 * width, width, True, self.height, self.random)
+
+        self.forces = Force(int(x0), 0, 0.4 * width, True, self.height, self.random), army2
+        self.t = 0.0
+
+    def counts(self):
+        return len(self.forces[0]), len(self.forces[1])
+
+    def over(self):
+        """Одна из сторон уничтожена"""
+
+        return 0 in self.counts()
+
+    def engage(self, force, own, grid, near, firing):
+        """
+        Для каждой единицы force - случайная цель в пределах дальности (номер в противнике или -1).
+
+        Стреляющим на этом шаге (firing) цель находится всегда, когда она есть (см. Grid.target);
+        остальным цель нужна только для того, чтобы остановиться, и ищется не больше ATTEMPTS раз.
+        """
+
+        targets = np.full(len(force), -1, dtype=np.intp)
+
+        # Цель ищется только у единиц, рядом с которыми есть противник
+        front = np.flatnonzero(near)
+        targets[front] = grid.target(force.x[front], force.y[front], own.cell[front], self.random, self.range,
+                                     firing[front])
+
+        return targets
+
+    def firing(self, grid, cell, near, rate, aimed):
+        """Какие стрелки из клеток cell стреляют на этом шаге (если у них есть цель)"""
+
+        if aimed:
+            probability = rate * self.tau
+        else:
+            # near / area - плотность противника вокруг стрелка: при равномерном размещении это N / (площадь поля)
+            probability = rate * self.tau * near * (self.width * self.height) / grid.area[cell]
+
+        return self.random.random(len(cell)) < probability
+
+    def move(self, force, engaged, enemy):
+        """Новые координаты: единицы, у которых нет цели, сдвигаются на speed * tau"""
+
+        step = self.speed * self.tau
+        free = ~engaged
+        moving = int(free.sum())
+        x, y = force.x.copy(), force.y.copy()
+
+        if force.advance and len(enemy):
+            x[free] += np.sign(enemy.x.mean() - x[free]) * step
+            y[free] += self.random.normal(0, step / 4, moving).astype(np.float32)
+        else:
+            x[free] += self.random.normal(0, step, moving).astype(np.float32)
+            y[free] += self.random.normal(0, step, moving).astype(np.float32)
+
+        return np.clip(x, 0, self.width), np.clip(y, 0, self.height)
+
+    def step(self):
+        """Один шаг tau: стрельба обеих сторон одновременно, потери, подкрепления и движение"""
+
+        force1, force2 = self.forces
+        grid1 = Grid(force1.x, force1.y, self.range, self.width, self.height)
+        grid2 = Grid(force2.x, force2.y, self.range, self.width, self.height)
+
+        near1 = grid2.around(grid1.cell)
+        near2 = grid1.around(grid2.cell)
+
+        # Партизаны стреляют прицельно, по партизанам - по площади
+        firing1 = self.firing(grid2, grid1.cell, near1, self.beta[1], self.model != Solver.PARTISAN)
+        firing2 = self.firing(grid1, grid2.cell, near2, self.beta[0], True)
+        targets1 = self.engage(force1, grid1, grid2, near1, firing1)
+        targets2 = self.engage(force2, grid2, grid1, near2, firing2)
+
+        # Номера пораженных единиц (с повторами)
+        hit1 = targets2[firing2 & (targets2 >= 0)]
+        hit2 = targets1[firing1 & (targets1 >= 0)]
+
+        positions = []
+        for i, (force, targets, hit, enemy) in enumerate(((force1, targets1, hit1, force2),
+                                                          (force2, targets2, hit2, force1))):
+            alive = self.random.random(len(force)) >= self.alpha[i] * self.tau
+            alive[hit] = False
+
+            x, y = self.move(force, targets >= 0, enemy)
+            x1, y1 = force.deploy(self.random.poisson(self.gamma[i] * self.tau), self.height, self.random)
+
+            positions.append((np.concatenate((x[alive], x1)), np.concatenate((y[alive], y1))))
+
+        (force1.x, force1.y), (force2.x, force2.y) = positions
+        self.t += self.tau
+
+    def run(self, horizon=Solver.HORIZON, trajectory=None):
+        """Считает бой до уничтожения одной из сторон или до момента horizon. Возвращает численности (x, y, t)"""
+
+        trajectory = trajectory if trajectory is not None else Solver.Trajectory()
+        trajectory.append(self.t, *self.counts())
+
+        while not trajectory.cancelled and not self.over() and self.t < horizon:
+            self.step()
+            trajectory.append(self.t, *self.counts())
+
+        return trajectory.result()
+
+
+def battle(parameters, model=Solver.REGULAR, seed=None, horizon=Solver.HORIZON, **options):
+    """Рассчитывает бой отдельных единиц с параметрами в порядке PARAMETERS и возвращает Battle"""
+
+    simulation = Simulation(*parameters, **dict(options, model=model, seed=seed))
+
+    return Solver.Battle(parameters, model, AGENTS, *simulation.run(horizon))
@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+# Окно не нужно: рисование идет в память
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+import Cache
+import GameGUI
+import Model
+import Solver
+
+
+# Сценарии в порядке PARAMETERS: короткий бой, долгий бой и бой с сильными подкреплениями
+SCENARIOS = {
+    "short": (100, 0, 1, 0, 80, 0, 1, 0),
+    "long": (1000, 0.01, 0.02, 0, 990, 0.01, 0.02, 0),
+    "reinforced": (1000, 0.1, 0.5, 200, 900, 0.1, 0.5, 250),
+}
+PARTISAN_SCENARIOS = {
+    "short": (100, 0, 1, 0, 80, 0, 0.01, 0),
+    "long": (1000, 0.01, 0.02, 0, 990, 0.01, 0.0002, 0),
+    "reinforced": (1000, 0.1, 0.5, 200, 900, 0.1, 0.005, 250),
+}
+
+POINTS = (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7)
+UNITS = (10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6)
+
+# Допустимое относительное замедление: медленнее в 1 + THRESHOLD раз и больше - регрессия
+THRESHOLD = 0.2
+
+
+def measure(function, repeat=5, budget=1.0):
+    """
+    Время одного вызова function: медиана и минимум по repeat замерам (в секундах).
+
+    Быстрые функции в каждом замере вызываются несколько раз подряд, так чтобы замер длился
+    порядка budget / repeat секунд; медленные - один раз, а замеров может быть меньше repeat.
+    """
+
+    start = time.perf_counter()
+    function()
+    once = time.perf_counter() - start
+
+    number = max(1, int(budget / repeat / max(once, 1e-9)))
+    repeat = max(1, min(repeat, int(budget / max(once * number, 1e-9))))
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter() - start) / number)
+
+    return {"median": float(np.median(times)), "min": float(np.min(times)), "repeat": repeat, "number": number}
+
+
+def bench_solvers(results, quick):
+    """ModelType.solveODE_1 и solveODE_2 всеми методами на всех сценариях"""
+
+    # Кэш без памяти и диска: каждый вызов считает бой заново
+    Cache.RESULTS = Cache.Cache(capacity=0)
+
+    for model, solve, scenarios in ((Solver.REGULAR, Model.ModelType.solveODE_1, SCENARIOS),
+                                    (Solver.PARTISAN, Model.ModelType.solveODE_2, PARTISAN_SCENARIOS)):
+        for name, parameters in scenarios.items():
+            for method in (Solver.EULER, Solver.ADAPTIVE, Solver.ANALYTIC):
+                options = {"method": method, "tau": 1e-4 if quick else 1e-5}
+                results["solve/%s/%s/%s" % (model, name, method)] = measure(lambda: solve(*parameters, **options))
+
+
+def bench_plots(results, quick, display):
+    """
+    Графики на кривых разной длины: построение Plot (прореживание точек и рисование на поверхность)
+    вместе с первым выводом на экран - так графики строятся в окне, - отдельно прореживание
+    и вывод уже построенного графика.
+    """
+
+    for n in POINTS[:-1] if quick else POINTS:
+        t = np.linspace(0, 10, n)
+        x, y = 100 * np.exp(-t / 3) + np.sin(50 * t), 80 * np.exp(-t / 2) + np.cos(30 * t)
+        options = {"plot_color": [GameGUI.BLUE, GameGUI.RED]}
+
+        def build():
+            GameGUI.Plot(display, 500, 200, 1000, 600, (t, x), (t, y), **options).draw()
+
+        results["plot/build/%d" % n] = measure(build)
+
+        plot = GameGUI.Plot(display, 500, 200, 1000, 600, (t, x), (t, y), **options)
+        results["plot/convert/%d" % n] = measure(lambda: plot.convert_coordinates_of_points([(t, x), (t, y)]))
+        results["plot/draw/%d" % n] = measure(plot.draw)
+
+
+def bench_armies(results, quick, display):
+    """Army.update (с перемещением солдат) и Army.draw при разной численности"""
+
+    for n in UNITS[:-1] if quick else UNITS:
+        for warrior in (Model.Soldier, Model.Partisan):
+            army = Model.Army(display, (0, 980, 200, 580), warrior.__name__, warrior(display, 0, 0, GameGUI.BLUE, 20),
+                              n, GameGUI.BLUE)
+
+            def update():
+                army.moved = None
+                army.update()
+
+            results["army/update/%s/%d" % (warrior.__name__, n)] = measure(update)
+            results["army/draw/%s/%d" % (warrior.__name__, n)] = measure(army.draw)
+
+
+def bench_frame(results, game):
+    """Полный кадр FightActionModel: первая отрисовка и перерисовка во время показа боя"""
+
+    parameters = SCENARIOS["short"]
+    battle = Solver.battle(parameters, Solver.REGULAR, Solver.EULER)
+    army1, army2 = Model.armies(game, Solver.REGULAR, parameters)
+    fight = Model.FightActionModel(game.display, game, 0, 0, GameGUI.GRAY, battle, army1, army2)
+
+    results["frame/fight/draw"] = measure(fight.draw)
+
+    def frame():
+        army1.moved = army2.moved = None
+        fight.update()
+        fight.redraw()
+
+    results["frame/fight/redraw"] = measure(frame)
+
+    fight.isPlot = True
+    results["frame/plots/draw"] = measure(fight.draw)
+
+
+def run(output, quick=False, only=None):
+    """Выполняет замеры (только те, в имени которых есть only) и записывает их в output в формате JSON"""
+
+    game = GameGUI.Game("Benchmark", 1000, 600)
+    results = {}
+
+    groups = (("solve", lambda: bench_solvers(results, quick)),
+              ("plot", lambda: bench_plots(results, quick, game.display)),
+              ("army", lambda: bench_armies(results, quick, game.display)),
+              ("frame", lambda: bench_frame(results, game)))
+
+    for name, bench in groups:
+        if only is None or only.startswith(name) or name.startswith(only):
+            bench()
+
+    if only is not None:
+        results = {name: value for name, value in results.items() if only in name}
+
+    for name, value in results.items():
+        print("%-40s %12.6f s" % (name, value["median"]))
+
+    report = {"python": sys.version.split()[0], "numpy": np.__version__, "pygame": pygame.version.ver,
+              "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "quick": quick,
+              "results": results}
+
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=1)
+
+
+def compare(baseline, current, threshold=THRESHOLD):
+    """
+    Сравнивает медианы замеров current с baseline. Возвращает имена замеров,
+    ставших медленнее больше чем в 1 + threshold раз.
+    """
+
+    with open(baseline, encoding="utf-8") as file:
+        before = json.load(file)["results"]
+    with open(current, encoding="utf-8") as file:
+        after = json.load(file)["results"]
+
+    regressions = []
+
+    for name in sorted(set(before) & set(after)):
+        ratio = after[name]["median"] / max(before[name]["median"], 1e-12)
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "РЕГРЕССИЯ"
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold):
+            flag = "быстрее"
+
+        print("%-40s %12.6f %12.6f %7.2fx %s" % (name, before[name]["median"], after[name]["median"], ratio, flag))
+
+    for name in sorted(set(before) ^ set(after)):
+        print("%-40s есть только в %s" % (name, baseline if name in before else current))
+
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры скорости решателей, графиков и отрисовки")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="выполнить замеры и записать их в JSON")
+    run_parser.add_argument("output", help="файл результатов .json")
+    run_parser.add_argument("--quick", action="store_true", help="меньшие размеры и более крупный шаг Эйлера")
+    run_parser.add_argument("--only", default=None, help="только замеры, в имени которых есть эта строка")
+
+    compare_parser = commands.add_parser("compare", help="сравнить результаты с сохраненной базой")
+    compare_parser.add_argument("baseline", help="база: результаты прошлых замеров")
+    compare_parser.add_argument("current", help="новые результаты")
+    compare_parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                                help="допустимое относительное замедление")
+
+    arguments = parser.parse_args()
+
+    if arguments.command == "run":
+        run(arguments.output, arguments.quick, arguments.only)
+    else:
+        regressions = compare(arguments.baseline, arguments.current, arguments.threshold)
+        if regressions:
+            print("Регрессий: %d" % len(regressions))
+            sys.exit(1)
@@ -0,0 +1,191 @@
+import hashlib
+import inspect
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import Solver
+import Store
+
+
+# Кэш посчитанных боев для окна программы: 256 МБ в памяти и до 1 ГБ в каталоге рядом с программой
+CAPACITY = 256 << 20
+DISK_CAPACITY = 1 << 30
+DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+
+# Аргументы, не влияющие на результат
+IGNORED = ("trajectory",)
+
+
+class Cache:
+    """
+    Кэш посчитанных боев (Solver.Battle).
+
+    Ключ - хэш модели, параметров и всех настроек функции расчета, включая значения по умолчанию,
+    и Solver.VERSION, так что при изменении решателя старые записи перестают находиться.
+    Первый уровень - в памяти: не больше capacity байт, при переполнении вытесняются давно
+    не использованные бои. Второй уровень (если задан directory) - файлы Store в каталоге: они переживают
+    перезапуск программы и открываются через numpy.memmap. Файлы занимают не больше disk_capacity байт:
+    после записи удаляются самые старые по времени изменения, а попадание обновляет это время.
+    Счетчики hits, disk_hits и misses показывают, как часто кэш помогает.
+    """
+
+    __slots__ = ["capacity", "directory", "disk_capacity", "entries", "size", "hits", "disk_hits", "misses",
+                 "evictions", "disk_evictions", "disk_size", "lock"]
+
+    def __init__(self, capacity=CAPACITY, directory=None, disk_capacity=DISK_CAPACITY):
+        self.capacity = capacity
+        self.directory = directory
+        self.disk_capacity = disk_capacity
+
+        # Ключ -> (бой, занимаемая им память); порядок - от давно использованных к недавним
+        self.entries = OrderedDict()
+        self.size = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        # Размер файлов в каталоге при последней записи
+        self.disk_size = 0
+
+        # Бои кладутся в кэш из потоков расчета
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(function, parameters, **settings):
+        """Ключ расчета function(*parameters, **settings)"""
+
+        bound = inspect.signature(function).bind(*(float(p) for p in parameters), **settings)
+        bound.apply_defaults()
+        arguments = {name: value for name, value in bound.arguments.items() if name not in IGNORED}
+
+        text = json.dumps([Solver.VERSION, function.__name__, arguments], sort_keys=True, default=str)
+
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+    @staticmethod
+    def footprint(battle):
+        """Память, которую занимает бой: столбцы, отображенные на файл, в памяти не лежат"""
+
+        return Store.HEADER + sum(column.nbytes for column in (battle.x, battle.y, battle.t)
+                                  if not isinstance(column, np.memmap))
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".run")
+
+    def get(self, key):
+        """Бой с ключом key или None"""
+
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+
+        if self.directory is not None and os.path.exists(self.path(key)):
+            try:
+                battle = Store.load(self.path(key))
+                os.utime(self.path(key))
+            except (OSError, ValueError):
+                battle = None
+
+            if battle is not None:
+                with self.lock:
+                    self.disk_hits += 1
+                    self.remember(key, battle)
+                return battle
+
+        with self.lock:
+            self.misses += 1
+
+        return None
+
+    def put(self, key, battle, settings=None):
+        """Запоминает бой; на диск он записывается вместе с настройками settings"""
+
+        if self.directory is not None:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                Store.save(self.path(key), battle, settings)
+                self.trim()
+            except OSError:
+                # Без второго уровня кэш все равно работает
+                pass
+
+        with self.lock:
+            self.remember(key, battle)
+
+    def trim(self):
+        """Удаляет самые старые файлы каталога, пока они занимают больше disk_capacity байт"""
+
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".run"):
+                try:
+                    status = entry.stat()
+                except OSError:
+                    # Файл удален другим потоком
+                    continue
+                files.append((status.st_mtime, status.st_size, entry.path))
+
+        files.sort()
+        size = sum(file[1] for file in files)
+
+        for _, file_size, path in files:
+            if size <= self.disk_capacity:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= file_size
+            with self.lock:
+                self.disk_evictions += 1
+
+        self.disk_size = size
+
+    def remember(self, key, battle):
+        """Кладет бой в память, вытесняя давно не использованные (вызывается под lock)"""
+
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[1]
+
+        size = self.footprint(battle)
+        if size > self.capacity:
+            return
+
+        self.entries[key] = battle, size
+        self.size += size
+
+        while self.size > self.capacity:
+            self.size -= self.entries.popitem(last=False)[1][1]
+            self.evictions += 1
+
+    def battle(self, parameters, model=Solver.REGULAR, method=Solver.METHOD, **options):
+        """Solver.battle через кэш"""
+
+        key = self.key(Solver.solve, parameters, **dict(options, model=model, method=method))
+
+        result = self.get(key)
+        if result is None:
+            result = Solver.battle(parameters, model, method, **options)
+            self.put(key, result, {name: value for name, value in options.items() if name not in IGNORED})
+
+        return result
+
+    def stats(self):
+        """Счетчики попаданий и промахов, занятая память и размер каталога при последней записи"""
+
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "evictions": self.evictions, "entries": len(self.entries), "bytes": self.size,
+                "disk_evictions": self.disk_evictions, "disk_bytes": self.disk_size}
+
+
+# Кэш, которым пользуется окно программы
+RESULTS = Cache(directory=DIRECTORY)
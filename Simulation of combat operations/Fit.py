@@ -0,0 +1,361 @@
+import argparse
+import csv
+import math
+
+import numpy as np
+
+import Solver
+
+
+# Шагов метода Рунге-Кутты 4-го порядка на весь отрезок наблюдений (не считая самих моментов наблюдений)
+STEPS = 400
+
+# Число стартовых точек и итераций метода Левенберга-Марквардта
+STARTS = 32
+ITERATIONS = 60
+
+
+def read_series(path):
+    """Читает наблюдения из CSV со столбцами t, N1, N2 (пустые значения - пропуски). Возвращает (t, N1, N2)"""
+
+    with open(path, newline="", encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+
+    def column(name):
+        return np.array([float(row[name]) if row.get(name, "").strip() else np.nan for row in rows])
+
+    return column("t"), column("N1"), column("N2")
+
+
+class Series:
+    """
+    Наблюдения численностей и сетка, на которой их воспроизводит integrate.
+
+    Сетка - моменты наблюдений, между которыми добавлены промежуточные узлы
+    так, чтобы шаг был не больше (последний момент) / STEPS.
+    """
+
+    __slots__ = ["t", "x", "y", "mask", "grid", "slot", "index"]
+
+    def __init__(self, t, x, y, steps=STEPS):
+        self.t = np.asarray(t, dtype=np.float64)
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        # Невязки считаются только по имеющимся значениям
+        self.mask = np.r_[np.isfinite(self.x), np.isfinite(self.y)]
+
+        times, self.index = np.unique(self.t, return_inverse=True)
+        nodes = np.r_[0.0, times[times > 0]]
+        limit = (nodes[-1] or 1) / steps
+
+        pieces = [np.linspace(a, b, max(int(np.ceil((b - a) / limit)), 1), endpoint=False)
+                  for a, b in zip(nodes[:-1], nodes[1:])]
+        self.grid = np.r_[np.concatenate(pieces) if pieces else np.empty(0), nodes[-1]]
+
+        # Для каждого узла сетки - номер момента наблюдения в times (или -1)
+        self.slot = np.full(len(self.grid), -1)
+        self.slot[np.searchsorted(self.grid, times)] = np.arange(len(times))
+
+    def observed(self):
+        """Наблюдения одним вектором (N1, затем N2) без пропусков"""
+
+        return np.r_[self.x, self.y][self.mask]
+
+    def __len__(self):
+        return int(self.mask.sum())
+
+
+def derivatives(Z, P, partisan, sensitivities):
+    """
+    Правая часть для всех кандидатов сразу: Z - состояния (2 или 18, M), P - параметры (M, 8).
+
+    Строки Z: x, y и, если sensitivities, производные x и y по каждому из восьми параметров
+    (уравнения чувствительности dS/dt = df/dz S + df/dp, решаемые вместе с самой системой).
+    """
+
+    x, y = Z[0], Z[1]
+    alpha1, beta1, gamma1, alpha2, beta2, gamma2 = P[:, 1], P[:, 2], P[:, 3], P[:, 5], P[:, 6], P[:, 7]
+    fire = x * y if partisan else x
+
+    dZ = np.empty_like(Z)
+    dZ[0] = -alpha1 * x - beta1 * y + gamma1
+    dZ[1] = -alpha2 * y - beta2 * fire + gamma2
+
+    if sensitivities:
+        Sx, Sy = Z[2:10], Z[10:18]
+        fire_x, fire_y = (y, x) if partisan else (1, 0)
+
+        dSx = dZ[2:10]
+        dSx[:] = -alpha1 * Sx - beta1 * Sy
+        dSx[1] -= x
+        dSx[2] -= y
+        dSx[3] += 1
+
+        dSy = dZ[10:18]
+        dSy[:] = -(alpha2 + beta2 * fire_y) * Sy - beta2 * fire_x * Sx
+        dSy[5] -= y
+        dSy[6] -= fire
+        dSy[7] += 1
+
+    return dZ
+
+
+def integrate(series, P, model, sensitivities=True):
+    """
+    Решает систему методом Рунге-Кутты 4-го порядка для всех строк P (M, 8) сразу.
+
+    Возвращает значения строк Z (см. derivatives) в моменты наблюдений: массив (моменты, 2 или 18, M).
+    Сторона, опустившаяся ниже нуля, не выбывает: уравнения просто продолжаются, и такой кандидат
+    получает большие невязки.
+    """
+
+    partisan = model == Solver.PARTISAN
+    m = len(P)
+
+    Z = np.zeros((18 if sensitivities else 2, m))
+    Z[0], Z[1] = P[:, 0], P[:, 4]
+    if sensitivities:
+        Z[2 + 0] = 1
+        Z[10 + 4] = 1
+
+    out = np.empty((int(series.slot.max()) + 1, len(Z), m))
+    if series.slot[0] >= 0:
+        out[series.slot[0]] = Z
+
+    with np.errstate(all="ignore"):
+        for i, h in enumerate(np.diff(series.grid), 1):
+            k1 = derivatives(Z, P, partisan, sensitivities)
+            k2 = derivatives(Z + h / 2 * k1, P, partisan, sensitivities)
+            k3 = derivatives(Z + h / 2 * k2, P, partisan, sensitivities)
+            k4 = derivatives(Z + h * k3, P, partisan, sensitivities)
+            Z = Z + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+
+            if series.slot[i] >= 0:
+                out[series.slot[i]] = Z
+
+    return out[series.index]
+
+
+def residuals(series, P, model, free=None):
+    """
+    Невязки (модель - наблюдения) для всех кандидатов: массив (M, число наблюдений).
+
+    Если задан free (маска свободных параметров), возвращает еще якобиан невязок по ним (M, наблюдения, свободные).
+    """
+
+    values = integrate(series, P, model, free is not None)
+    r = np.concatenate((values[:, 0], values[:, 1]))[series.mask].T - series.observed()
+    r[~np.isfinite(r)] = np.inf
+
+    if free is None:
+        return r
+
+    S = np.concatenate((values[:, 2:10], values[:, 10:18]))[series.mask]
+    J = S[:, free].transpose(2, 0, 1)
+
+    return r, np.nan_to_num(J)
+
+
+def cost(r):
+    with np.errstate(over="ignore", invalid="ignore"):
+        return np.where(np.isfinite(r).all(axis=1), (r * r).sum(axis=1), np.inf)
+
+
+def starts(series, model, number, initial, random):
+    """
+    Стартовые точки: initial (или оценка по наблюдениям) и number - 1 случайных точек вокруг нее.
+
+    Оценка по наблюдениям: N1(0), N2(0) - первые значения, beta - средняя скорость потерь, деленная
+    на численность стрелков (для партизан - на произведение численностей), alpha и gamma - нули.
+    Ненулевые параметры случайных точек умножаются на множители от e^-2 до e^2, нулевые получают
+    случайные значения порядка скорости потерь.
+    """
+
+    t = series.t
+    estimate, scale = np.zeros(8), np.ones(8)
+
+    for i, (own, enemy) in enumerate(((series.x, series.y), (series.y, series.x))):
+        fire = own * enemy if model == Solver.PARTISAN and i == 1 else enemy
+        valid = np.isfinite(own) & np.isfinite(fire)
+        first, last = np.flatnonzero(valid)[[0, -1]] if valid.any() else (0, 0)
+
+        drop = (own[first] - own[last]) / (t[last] - t[first]) if t[last] > t[first] else 0
+        size = np.mean(np.abs(own[valid])) if valid.any() else 1
+
+        estimate[4 * i] = own[first] if valid.any() else 1
+        estimate[4 * i + 2] = max(drop, 0) / max(np.mean(np.abs(fire[valid])) if valid.any() else 1, 1e-12)
+        scale[4 * i + 1:4 * i + 4] = abs(drop) / max(size, 1e-12), estimate[4 * i + 2], abs(drop)
+
+    initial = estimate if initial is None else np.asarray(initial, dtype=np.float64)
+    P = np.repeat(initial[None], number, axis=0)
+
+    rates = [1, 2, 3, 5, 6, 7]
+    shape = number - 1, len(rates)
+    P[1:, rates] = np.where(P[1:, rates] > 0, P[1:, rates] * np.exp(random.uniform(-2, 2, shape)),
+                            np.where(scale[rates] > 0, scale[rates], 1) * random.uniform(0, 0.5, shape))
+    P[1:, [0, 4]] *= np.exp(random.normal(0, 0.05, (number - 1, 2)))
+
+    return P
+
+
+def quantile(level, dof):
+    """Квантиль распределения Стьюдента с dof степенями свободы уровня (1 + level) / 2 (разложение Корниша-Фишера)"""
+
+    lo, hi = 0.0, 10.0
+    for _ in range(100):
+        z = (lo + hi) / 2
+        lo, hi = (z, hi) if math.erf(z / math.sqrt(2)) < level else (lo, z)
+
+    if dof <= 0:
+        return math.inf
+
+    return (z + (z ** 3 + z) / (4 * dof) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * dof ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * dof ** 3))
+
+
+class Fit:
+    """
+    Результат подбора параметров модели model по наблюдениям.
+
+    parameters - лучшие параметры в порядке Solver.PARAMETERS, residuals - невязки (модель - наблюдения)
+    для N1 и N2 в моменты наблюдений (nan на месте пропусков), errors - стандартные ошибки,
+    intervals - доверительные интервалы уровня level (у закрепленных параметров ошибка 0).
+    """
+
+    __slots__ = ["model", "parameters", "free", "cost", "residuals", "covariance", "errors", "intervals", "level",
+                 "candidates", "costs", "iterations"]
+
+    def __init__(self, model, parameters, free, cost, residuals, covariance, errors, intervals, level, candidates,
+                 costs, iterations):
+        self.model = model
+        self.parameters = parameters
+        self.free = free
+        self.cost = cost
+        self.residuals = residuals
+        self.covariance = covariance
+        self.errors = errors
+        self.intervals = intervals
+        self.level = level
+        self.candidates = candidates
+        self.costs = costs
+        self.iterations = iterations
+
+    def rmse(self):
+        """Среднеквадратичная невязка"""
+
+        return float(np.sqrt(np.nanmean(self.residuals ** 2)))
+
+    def battle(self, **options):
+        """Бой с найденными параметрами (см. Solver.battle)"""
+
+        return Solver.battle(self.parameters, self.model, **dict({"method": Solver.ADAPTIVE}, **options))
+
+
+def fit(t, x, y, model=Solver.REGULAR, fixed=(), initial=None, starts_number=STARTS, iterations=ITERATIONS,
+        seed=None, level=0.95, steps=STEPS):
+    """
+    Подбирает параметры модели model, при которых ее решение ближе всего (по сумме квадратов) к наблюдениям
+    N1 = x и N2 = y в моменты t. Возвращает Fit.
+
+    fixed - имена (из Solver.PARAMETERS) или номера параметров, которые не меняются (берутся из initial).
+    Метод Левенберга-Марквардта идет сразу из starts_number стартовых точек: на каждой итерации все кандидаты
+    решаются одним векторизованным расчетом, а якобиан невязок получается из уравнений чувствительности,
+    решаемых вместе с системой, а не конечными разностями. Параметры не опускаются ниже нуля.
+    """
+
+    series = Series(t, x, y, steps)
+    random = np.random.default_rng(seed)
+
+    free = np.ones(8, dtype=bool)
+    free[[Solver.PARAMETERS.index(p) if isinstance(p, str) else p for p in fixed]] = False
+
+    P = starts(series, model, max(starts_number, 1), initial, random)
+    # Закрепленные параметры у всех кандидатов - из начального приближения
+    P[:, ~free] = P[0, ~free]
+    r, J = residuals(series, P, model, free)
+    costs = cost(r)
+    damping = np.full(len(P), 1e-3)
+    previous, stall, done = costs.min(), 0, 0
+
+    for done in range(1, iterations + 1):
+        A = J.transpose(0, 2, 1) @ J
+        g = np.einsum("mkf,mk->mf", J, np.where(np.isfinite(r), r, 0))
+        diagonal = np.einsum("mff->mf", A)
+
+        with np.errstate(all="ignore"):
+            system = A + (damping[:, None] * diagonal + 1e-12 * (1 + diagonal))[:, :, None] * np.eye(free.sum())
+            step = np.linalg.solve(system, -g[:, :, None])[:, :, 0]
+
+        trial = P.copy()
+        trial[:, free] = np.maximum(P[:, free] + np.nan_to_num(step), 0)
+        trial_costs = cost(residuals(series, trial, model))
+
+        # Удачный шаг принимается и уменьшает затухание, неудачный - увеличивает
+        better = trial_costs < costs
+        damping = np.where(better, np.maximum(damping / 3, 1e-12), np.minimum(damping * 4, 1e12))
+
+        if better.any():
+            P[better], costs[better] = trial[better], trial_costs[better]
+            r[better], J[better] = residuals(series, P[better], model, free)
+
+        # Остановка, когда лучший кандидат несколько итераций подряд почти не улучшается
+        stall = stall + 1 if previous - costs.min() <= 1e-10 * costs.min() else 0
+        previous = costs.min()
+        if stall >= 5:
+            break
+
+    best = int(np.argmin(costs))
+    r_best, J_best = r[best], J[best]
+
+    dof = len(series) - int(free.sum())
+    variance = costs[best] / dof if dof > 0 else np.inf
+
+    covariance = np.zeros((8, 8))
+    covariance[np.ix_(free, free)] = variance * np.linalg.pinv(J_best.T @ J_best)
+    errors = np.sqrt(np.maximum(np.diag(covariance), 0))
+
+    half = quantile(level, dof) * errors
+    intervals = np.column_stack((P[best] - half, P[best] + half))
+
+    residual = np.full(2 * len(series.t), np.nan)
+    residual[series.mask] = r_best
+
+    return Fit(model, P[best].copy(), free, float(costs[best]), residual.reshape(2, -1).T, covariance, errors,
+               intervals, level, P, costs, done)
+
+
+def fit_models(t, x, y, models=(Solver.REGULAR, Solver.PARTISAN), **options):
+    """Подбирает параметры каждой модели (см. fit); результаты - от лучшей модели к худшей"""
+
+    return sorted((fit(t, x, y, model, **options) for model in models), key=lambda result: result.cost)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Подбор параметров модели Ланчестера по наблюдаемым численностям")
+    parser.add_argument("series", help="CSV со столбцами t, N1, N2")
+    parser.add_argument("--model", default="all", choices=(Solver.REGULAR, Solver.PARTISAN, "all"))
+    parser.add_argument("--fix", nargs="*", default=(), metavar="P",
+                        help="параметры, которые не подбираются: " + ", ".join(Solver.PARAMETERS))
+    parser.add_argument("--initial", type=float, nargs=8, default=None, metavar="P",
+                        help="начальное приближение (и значения закрепленных параметров)")
+    parser.add_argument("--starts", type=int, default=STARTS)
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--level", type=float, default=0.95, help="уровень доверительных интервалов")
+
+    arguments = parser.parse_args()
+
+    models = (Solver.REGULAR, Solver.PARTISAN) if arguments.model == "all" else (arguments.model,)
+    results = fit_models(*read_series(arguments.series), models,
+                         **{"fixed": arguments.fix, "initial": arguments.initial, "starts_number": arguments.starts,
+                            "iterations": arguments.iterations, "seed": arguments.seed, "level": arguments.level})
+
+    for result in results:
+        print("Модель %s: сумма квадратов невязок %.6g, среднеквадратичная невязка %.6g, итераций %d" %
+              (result.model, result.cost, result.rmse(), result.iterations))
+        for name, value, error, (low, high), free in zip(Solver.PARAMETERS, result.parameters, result.errors,
+                                                         result.intervals, result.free):
+            if free:
+                print("  %-7s %12.6g +- %-12.6g [%.6g, %.6g]" % (name, value, error, low, high))
+            else:
+                print("  %-7s %12.6g (закреплен)" % (name, value))
@@ -0,0 +1,484 @@
+import argparse
+import json
+
+import numpy as np
+
+import Solver
+
+
+def triplets(matrix, n):
+    """
+    Ненулевые элементы матрицы n x n тройкой массивов (строки, столбцы, значения).
+
+    matrix - плотная матрица (список списков или массив), тройка (строки, столбцы, значения)
+    или разреженная матрица с методом tocoo() (например, из scipy.sparse).
+    """
+
+    if hasattr(matrix, "tocoo"):
+        matrix = matrix.tocoo()
+        return matrix.row.astype(np.intp), matrix.col.astype(np.intp), np.asarray(matrix.data, dtype=np.float64)
+
+    if isinstance(matrix, tuple) and len(matrix) == 3:
+        row, column, values = (np.asarray(a) for a in matrix)
+        return row.astype(np.intp), column.astype(np.intp), values.astype(np.float64)
+
+    matrix = np.asarray(matrix, dtype=np.float64).reshape(n, n)
+    row, column = np.nonzero(matrix)
+
+    return row, column, matrix[row, column]
+
+
+class Fire:
+    """
+    Огонь сторон друг по другу: пары (row, column) с коэффициентом beta - сторона column уничтожает
+    сторону row со скоростью beta * N[column] (прицельный огонь, как у регулярных армий)
+    или beta * N[row] * N[column] (огонь по площади, как по партизанам).
+
+    Хранятся только ненулевые пары, так что огонь считается за O(число пар), а не O(n^2).
+    Если плотная матрица не намного больше списка пар, огонь сразу во многие моменты (см. split)
+    считается умножением на матрицы.
+    """
+
+    # Плотные матрицы строятся, если в них не больше max(DENSE, 4 * число пар) элементов
+    DENSE = 4096
+
+    __slots__ = ["n", "row", "column", "beta", "partisan", "matrices"]
+
+    def __init__(self, beta, partisan, n):
+        self.n = n
+        self.row, self.column, self.beta = triplets(beta, n)
+
+        # partisan - одно значение для всех пар или матрица в любом из видов, которые понимает triplets
+        if np.ndim(partisan) == 0 and not hasattr(partisan, "tocoo") and not isinstance(partisan, tuple):
+            self.partisan = np.full(len(self.row), bool(partisan))
+        else:
+            row, column, values = triplets(partisan, n)
+            keys = row[values != 0] * n + column[values != 0]
+            self.partisan = np.isin(self.row * n + self.column, keys)
+
+        # Транспонированные матрицы огня по площади и прицельного огня или None
+        self.matrices = None
+        if n * n <= max(self.DENSE, 4 * len(self.row)):
+            self.matrices = np.zeros((2, n, n))
+            np.add.at(self.matrices, (np.where(self.partisan, 0, 1), self.column, self.row), self.beta)
+
+    def __call__(self, N):
+        """Потери каждой стороны от огня противников за единицу времени"""
+
+        fire = self.beta * N[self.column]
+        fire = np.where(self.partisan, fire * N[self.row], fire)
+
+        return np.bincount(self.row, weights=fire, minlength=self.n)
+
+    def split(self, N):
+        """
+        Огонь при численностях N (k, n) сразу для k моментов двумя частями (k, n): коэффициент при N[row]
+        от огня по площади и потери от прицельного огня. Потери от всего огня - area * N + aimed.
+        Нужны плотные матрицы (matrices не None).
+        """
+
+        return N @ self.matrices[0], N @ self.matrices[1]
+
+
+class System:
+    """
+    Бой n сторон: dN/dt = -alpha * N - огонь противников (см. Fire) + gamma.
+
+    Стороны объединены в коалиции sides; уничтоженная сторона (N < 1) выбывает: ее численность
+    становится 0, подкрепления к ней больше не приходят. Бой заканчивается, когда остаются
+    стороны только одной коалиции.
+    """
+
+    __slots__ = ["N0", "alpha", "gamma", "fire", "sides", "coalitions"]
+
+    def __init__(self, N0, alpha, beta, gamma, partisan=False, sides=None):
+        self.N0 = np.asarray(N0, dtype=np.float64)
+        n = len(self.N0)
+
+        self.alpha = np.broadcast_to(np.asarray(alpha, dtype=np.float64), (n,))
+        self.gamma = np.broadcast_to(np.asarray(gamma, dtype=np.float64), (n,))
+        self.fire = Fire(beta, partisan, n)
+
+        # Номера коалиций (по умолчанию у каждой стороны своя) и они же подряд с 0
+        self.sides = np.arange(1, n + 1) if sides is None else np.asarray(sides)
+        self.coalitions = np.unique(self.sides, return_inverse=True)[1]
+
+    def __len__(self):
+        return len(self.N0)
+
+    def __call__(self, N, alive):
+        return np.where(alive, -self.alpha * N - self.fire(N) + self.gamma, 0)
+
+    def over(self, alive):
+        """Остались стороны не больше чем одной коалиции"""
+
+        return np.count_nonzero(np.bincount(self.coalitions[alive], minlength=1)) <= 1
+
+    def winner(self, alive):
+        """Номер оставшейся коалиции или 0"""
+
+        left = np.unique(self.sides[alive])
+
+        return left[0] if len(left) == 1 else 0
+
+
+class Battle:
+    """Ход боя n сторон: моменты t (k,) и численности N (k, n)"""
+
+    __slots__ = ["system", "method", "N", "t"]
+
+    def __init__(self, system, method, N, t):
+        self.system = system
+        self.method = method
+        self.N = N
+        self.t = t
+
+    @property
+    def end(self):
+        """Время окончания боя"""
+
+        return self.t[-1]
+
+    @property
+    def winner(self):
+        """Номер победившей коалиции или 0, если победителя нет"""
+
+        alive = self.N[-1] > 0
+
+        return self.system.winner(alive) if self.system.over(alive) else 0
+
+
+class Euler:
+    """
+    Схема Эйлера для n сторон блоками шагов (как Solver.PartisanEuler для двух).
+
+    Шаг - N[k+1] = a[k] N[k] + c[k], где a[k] = 1 - (alpha + огонь по площади) * tau и c[k] = (gamma -
+    прицельный огонь) * tau зависят только от численностей противников. Если они на блоке известны, каждая
+    сторона решается без цикла по шагам (накопленные произведения и суммы), поэтому численности всех сторон
+    уточняются итерациями по блоку, пока поправка не станет меньше допуска.
+    """
+
+    TOLERANCE = 1e-12
+    # Не больше стольких чисел в массивах блока (шаги x стороны)
+    SIZE = 1 << 22
+
+    __slots__ = ["system", "tau", "max_steps"]
+
+    def __init__(self, system, tau, max_steps=1 << 16):
+        self.system = system
+        self.tau = tau
+        self.max_steps = max(min(max_steps, self.SIZE // max(len(system), 1)), 1)
+
+    def steps(self, N, alive):
+        """
+        Подбирает длину блока так, чтобы итерации сходились за несколько проходов и блок не заходил
+        далеко за ожидаемое (по касательной) выбывание стороны: шаги после него все равно отбрасываются.
+        """
+
+        system, fire = self.system, self.system.fire
+
+        # Чувствительность потерь стороны row к численности column; оценка сверху ее спектрального радиуса
+        coupling = np.abs(fire.beta * np.where(fire.partisan, N[fire.row], 1)) * alive[fire.row] * alive[fire.column]
+        coupling = np.sqrt(np.bincount(fire.row, weights=coupling, minlength=len(N)).max(initial=0) *
+                           np.bincount(fire.column, weights=coupling, minlength=len(N)).max(initial=0))
+        decay = np.abs(system.alpha + fire.split(N[None])[0][0])[alive].max(initial=0)
+
+        d = system(N, alive)
+        falling = alive & (d < 0)
+        defeat = float(np.min((N[falling] - 1) / -d[falling], initial=np.inf))
+
+        duration = min(0.06 / max(coupling, 1e-12), 200 / max(decay, 1e-12), 1.2 * defeat)
+
+        return int(min(max(duration / self.tau, 4), self.max_steps))
+
+    def advance(self, N0, alive, steps):
+        """
+        Делает блок шагов из состояния N0 и возвращает численности (m, n) после каждого шага.
+
+        Если итерации не сходятся, блок укорачивается вдвое, так что m может быть меньше steps.
+        """
+
+        system, tau = self.system, self.tau
+        keep, rate = 1 - system.alpha * tau, system.gamma * tau
+
+        with np.errstate(all="ignore"):
+            while True:
+                if steps == 1:
+                    return (N0 + tau * system(N0, alive))[None]
+
+                # Начальное приближение - по касательной; before - численности перед каждым шагом
+                N = N0 + np.arange(1, steps + 1)[:, None] * tau * system(N0, alive)
+                before = np.empty_like(N)
+                previous = None
+
+                while True:
+                    before[0], before[1:] = N0, N[:-1]
+                    a, c = system.fire.split(before)
+                    a *= -tau
+                    a += keep
+                    c *= -tau
+                    c += rate
+
+                    # Рекуррента N[k+1] = a[k] N[k] + c[k]: N = pa * (N0 + cumsum(c / pa)), где pa = cumprod(a)
+                    np.cumprod(a, axis=0, out=a)
+                    np.divide(c, a, out=c)
+                    np.cumsum(c, axis=0, out=c)
+                    c += N0
+                    c *= a
+                    # Выбывшие стороны остаются на нуле
+                    c[:, ~alive] = 0
+
+                    # Значения после первого выбывания не нужны и на поправку не влияют
+                    defeat = (c[:, alive] < 1).any(axis=1)
+                    end = int(np.argmax(defeat)) + 1 if defeat.any() else steps
+                    np.subtract(c[:end], N[:end], out=before[:end])
+                    change = float(np.max(np.abs(before[:end], out=before[:end])))
+                    size = max(1.0, float(np.max(np.abs(N0))), float(np.max(np.abs(c[end - 1]))))
+                    scale = self.TOLERANCE * size
+
+                    N = c
+                    # Поправки убывают не медленнее геометрической прогрессии: следующая не больше change^2 / previous
+                    if change <= scale or previous is not None and change * change <= scale * previous:
+                        return N
+
+                    # Переставшие убывать поправки - это уже ошибки округления, если они малы, или расходимость
+                    if not np.isfinite(change) or previous is not None and change >= previous:
+                        if np.isfinite(change) and change <= 1e-6 * size:
+                            return N
+                        break
+
+                    previous = change
+
+                steps = max(steps // 2, 1)
+
+
+def stepwise(system, tau, step, horizon, steady):
+    """Метод Эйлера по одному шагу (сразу для всех сторон); ход боя сохраняется как в euler"""
+
+    last = int(np.ceil(horizon / tau - 1e-6)) if horizon < np.inf else None
+
+    alive = system.N0 >= 1
+    N = np.where(alive, system.N0, 0)
+    n, t, mark = 0, 0.0, 0
+    times, values = [t], [N]
+    over = system.over(alive)
+
+    while n != last and not over:
+        d = system(N, alive)
+        if (np.abs(d) <= steady * (1 + np.abs(N))).all():
+            break
+
+        # Время - номер шага, умноженный на tau, а не сумма шагов: иначе сетка step сползает
+        N = N + tau * d
+        n += 1
+        t = n * tau
+
+        # На большинстве шагов никто не выбывает: сначала проверяется только минимум
+        gone = N.min(initial=np.inf, where=alive) < 1
+        if gone:
+            alive = alive & (N >= 1)
+            N = np.where(alive, N, 0)
+            over = system.over(alive)
+
+        if gone or int(t / step) != mark:
+            mark = int(t / step)
+            times.append(t)
+            values.append(N)
+
+    if times[-1] != t:
+        times.append(t)
+        values.append(N)
+
+    return np.array(values), np.array(times)
+
+
+def euler(system, tau, step, horizon, steady):
+    """
+    Метод Эйлера с шагом tau (см. Euler); ход боя сохраняется на сетке с шагом step и в моменты выбывания сторон.
+
+    Бой останавливается в момент horizon или при равновесии - когда скорость изменения всех численностей
+    не больше steady * (1 + N). Если у огня нет плотных матриц (см. Fire), шаги делаются по одному (см. stepwise).
+    """
+
+    if system.fire.matrices is None:
+        return stepwise(system, tau, step, horizon, steady)
+
+    scheme = Euler(system, tau)
+    last = int(np.ceil(horizon / tau - 1e-6)) if horizon < np.inf else None
+
+    alive = system.N0 >= 1
+    N = np.where(alive, system.N0, 0)
+    n, mark = 0, 0
+    times, values = [np.zeros(1)], [N[None]]
+    over = system.over(alive)
+
+    while not over and n != last:
+        steps = scheme.steps(N, alive)
+        block = scheme.advance(N, alive, steps if last is None else min(steps, last - n))
+
+        # Равновесие перед шагом k - по приращению на этом шаге, выбывание - после шага k
+        before = np.vstack((N, block[:-1]))
+        calm = (np.abs(block - before) <= tau * steady * (1 + np.abs(before))).all(axis=1)
+        defeat = (block[:, alive] < 1).any(axis=1)
+        settled = int(np.argmax(calm)) if calm.any() else len(block)
+        end = int(np.argmax(defeat)) if defeat.any() else len(block)
+
+        stop, gone = settled <= end and settled < len(block), end < settled
+        block = block[:min(settled, end + 1)]
+        if gone:
+            alive = alive & (block[-1] >= 1)
+            block[-1] = np.where(alive, block[-1], 0)
+            over = system.over(alive)
+
+        if len(block):
+            index = n + np.arange(1, len(block) + 1)
+            marks = (index * tau / step).astype(np.int64)
+            keep = marks != np.r_[mark, marks[:-1]]
+            keep[-1] |= gone
+
+            times.append(index[keep] * tau)
+            values.append(block[keep])
+            n, mark, N = index[-1], marks[-1], block[-1]
+
+        if stop:
+            break
+
+    if times[-1][-1] != n * tau:
+        times.append(np.array([n * tau]))
+        values.append(N[None])
+
+    return np.concatenate(values), np.concatenate(times)
+
+
+def adaptive(system, rtol, atol, horizon, steady):
+    """
+    Метод Дормана-Принса 5(4) для всех сторон сразу: стадии - строки матрицы (7, n).
+
+    Момент выбывания стороны ищется как корень непрерывного продолжения шага (см. Solver.batch_crossing);
+    шаг обрывается на первом выбывании, и расчет продолжается уже без выбывшей стороны.
+    """
+
+    a = [np.array(row) for row in Solver.DOPRI_A]
+    b, e, p = np.array(Solver.DOPRI_B), np.array(Solver.DOPRI_E), np.array(Solver.DOPRI_P)
+
+    alive = system.N0 >= 1
+    N = np.where(alive, system.N0, 0)
+    t = 0.0
+    times, values = [t], [N]
+
+    k1 = system(N, alive)
+    h = 0.01 * (np.max(np.abs(N)) * rtol + atol) / (np.max(np.abs(k1)) * rtol + atol)
+
+    while t < horizon and not system.over(alive) and not np.all(np.abs(k1) <= steady * (1 + np.abs(N))):
+        h = min(h, horizon - t)
+
+        k = np.empty((7, len(N)))
+        k[0] = k1
+        for i, row in enumerate(a[1:], 1):
+            k[i] = system(N + h * (row @ k[:i]), alive)
+
+        z = N + h * (b @ k[:6])
+        k[6] = system(z, alive)
+
+        error = h * (e @ k) / (atol + rtol * np.maximum(np.abs(N), np.abs(z)))
+        error = np.sqrt(np.mean(error[alive] ** 2)) if alive.any() else 0.0
+
+        if error > 1:
+            h *= max(0.2, 0.9 * error ** -0.2)
+            continue
+
+        crossed = alive & (z < 1)
+        if crossed.any():
+            q = h * (p.T @ k)
+            theta = Solver.batch_crossing(N[crossed], q[:, crossed])
+            first = float(theta.min())
+
+            z = N + first * (q[0] + first * (q[1] + first * (q[2] + first * q[3])))
+            gone = alive & (z < 1)
+            gone[np.flatnonzero(crossed)[theta == first]] = True
+
+            alive = alive & ~gone
+            t += first * h
+            N = np.where(alive, z, 0)
+            k1 = system(N, alive)
+        else:
+            t += h
+            N = z
+            k1 = k[6]
+            h *= min(10, 0.9 * error ** -0.2) if error > 0 else 10
+
+        times.append(t)
+        values.append(N)
+
+    return np.array(values), np.array(times)
+
+
+def solve(N0, alpha, beta, gamma, partisan=False, sides=None, method=Solver.ADAPTIVE, tau=1e-4, step=1e-2,
+          rtol=1e-8, atol=1e-8, horizon=Solver.HORIZON, steady=Solver.STEADY):
+    """
+    Вычисляет ход боя n сторон и возвращает Battle.
+
+    N0, alpha, gamma - векторы длины n (alpha и gamma могут быть числами), beta - матрица n x n: beta[i, j] -
+    скорость, с которой сторона j уничтожает сторону i; partisan - для каких пар огонь по площади
+    (одно значение или матрица того же вида, что beta). Матрицы могут быть разреженными (см. triplets).
+    Методы: EULER (шаг tau, ход боя сохраняется через step) и ADAPTIVE (точность rtol, atol).
+    """
+
+    system = System(N0, alpha, beta, gamma, partisan, sides)
+
+    if method == Solver.EULER:
+        N, t = euler(system, tau, step, horizon, steady)
+    else:
+        N, t = adaptive(system, rtol, atol, horizon, steady)
+
+    return Battle(system, method, N, t)
+
+
+def pair(parameters, model=Solver.REGULAR):
+    """Бой двух армий с параметрами в порядке Solver.PARAMETERS в виде аргументов solve"""
+
+    x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2 = parameters
+
+    return {"N0": (x0, y0), "alpha": (alpha1, alpha2), "beta": ((0, beta1), (beta2, 0)),
+            "gamma": (gamma1, gamma2), "partisan": ((False, False), (model == Solver.PARTISAN, False)),
+            "sides": (1, 2)}
+
+
+def scenario(path):
+    """
+    Читает бой n сторон из JSON в виде аргументов solve.
+
+    Формат: {"N0": [...], "alpha": [...], "gamma": [...], "sides": [...],
+    "fire": [{"target": i, "shooter": j, "beta": b, "partisan": false}, ...]}; стороны нумеруются с 0.
+    """
+
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+
+    fire = data.get("fire", [])
+    row = np.array([item["target"] for item in fire], dtype=np.intp)
+    column = np.array([item["shooter"] for item in fire], dtype=np.intp)
+
+    return {"N0": data["N0"], "alpha": data.get("alpha", 0), "gamma": data.get("gamma", 0),
+            "beta": (row, column, np.array([item["beta"] for item in fire], dtype=np.float64)),
+            "partisan": (row, column, np.array([item.get("partisan", False) for item in fire], dtype=np.float64)),
+            "sides": data.get("sides")}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бой многих сторон, объединенных в коалиции")
+    parser.add_argument("scenario", help="JSON: N0, alpha, gamma, sides и список пар fire (см. scenario)")
+    parser.add_argument("--method", default=Solver.ADAPTIVE, choices=(Solver.EULER, Solver.ADAPTIVE))
+    parser.add_argument("--tau", type=float, default=1e-4, help="шаг метода Эйлера")
+    parser.add_argument("--horizon", type=float, default=Solver.HORIZON)
+
+    arguments = parser.parse_args()
+
+    battle = solve(**scenario(arguments.scenario), **{"method": arguments.method, "tau": arguments.tau,
+                                                       "horizon": arguments.horizon})
+
+    print("Время окончания: %.6g, победила коалиция: %s" % (battle.end, battle.winner or "никто"))
+    for side in np.unique(battle.system.sides):
+        forces = battle.system.sides == side
+        print("Коалиция %s: сторон %d, осталось %d, численность %.6g" %
+              (side, forces.sum(), np.count_nonzero(battle.N[-1][forces]), battle.N[-1][forces].sum()))
@@ -1,5 +1,11 @@
+import csv
+import json
+import numpy as np
+import os
 import pygame
+import time
 from abc import ABC, abstractmethod
+from collections import deque
 
 
 WHITE = (255, 255, 255)
@@ -10,6 +16,20 @@ RED = (255, 0, 0)
 GRAY = (128, 128, 128)
 
 
+# Общий кэш шрифтов: загрузка шрифта - самая дорогая часть создания надписи
+FONTS = {}
+
+
+def font(type=None, size=30):
+    """Шрифт с данными типом и размером (загружается один раз)"""
+
+    key = type, size
+    if key not in FONTS:
+        FONTS[key] = pygame.font.Font(type, size)
+
+    return FONTS[key]
+
+
 def set_background(display, background_image=None, background_color=None):
     """Устанавливает фоновую картинку при наличии, иначе - просто окрашивает в заданный цвет"""
 
@@ -20,6 +40,26 @@ def set_background(display, background_image=None, background_color=None):
         display.fill(background_color)
 
 
+def refresh(display, background_color, *objects):
+    """
+    Перерисовывает изменившиеся объекты поверх фона background_color, стирая их прежнее изображение.
+
+    Возвращает прямоугольники, которые нужно обновить на экране.
+    """
+
+    rects = []
+    for o in objects:
+        if not o.changed():
+            continue
+
+        old = o.area()
+        display.fill(background_color, old)
+        o.draw()
+        rects.append(old.union(o.area()))
+
+    return rects
+
+
 class GameObject(ABC):
     """Базовый класс для объектов, которые будут отображаться на экране"""
 
@@ -39,11 +79,52 @@ class GameObject(ABC):
     def draw(self):
         """Отображает данный объект на экране"""
 
+    def close(self):
+        """Вызывается, когда объект убирают с экрана"""
+
+    def area(self):
+        """Прямоугольник, занятый объектом на экране при последней отрисовке"""
+
+        return self.display.get_rect()
+
+    def changed(self):
+        """Отличается ли объект от того, каким был нарисован в последний раз"""
+
+        return True
+
+    def redraw(self):
+        """
+        Перерисовывает то, что изменилось с прошлого кадра, и возвращает список измененных прямоугольников.
+
+        None означает, что изменился весь экран; так по умолчанию объект просто рисуется заново.
+        """
+
+        self.draw()
+
+    def animating(self):
+        """Меняется ли объект сам по себе; если нет, кадры рисуются только по событиям"""
+
+        return False
+
+    def widgets(self):
+        """Объекты, которые откликаются на мышь (см. point, press, drag)"""
+
+        return []
+
+    def point(self, inside):
+        """Курсор мыши зашел на объект (inside) или ушел с него"""
+
+    def press(self, position):
+        """Нажатие левой кнопки мыши в точке position"""
+
+    def drag(self, position):
+        """Перемещение мыши с нажатой кнопкой, начатое на этом объекте"""
+
 
 class Text(GameObject):
     """Для отображения текста на экране"""
 
-    __slots__ = ["message", "color", "size", "type", "smoothing"]
+    __slots__ = ["message", "color", "size", "type", "smoothing", "image", "rendered", "drawn"]
 
     def __init__(self, display, x, y, message, **kwargs):
         super().__init__(display, x, y)
@@ -52,20 +133,46 @@ class Text(GameObject):
 
         self.color = kwargs.get("color", BLACK)
         self.size = kwargs.get("size", 30)
-        self.type = pygame.font.Font(kwargs.get("type", None), self.size)
+        self.type = font(kwargs.get("type", None), self.size)
         self.smoothing = kwargs.get("smoothing", True)
 
+        # Отрисованная надпись и то, с чем она отрисована: пока они не меняются, надпись не перерисовывается
+        self.image = None
+        self.rendered = None
+        self.drawn = None
+
     def update(self):
         super().update()
 
+    def render(self):
+        """Отрисованная надпись (из кэша, если message, color и smoothing не менялись)"""
+
+        key = self.message, self.color, self.smoothing
+        if key != self.rendered:
+            self.image = self.type.render(self.message, self.smoothing, self.color)
+            self.rendered = key
+
+        return self.image
+
     def draw(self):
-        self.display.blit(self.type.render(self.message, self.smoothing, self.color), (self.x, self.y))
+        self.display.blit(self.render(), (self.x, self.y))
+        self.drawn = self.rendered, self.x, self.y
+
+    def area(self):
+        if self.drawn is None:
+            return pygame.Rect(self.x, self.y, 0, 0)
+
+        return self.image.get_rect(topleft=self.drawn[1:])
+
+    def changed(self):
+        return self.drawn != ((self.message, self.color, self.smoothing), self.x, self.y)
 
 
 class NumberCell(GameObject):
     """Для ввода цифр с клавиатуры"""
 
-    __slots__ = ["width", "height", "number", "title", "inactive_color", "active_color", "font_size", "game"]
+    __slots__ = ["width", "height", "number", "title", "inactive_color", "active_color", "font_size", "game",
+                 "drawn"]
 
     def __init__(self, display, x, y, width, height, title, game, **kwargs):
         super().__init__(display, x, y)
@@ -80,6 +187,7 @@ class NumberCell(GameObject):
 
         self.title = Text(display, x + 10, y + 10, title, **{"size": self.font_size}) if title else None
         self.number = Text(display, x + 10, y + 60, "", **{"size": self.font_size})
+        self.drawn = None
 
     def update(self):
         if self.game.inputting_symbol:
@@ -100,6 +208,19 @@ class NumberCell(GameObject):
         else:
             pygame.draw.rect(self.display, self.inactive_color, (self.x, self.y + 50, self.width, self.height))
 
+        self.drawn = self.state()
+
+    def state(self):
+        return self.title.message if self.title else None, self.number.message
+
+    def area(self):
+        area = pygame.Rect(self.x, self.y + 50, self.width, self.height).union(self.number.area())
+
+        return area.union(self.title.area()) if self.title else area
+
+    def changed(self):
+        return self.drawn != self.state()
+
 
 class Rectangle(GameObject):
     """Прямоугольник"""
@@ -116,6 +237,9 @@ class Rectangle(GameObject):
     def draw(self):
         pygame.draw.rect(self.display, self.color, (self.x, self.y, self.width, self.height))
 
+    def area(self):
+        return pygame.Rect(self.x, self.y, self.width, self.height)
+
     def update(self):
         super().update()
 
@@ -134,6 +258,9 @@ class Circle(GameObject):
     def draw(self):
         pygame.draw.circle(self.display, self.color, (self.x, self.y), self.radius)
 
+    def area(self):
+        return pygame.Rect(self.x - self.radius, self.y - self.radius, 2 * self.radius, 2 * self.radius)
+
     def update(self):
         super().update()
 
@@ -141,7 +268,8 @@ class Circle(GameObject):
 class Button(GameObject):
     """Кнопка"""
 
-    __slots__ = ["width", "height", "action", "message", "font_size", "active_color", "inactive_color", "step"]
+    __slots__ = ["width", "height", "action", "message", "font_size", "active_color", "inactive_color", "step",
+                 "text", "hover", "drawn"]
 
     def __init__(self, display, x, y, width, height, message, action=None, **kwargs):
         super().__init__(display, x, y)
@@ -156,20 +284,109 @@ class Button(GameObject):
         self.inactive_color = kwargs.get("inactive_color", GREEN)
         self.step = kwargs.get("step", 10)
 
+        self.text = Text(display, x + self.step, y + 10, message, **{"font_size": self.font_size})
+
+        # Находится ли над кнопкой курсор (задает Game) и с каким состоянием кнопка нарисована
+        self.hover = False
+        self.drawn = None
+
     def draw(self):
-        mouse = pygame.mouse.get_pos()
-        click = pygame.mouse.get_pressed()
+        color = self.active_color if self.hover else self.inactive_color
+        pygame.draw.rect(self.display, color, (self.x, self.y, self.width, self.height))
 
-        if self.x < mouse[0] < self.x + self.width and self.y < mouse[1] < self.y + self.height:
-            pygame.draw.rect(self.display, self.active_color, (self.x, self.y, self.width, self.height))
+        # Кнопку могут передвинуть (Menu) или сменить ее надпись
+        self.text.x, self.text.y, self.text.message = self.x + self.step, self.y + 10, self.message
+        self.text.draw()
 
-            if click[0]:
-                if self.action:
-                    self.action()
-        else:
-            pygame.draw.rect(self.display, self.inactive_color, (self.x, self.y, self.width, self.height))
+        self.drawn = self.hover, self.message, self.x, self.y
+
+    def area(self):
+        return pygame.Rect(self.x, self.y, self.width, self.height).union(self.text.area())
+
+    def changed(self):
+        return self.drawn != (self.hover, self.message, self.x, self.y)
 
-        Text(self.display, self.x + self.step, self.y + 10, self.message, **{"font_size": self.font_size}).draw()
+    def point(self, inside):
+        self.hover = inside
+
+    def press(self, position):
+        if self.action:
+            self.action()
+
+    def update(self):
+        super().update()
+
+
+class Slider(GameObject):
+    """Полоса прокрутки: положение value от 0 до 1 задается нажатием или перетаскиванием мышью"""
+
+    __slots__ = ["width", "height", "value", "action", "color", "fill_color", "knob_color", "drawn"]
+
+    def __init__(self, display, x, y, width, height, action=None, **kwargs):
+        super().__init__(display, x, y)
+
+        self.width = width
+        self.height = height
+        self.action = action
+
+        self.value = kwargs.get("value", 0)
+        self.color = kwargs.get("color", WHITE)
+        self.fill_color = kwargs.get("fill_color", GREEN)
+        self.knob_color = kwargs.get("knob_color", BLACK)
+        self.drawn = None
+
+    def draw(self):
+        position = self.x + int(self.width * min(max(self.value, 0), 1))
+        self.drawn = position
+
+        pygame.draw.rect(self.display, self.color, (self.x, self.y, self.width, self.height))
+        pygame.draw.rect(self.display, self.fill_color, (self.x, self.y, position - self.x, self.height))
+        pygame.draw.rect(self.display, self.knob_color, (position - 3, self.y - 4, 6, self.height + 8))
+
+    def area(self):
+        return pygame.Rect(self.x - 3, self.y - 4, self.width + 6, self.height + 8)
+
+    def changed(self):
+        return self.drawn != self.x + int(self.width * min(max(self.value, 0), 1))
+
+    def press(self, position):
+        self.value = min(max((position[0] - self.x) / self.width, 0), 1)
+
+        if self.action:
+            self.action(self.value)
+
+    def drag(self, position):
+        self.press(position)
+
+    def update(self):
+        super().update()
+
+
+class Picture(GameObject):
+    """Готовая картинка (pygame.Surface); нажатие на нее передается в action точкой относительно картинки"""
+
+    __slots__ = ["surface", "action", "drawn"]
+
+    def __init__(self, display, x, y, surface, action=None):
+        super().__init__(display, x, y)
+
+        self.surface = surface
+        self.action = action
+        self.drawn = None
+
+    def draw(self):
+        self.display.blit(self.surface, (self.x, self.y))
+        self.drawn = self.surface
+
+    def area(self):
+        return self.surface.get_rect(topleft=(self.x, self.y))
+
+    def changed(self):
+        return self.drawn is not self.surface
+
+    def press(self, position):
+        if self.action:
+            self.action((position[0] - self.x, position[1] - self.y))
 
     def update(self):
         super().update()
@@ -199,6 +416,17 @@ class Menu(GameObject):
             button.y = self.y + (self.interval + button.height) * i
             button.draw()
 
+    def redraw(self):
+        if self.background_image:
+            self.draw()
+            return None
+
+        # Фон не меняется, меняется только подсветка кнопок
+        return refresh(self.display, self.background_color, *self.items)
+
+    def widgets(self):
+        return list(self.items)
+
     def update(self):
         super().update()
 
@@ -221,10 +449,20 @@ class ListOfGameObjects:
 
 
 class Plot(GameObject):
-    """Выводит графики на экран"""
+    """
+    Выводит графики на экран.
+
+    Графики - массивы формы (n, 2), пары одномерных массивов (x, y) или любые итерируемые наборы точек.
+    Оси и кривые рисуются один раз на отдельной поверхности, которая затем только копируется на экран.
+    Перед рисованием точки, попавшие подряд в один столбец пикселей, заменяются первой, последней
+    и двумя крайними по высоте, так что на кривую приходится порядка нескольких точек на пиксель ширины.
+    Массивы обрабатываются частями по CHUNK точек, так что их можно брать прямо из файла (numpy.memmap).
+    """
+
+    CHUNK = 1 << 20
 
     __slots__ = ["center", "width", "height", "axes_color", "plot_color", "scale_x", "scale_y",
-                 "thickness", "label_x", "label_y", "plots"]
+                 "thickness", "label_x", "label_y", "plots", "rect", "surface"]
 
     def __init__(self, display, x, y, width, height, *plots, **kwargs):
         super().__init__(display, x+20, y+20)
@@ -241,85 +479,363 @@ class Plot(GameObject):
 
         self.plots = self.convert_coordinates_of_points(plots)
 
-    def draw_axes(self):
+        self.rect = pygame.Rect(x, y, width - x, height - y)
+        self.surface = self.render()
+
+    def draw_axes(self, surface):
         """Рисует оси координат"""
 
-        pygame.draw.line(self.display, self.axes_color, (self.x, self.center[1]), (self.width, self.center[1]))
-        pygame.draw.line(self.display, self.axes_color, (self.center[0], self.y), (self.center[0], self.height))
+        pygame.draw.line(surface, self.axes_color, (self.x, self.center[1]), (self.width, self.center[1]))
+        pygame.draw.line(surface, self.axes_color, (self.center[0], self.y), (self.center[0], self.height))
 
-        Text(self.display, self.width-20, self.height + 15, self.label_x, **{"color": self.axes_color, "size":25}).draw()
+        Text(surface, self.width-20, self.height + 15, self.label_x, **{"color": self.axes_color, "size": 25}).draw()
 
-        Text(self.display, self.x+15, self.y-20, self.label_y, **{"color": self.axes_color, "size":25}).draw()
+        Text(surface, self.x+15, self.y-20, self.label_y, **{"color": self.axes_color, "size": 25}).draw()
 
         size_bar = 10
         axes_scale = 50
 
         for x in range(self.center[0], self.width, axes_scale):
-            pygame.draw.line(self.display, self.axes_color, (x, self.center[1] - size_bar),
+            pygame.draw.line(surface, self.axes_color, (x, self.center[1] - size_bar),
                              (x, self.center[1] + size_bar))
 
         for x in range(self.center[0], self.x, -axes_scale):
-            pygame.draw.line(self.display, self.axes_color, (x, self.center[1] - size_bar),
+            pygame.draw.line(surface, self.axes_color, (x, self.center[1] - size_bar),
                              (x, self.center[1] + size_bar))
 
         for y in range(self.center[1], self.height, axes_scale):
-            pygame.draw.line(self.display, self.axes_color, (self.center[0] - size_bar, y),
+            pygame.draw.line(surface, self.axes_color, (self.center[0] - size_bar, y),
                              (self.center[0] + size_bar, y))
 
         for y in range(self.center[1], self.y, -axes_scale):
-            pygame.draw.line(self.display, self.axes_color, (self.center[0] - size_bar, y),
+            pygame.draw.line(surface, self.axes_color, (self.center[0] - size_bar, y),
                              (self.center[0] + size_bar, y))
 
     def legend(self):
         pass
 
+    @staticmethod
+    def downsample(x, y):
+        """Оставляет в каждой серии подряд идущих точек с одним x первую, наименьшую, наибольшую и последнюю"""
+
+        if len(x) <= 4:
+            return x, y
+
+        starts = np.flatnonzero(np.r_[True, x[1:] != x[:-1]])
+        ends = np.r_[starts[1:], len(x)] - 1
+
+        x = np.repeat(x[starts], 4)
+        y = np.column_stack((y[starts], np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts),
+                             y[ends])).ravel()
+
+        # Повторяющиеся подряд точки не нужны
+        keep = np.r_[True, (x[1:] != x[:-1]) | (y[1:] != y[:-1])]
+
+        return x[keep], y[keep]
+
+    @staticmethod
+    def columns(plot):
+        """Координаты точек графика двумя одномерными массивами (x, y)"""
+
+        if isinstance(plot, tuple) and len(plot) == 2 and all(isinstance(c, np.ndarray) and c.ndim == 1
+                                                              for c in plot):
+            return plot
+
+        if not isinstance(plot, np.ndarray):
+            plot = np.array(list(plot), dtype=np.float64).reshape(-1, 2)
+
+        return plot[:, 0], plot[:, 1]
+
+    def maximum(self, values):
+        """Наибольшее значение массива (0 для пустого), найденное по частям"""
+
+        return max((float(np.max(values[start:start + self.CHUNK])) for start in range(0, len(values), self.CHUNK)),
+                   default=0)
+
     def convert_coordinates_of_points(self, plots):
         """Пересчитывает реальные координаты в координаты на дисплее"""
 
-        scale_x = 0
-        scale_y = 0
+        plots = [self.columns(plot) for plot in plots]
 
-        for plot in plots:
-            temp1 = max(list(map(lambda t: t[0], plot)))
-            temp2 = max(list(map(lambda t: t[1], plot)))
+        scale_x = max(max(self.maximum(x), 0) for x, y in plots)
+        scale_y = max(max(self.maximum(y), 0) for x, y in plots)
 
-            if temp1 > scale_x:
-                scale_x = temp1
+        scale_x = (scale_x or 1) / (self.width-self.center[0])
+        scale_y = (scale_y or 1) / (self.height-self.y)
 
-            if temp2 > scale_y:
-                scale_y = temp2
+        converted = []
+        for x, y in plots:
+            # Точки одного столбца пикселей могут попасть в соседние части: части прореживаются еще раз вместе
+            parts = [self.downsample((self.center[0] + x[start:start + self.CHUNK] / scale_x).astype(int),
+                                     (self.center[1] - y[start:start + self.CHUNK] / scale_y).astype(int))
+                     for start in range(0, len(x), self.CHUNK)]
 
-        scale_x /= (self.width-self.center[0])
-        scale_y /= (self.height-self.y)
+            x, y = self.downsample(np.concatenate([part[0] for part in parts] or [np.empty(0, int)]),
+                                   np.concatenate([part[1] for part in parts] or [np.empty(0, int)]))
+            converted.append(np.column_stack((x, y)).tolist())
 
-        return [[(int(self.center[0] + x / scale_x), int(self.center[1] - y / scale_y))
-                 for x, y in plot]
-                for plot in plots]
+        return converted
 
-    def draw_points(self):
+    def draw_points(self, surface):
         """Рисует графики"""
 
         while len(self.plots) != len(self.plot_color):
             self.plot_color.append(self.plot_color[0])
 
         for plot, color in zip(self.plots, self.plot_color):
-            pygame.draw.lines(self.display, color, False, plot, self.thickness)
+            if len(plot) > 1:
+                pygame.draw.lines(surface, color, False, plot, self.thickness)
+
+    def render(self):
+        """Рисует оси и графики на прозрачной поверхности размером с область графика"""
+
+        surface = pygame.Surface(self.display.get_size(), pygame.SRCALPHA)
+
+        self.draw_axes(surface)
+        self.draw_points(surface)
+
+        return surface.subsurface(self.rect.clip(surface.get_rect())).copy()
 
     def draw(self):
-        self.draw_axes()
-        self.draw_points()
+        self.display.blit(self.surface, self.rect.topleft)
+
+    def area(self):
+        return self.rect.copy()
 
     def update(self):
         super().update()
 
 
+class Grid:
+    """
+    Равномерная сетка для поиска объекта под курсором.
+
+    Объект заносится во все клетки, которые задевает его прямоугольник, так что при поиске
+    проверяются только объекты одной клетки.
+    """
+
+    __slots__ = ["size", "cells"]
+
+    def __init__(self, objects, size=64):
+        self.size = size
+        self.cells = {}
+
+        for o in objects:
+            area = o.area()
+            for i in range(area.left // size, (area.right - 1) // size + 1):
+                for j in range(area.top // size, (area.bottom - 1) // size + 1):
+                    self.cells.setdefault((i, j), []).append(o)
+
+    def find(self, position):
+        """Объект, содержащий точку position (добавленный последним), или None"""
+
+        x, y = position
+        for o in reversed(self.cells.get((x // self.size, y // self.size), ())):
+            if o.area().collidepoint(position):
+                return o
+
+        return None
+
+
+class Profiler:
+    """
+    Замеры кадров: время фаз кадра, время update, draw и redraw каждого класса GameObject
+    и число созданных за кадр надписей и фигур.
+
+    Пока профилировщик включен, методы классов подменены обертками с замером времени (время вложенных
+    вызовов входит во время внешних); при выключении (uninstall) исходные методы возвращаются,
+    так что выключенный профилировщик ничего не стоит. Последние FRAMES кадров хранятся в памяти,
+    раз в DUMP кадров они записываются в path (.json или .csv), если он задан.
+    stats - функция без аргументов, возвращающая словарь счетчиков (например, Cache.stats): они выводятся
+    в сводке строкой под временем кадра.
+    """
+
+    FRAMES = 300
+    DUMP = 60
+    METHODS = ("update", "draw", "redraw")
+    COUNTED = ("Text", "Rectangle", "Circle", "Plot")
+
+    __slots__ = ["frames", "frame", "originals", "path", "stats", "visible", "rect"]
+
+    def __init__(self, path=None, stats=None):
+        # Замеры прошлых кадров и текущего: имя -> секунды (или число созданных объектов)
+        self.frames = deque(maxlen=self.FRAMES)
+        self.frame = {}
+        self.originals = []
+
+        self.path = path
+        self.stats = stats
+        self.visible = True
+        self.rect = None
+
+        self.install()
+
+    @staticmethod
+    def classes():
+        """GameObject и все его подклассы"""
+
+        found = [GameObject]
+        for cls in found:
+            found.extend(sub for sub in cls.__subclasses__() if sub not in found)
+
+        return found
+
+    def add(self, name, value):
+        self.frame[name] = self.frame.get(name, 0) + value
+
+    def timed(self, name, method):
+        """Обертка метода, добавляющая время его выполнения к замеру name"""
+
+        add = self.add
+        clock = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                add(name, clock() - start)
+
+        return wrapper
+
+    def counted(self, name, method):
+        """Обертка конструктора, считающая созданные объекты"""
+
+        add = self.add
+
+        def wrapper(*args, **kwargs):
+            add(name, 1)
+            method(*args, **kwargs)
+
+        return wrapper
+
+    def install(self):
+        for cls in self.classes():
+            # Только собственные методы класса: унаследованные уже обернуты в базовом классе
+            for method in self.METHODS:
+                if method in cls.__dict__:
+                    self.originals.append((cls, method, cls.__dict__[method]))
+                    setattr(cls, method, self.timed("%s.%s" % (cls.__name__, method), cls.__dict__[method]))
+
+            if cls.__name__ in self.COUNTED:
+                self.originals.append((cls, "__init__", cls.__dict__["__init__"]))
+                setattr(cls, "__init__", self.counted("new " + cls.__name__, cls.__dict__["__init__"]))
+
+    def uninstall(self):
+        for cls, method, original in reversed(self.originals):
+            setattr(cls, method, original)
+        self.originals = []
+
+    def phase(self, name, function, *args):
+        """Выполняет фазу кадра, замеряя ее время"""
+
+        start = time.perf_counter()
+        result = function(*args)
+        self.add("phase " + name, time.perf_counter() - start)
+
+        return result
+
+    def step(self, game):
+        """Кадр игры (см. Game.step) с замерами"""
+
+        events = self.phase("wait", game.wait)
+        start = time.perf_counter()
+
+        self.phase("events", game.handle_event, events)
+        self.phase("update", game.update)
+        rects = self.phase("draw", game.draw)
+
+        if self.visible:
+            self.rect = self.draw(game.display)
+            if rects is not None:
+                rects.append(self.rect)
+
+        self.phase("display", game.show, rects)
+
+        self.frame["frame"] = time.perf_counter() - start
+        self.frames.append(self.frame)
+        self.frame = {}
+
+        if self.path is not None and len(self.frames) % self.DUMP == 0:
+            self.dump()
+
+    def percentiles(self, q=(50, 95, 99)):
+        """Процентили времени кадра без ожидания (в секундах)"""
+
+        return np.percentile([frame["frame"] for frame in self.frames], q) if self.frames else np.zeros(len(q))
+
+    def summary(self):
+        """Средние по сохраненным кадрам значения замеров, по убыванию"""
+
+        total = {}
+        for frame in self.frames:
+            for name, value in frame.items():
+                total[name] = total.get(name, 0) + value
+
+        return sorted(((name, value / len(self.frames)) for name, value in total.items()), key=lambda item: -item[1])
+
+    def draw(self, display):
+        """Рисует сводку в левом верхнем углу экрана. Возвращает занятый ею прямоугольник"""
+
+        p50, p95, p99 = self.percentiles() * 1000
+        lines = ["кадр: p50 %.2f  p95 %.2f  p99 %.2f мс" % (p50, p95, p99)]
+        if self.stats is not None:
+            lines.append("  ".join("%s %s" % item for item in self.stats().items()))
+        for name, value in self.summary():
+            if name != "frame" and name != "phase wait":
+                lines.append("%s: %.2f" % (name, value) if name.startswith("new ") else
+                             "%s: %.3f мс" % (name, value * 1000))
+
+        text = font(None, 20)
+        images = [text.render(line, True, WHITE) for line in lines[:16]]
+        width = max(image.get_width() for image in images) + 10
+        rect = pygame.Rect(0, 0, width, 18 * len(images) + 6)
+
+        display.fill(BLACK, rect)
+        for i, image in enumerate(images):
+            display.blit(image, (5, 4 + 18 * i))
+
+        # Сводка может стать уже, чем в прошлом кадре: выводится и прежний прямоугольник
+        rect = rect.union(self.rect) if self.rect is not None else rect
+        self.rect = rect
+
+        return rect
+
+    def dump(self):
+        """Записывает сохраненные кадры в path: JSON - списком словарей, CSV - столбцом на замер"""
+
+        frames = list(self.frames)
+
+        with open(self.path + ".tmp", "w", newline="", encoding="utf-8") as file:
+            if self.path.endswith(".csv"):
+                names = sorted({name for frame in frames for name in frame})
+                writer = csv.DictWriter(file, names, restval=0)
+                writer.writeheader()
+                writer.writerows(frames)
+            else:
+                json.dump(frames, file)
+
+        os.replace(self.path + ".tmp", self.path)
+
+
 class Game:
-    """Создает новую 'игру'"""
+    """
+    Создает новую 'игру'.
+
+    Пока показанный объект не анимирован (см. GameObject.animating), цикл ждет событий и не расходует процессор.
+    События мыши передаются объектам из GameObject.widgets, найденным по сетке Grid.
+    Клавиша PROFILE включает и выключает профилировщик (см. Profiler) со сводкой поверх экрана и счетчиками
+    stats; если задан profile - путь к файлу замеров, - профилировщик включен с самого начала.
+    """
+
+    IDLE = 500
+    PROFILE = pygame.K_F3
 
     __slots__ = ["objects", "game_over", "game_pause", "display", "clock", "display_width", "display_height",
-                 "inputting_symbol"]
+                 "inputting_symbol", "fps", "frame_time", "shown", "index", "hovered", "pressed", "profiler",
+                 "profile", "stats"]
 
-    def __init__(self, capital, display_width, display_height):
+    def __init__(self, capital, display_width, display_height, fps=60, profile=None, stats=None):
         self.objects = []
         pygame.init()
         self.display = pygame.display.set_mode((display_width, display_height))
@@ -328,11 +844,25 @@ class Game:
         self.display_width = display_width
         self.display_height = display_height
 
+        # Частота кадров, длительность последнего кадра (мс) и объект, который был показан в прошлом кадре
+        self.fps = fps
+        self.frame_time = 0
+        self.shown = None
+
+        # Сетка объектов, откликающихся на мышь, объект под курсором и объект, на котором нажата кнопка мыши
+        self.index = None
+        self.hovered = None
+        self.pressed = None
+
         self.inputting_symbol = None
 
         self.game_over = False
         self.game_pause = False
 
+        self.profile = profile
+        self.stats = stats
+        self.profiler = Profiler(profile, stats) if profile is not None else None
+
     def update(self):
         """Обновление объектов"""
 
@@ -340,41 +870,147 @@ class Game:
             o.update()
 
     def draw(self):
-        """Отображение объектов на экране"""
+        """
+        Отображение объектов на экране.
+
+        Возвращает прямоугольники, которые изменились (None - весь экран): новый объект рисуется целиком,
+        а у показанного в прошлом кадре перерисовываются только изменившиеся части.
+        """
+
+        if not self.objects:
+            return []
+
+        top = self.objects[-1]
+
+        if self.game_pause or top is not self.shown:
+            if self.game_pause:
+                self.display.fill(BLACK)
+
+            self.shown = top
+            top.draw()
+            self.reindex()
+            return None
+
+        rects = top.redraw()
+        if rects is None:
+            self.reindex()
+
+        return rects
+
+    def reindex(self):
+        """Строит сетку объектов показанного экрана (после его полной отрисовки)"""
+
+        self.index = Grid(self.shown.widgets())
+        self.pressed = None
+
+        if self.point_at(pygame.mouse.get_pos()):
+            self.shown.redraw()
+
+    def point_at(self, position):
+        """Отмечает объект под курсором. Возвращает True, если он сменился"""
 
-        if self.game_pause:
-            self.display.fill(BLACK)
+        current = self.objects and self.objects[-1] is self.shown and self.index is not None
+        target = self.index.find(position) if current else None
 
-        if self.objects:
-            self.objects[-1].draw()
+        if target is self.hovered:
+            return False
 
-    def handle_event(self):
-        """Обработка нажатий на клавиши"""
+        if self.hovered is not None:
+            self.hovered.point(False)
+        if target is not None:
+            target.point(True)
+        self.hovered = target
 
-        for event in pygame.event.get():
+        return True
+
+    def handle_event(self, events=None):
+        """Обработка нажатий на клавиши и событий мыши"""
+
+        for event in pygame.event.get() if events is None else events:
 
             if event.type == pygame.QUIT:
                 pygame.quit()
                 quit()
 
+            if event.type == pygame.MOUSEMOTION:
+                self.point_at(event.pos)
+
+                if self.pressed is not None and event.buttons[0]:
+                    self.pressed.drag(event.pos)
+
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                self.point_at(event.pos)
+
+                self.pressed = self.hovered
+                if self.pressed is not None:
+                    self.pressed.press(event.pos)
+
+            if event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                self.pressed = None
+
             if event.type == pygame.KEYDOWN:
+                # Клавиши за кадр могут прийти пачкой: предыдущая должна быть обработана до следующей
+                if self.inputting_symbol is not None:
+                    self.update()
+
                 if event.key == pygame.K_ESCAPE:
                     if len(self.objects) > 1:
-                        self.objects.pop()
+                        self.objects.pop().close()
 
                 if event.key == pygame.K_SPACE:
                     self.game_pause = True
 
+                if event.key == self.PROFILE:
+                    self.toggle_profiler()
+
                 self.inputting_symbol = event.key
 
-    def run(self):
-        """Цикл работы игры"""
+    def toggle_profiler(self):
+        if self.profiler is None:
+            self.profiler = Profiler(self.profile, self.stats)
+        else:
+            self.profiler.uninstall()
+            self.profiler = None
 
-        while not self.game_over:
-            self.handle_event()
+        # Экран рисуется заново: со сводкой профилировщика или без нее
+        self.shown = None
 
-            self.update()
-            self.draw()
+    def wait(self):
+        """Ждет следующего кадра и возвращает пришедшие события"""
 
+        top = self.objects[-1] if self.objects else None
+
+        if self.game_pause or top is not self.shown or top is not None and top.animating():
+            self.frame_time = self.clock.tick(self.fps)
+            return pygame.event.get()
+
+        # Сам по себе экран не меняется: ждем событий
+        events = [pygame.event.wait(self.IDLE)] + pygame.event.get()
+        self.frame_time = self.clock.tick()
+
+        return events
+
+    def show(self, rects):
+        """Выводит на экран изменившиеся прямоугольники (None - весь экран)"""
+
+        if rects is None:
             pygame.display.update()
-            pygame.time.delay(100)
+        elif rects:
+            pygame.display.update(rects)
+
+    def step(self):
+        """Один кадр: события, обновление объектов и вывод изменившихся областей на экран"""
+
+        if self.profiler is not None:
+            self.profiler.step(self)
+            return
+
+        self.handle_event(self.wait())
+        self.update()
+        self.show(self.draw())
+
+    def run(self):
+        """Цикл работы игры: не больше fps кадров в секунду, на экран выводятся только изменившиеся области"""
+
+        while not self.game_over:
+            self.step()
@@ -1,5 +1,14 @@
+import Agents
+import Cache
+import Forces
 import GameGUI
-import random
+import Outcome
+import Solver
+import Store
+import numpy as np
+import os
+import pygame
+import threading
 from abc import ABC, abstractmethod
 
 
@@ -23,6 +32,10 @@ class Warrior(ABC):
     def draw(self):
         pass
 
+    @abstractmethod
+    def sprite(self):
+        """Изображение солдата и смещение его левого верхнего угла относительно точки (x, y)"""
+
 
 class Soldier(Warrior):
 
@@ -35,6 +48,12 @@ class Soldier(Warrior):
     def draw(self):
         GameGUI.Rectangle(self.display, self.x, self.y, self.size, self.size, self.color).draw()
 
+    def sprite(self):
+        surface = pygame.Surface((self.size, self.size), pygame.SRCALPHA)
+        GameGUI.Rectangle(surface, 0, 0, self.size, self.size, self.color).draw()
+
+        return surface, (0, 0)
+
 
 class Partisan(Warrior):
 
@@ -47,42 +66,129 @@ class Partisan(Warrior):
     def draw(self):
         GameGUI.Circle(self.display, self.x, self.y, self.size, self.color).draw()
 
+    def sprite(self):
+        surface = pygame.Surface((2 * self.size, 2 * self.size), pygame.SRCALPHA)
+        GameGUI.Circle(surface, self.size, self.size, self.size, self.color).draw()
+
+        return surface, (-self.size, -self.size)
+
 
 class Army:
-    """Класс для модели армии"""
+    """
+    Класс для модели армии.
+
+    Координаты солдат хранятся в массивах, все солдаты рисуются одним изображением warrior.
+    Полностью рисуются только первые detail солдат, остальные - точками прямо в пикселях экрана,
+    так что число солдат почти не влияет на время кадра. Точек не больше, чем пикселей в области армии:
+    остальные солдаты только считаются, так что память и время кадра ограничены при любой численности.
+    Солдаты перемещаются раз в PERIOD миллисекунд, независимо от частоты кадров, если только их положения
+    не заданы методом place.
+    """
 
-    __slots__ = ["display", "name", "position", "soldiery", "color"]
+    DETAIL = 1000
+    PERIOD = 100
 
-    def __init__(self, display, position, name, soldiery, color):
+    __slots__ = ["display", "name", "position", "warrior", "color", "count", "detail", "limit", "x", "y", "sprite",
+                 "offset", "random", "moved", "placed", "changed"]
+
+    def __init__(self, display, position, name, warrior, number, color, **kwargs):
         self.display = display
 
         self.name = name
         self.color = color
         self.position = position
-        self.soldiery = soldiery
+        self.warrior = warrior
+        self.detail = kwargs.get("detail", self.DETAIL)
+
+        # Больше солдат не нарисовать: detail изображений и по точке на каждый пиксель области
+        x1, x2, y1, y2 = position
+        self.limit = self.detail + (x2 - x1 + 1) * (y2 - y1 + 1)
+
+        self.sprite, self.offset = warrior.sprite()
+        self.random = np.random.default_rng()
+
+        # Массивы не укорачиваются: при перемотке назад численность снова растет
+        self.count = number
+        self.x = np.empty(self.shown(), dtype=np.int32)
+        self.y = np.empty(self.shown(), dtype=np.int32)
+
+        # Время последнего перемещения (мс) и признак того, что армию нужно перерисовать
+        self.moved = None
+        self.placed = False
+        self.changed = True
+        self.update()
 
     def update(self):
+        now = pygame.time.get_ticks()
+        if self.placed or self.moved is not None and now - self.moved < self.PERIOD:
+            return
+
         x1, x2, y1, y2 = self.position
-        for soldier in self.soldiery:
-            soldier.x = random.randint(x1, x2)
-            soldier.y = random.randint(y1, y2)
+        shown = self.shown()
+        self.x[:shown] = self.random.integers(x1, x2 + 1, shown)
+        self.y[:shown] = self.random.integers(y1, y2 + 1, shown)
+
+        self.moved = now
+        self.changed = True
+
+    def shown(self):
+        """Сколько солдат рисуется"""
+
+        return min(self.count, self.limit)
+
+    def area(self):
+        """Прямоугольник, в котором могут оказаться солдаты"""
+
+        x1, x2, y1, y2 = self.position
+        dx, dy = self.offset
+        width, height = self.sprite.get_size()
+
+        return pygame.Rect(x1 + dx, y1 + dy, x2 - x1 + width, y2 - y1 + height)
 
     def draw(self):
-        if self.number > 100:
-            for soldier in self.soldiery[:100]:
-                soldier.draw()
-        else:
-            for soldier in self.soldiery:
-                soldier.draw()
+        self.changed = False
+
+        shown = self.shown()
+        detail = min(shown, self.detail)
+        dx, dy = self.offset
+
+        positions = np.column_stack((self.x[:detail] + dx, self.y[:detail] + dy)).tolist()
+        self.display.blits([(self.sprite, position) for position in positions], False)
+
+        if shown > detail:
+            pixels = pygame.surfarray.pixels2d(self.display)
+            pixels[self.x[detail:shown], self.y[detail:shown]] = self.display.map_rgb(self.color)
+            del pixels
+
+    def place(self, x, y, field):
+        """Ставит солдат в точки (x, y) поля размером field = (ширина, высота) вместо случайных"""
+
+        x1, x2, y1, y2 = self.position
+        width, height = field
+
+        self.number = len(x)
+        shown = self.shown()
+        self.x[:shown] = x1 + x[:shown] * ((x2 - x1) / width)
+        self.y[:shown] = y1 + y[:shown] * ((y2 - y1) / height)
+
+        self.placed = True
+        self.changed = True
 
     @property
     def number(self):
-        return len(self.soldiery)
+        return self.count
 
     @number.setter
     def number(self, value):
         value = value if value > 0 else 0
-        self.soldiery = self.soldiery[:value]
+        if value != self.count:
+            self.count = value
+            self.changed = True
+
+        if self.shown() > len(self.x):
+            capacity = min(max(self.count, 2 * len(self.x)), self.limit)
+            self.x = np.resize(self.x, capacity)
+            self.y = np.resize(self.y, capacity)
 
 
 class SimpleIterator:
@@ -100,25 +206,334 @@ class SimpleIterator:
             raise StopIteration
 
 
+class Playback:
+    """
+    Показ боя во времени модели: за секунду на часах проходит speed единиц времени модели.
+
+    Отсчет для текущего момента ищется двоичным поиском по массиву t, так что перемотка
+    в любое место занимает O(log n).
+    """
+
+    SPEEDS = (0.125, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+
+    __slots__ = ["time", "speed", "clock"]
+
+    def __init__(self, speed=1):
+        self.time = 0.0
+        self.speed = speed
+        self.clock = None
+
+    def advance(self, now):
+        """Сдвигает время модели на время, прошедшее на часах (now - в миллисекундах)"""
+
+        if self.clock is not None:
+            self.time += (now - self.clock) / 1000 * self.speed
+        self.clock = now
+
+    def seek(self, time):
+        self.time = time
+
+    def stop(self):
+        """Останавливает часы: следующий advance начнет отсчет заново"""
+
+        self.clock = None
+
+    def faster(self):
+        self.speed = self.SPEEDS[min(self.SPEEDS.index(self.speed) + 1, len(self.SPEEDS) - 1)]
+
+    def slower(self):
+        self.speed = self.SPEEDS[max(self.SPEEDS.index(self.speed) - 1, 0)]
+
+    def sample(self, t):
+        """Номер последнего отсчета, не позже текущего момента"""
+
+        return max(int(np.searchsorted(t, self.time, side="right")) - 1, 0)
+
+
+class Computation:
+    """
+    Расчет боя в отдельном потоке.
+
+    Бой считается потоком значений на сетке с шагом STEP (см. Solver.stream), так что память не зависит
+    от шага метода. Пока поток работает, partial() возвращает уже посчитанную часть боя,
+    а окно продолжает обрабатывать события. Посчитанный до конца бой записывается в Store.LAST
+    и кладется в Cache.RESULTS: тот же бой второй раз не считается.
+    """
+
+    STEP = 1e-3
+
+    __slots__ = ["parameters", "model", "method", "key", "trajectory", "battle", "error", "thread"]
+
+    def __init__(self, parameters, model, method):
+        self.parameters = tuple(parameters)
+        self.model = model
+        self.method = method
+
+        self.key = Cache.Cache.key(Solver.stream, self.parameters, **{"model": model, "method": method,
+                                                                      "step": self.STEP})
+        self.trajectory = Solver.Trajectory()
+        self.battle = Cache.RESULTS.get(self.key)
+        self.error = None
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        if self.battle is None:
+            try:
+                for x, y, t in Solver.stream(*self.parameters, **{"model": self.model, "method": self.method,
+                                                                  "step": self.STEP}):
+                    self.trajectory.extend(t, x, y)
+                    if self.trajectory.cancelled:
+                        break
+
+                self.battle = Solver.Battle(self.parameters, self.model, self.method, *self.trajectory.result())
+            except Exception as error:
+                self.error = error
+                return
+
+            if not self.trajectory.cancelled:
+                Cache.RESULTS.put(self.key, self.battle, {"step": self.STEP})
+
+        if not self.trajectory.cancelled:
+            try:
+                Store.save(Store.LAST, self.battle, {"step": self.STEP})
+            except OSError:
+                # Без записи бой просто нельзя будет посмотреть заново
+                pass
+
+    def done(self):
+        return not self.thread.is_alive()
+
+    def partial(self):
+        """Готовый бой или его уже посчитанная часть"""
+
+        if self.battle is not None:
+            return self.battle
+
+        return Solver.Battle(self.parameters, self.model, self.method, *self.trajectory.result())
+
+    def cancel(self):
+        self.trajectory.cancelled = True
+
+
+class Branching:
+    """Ветвь боя (см. Solver.branch), которая считается в отдельном потоке на сетке Computation.STEP"""
+
+    __slots__ = ["trajectory", "branch", "error", "thread"]
+
+    def __init__(self, parent, time, rates):
+        self.trajectory = Solver.Trajectory()
+        self.branch = None
+        self.error = None
+
+        self.thread = threading.Thread(target=self.run, args=(parent, time, rates), daemon=True)
+        self.thread.start()
+
+    def run(self, parent, time, rates):
+        try:
+            self.branch = Solver.branch(parent, time, rates, **{"step": Computation.STEP,
+                                                                 "trajectory": self.trajectory})
+        except Exception as error:
+            self.error = error
+
+    def done(self):
+        return not self.thread.is_alive()
+
+    def cancel(self):
+        self.trajectory.cancelled = True
+
+
+class AgentComputation:
+    """
+    Бой отдельных единиц (см. Agents.Simulation) в отдельном потоке.
+
+    Расчет идет вслед за показом: поток считает шаги, пока время боя меньше target (см. follow),
+    и ждет, когда показ уйдет вперед. Положения единиц хранятся только для последнего шага.
+    """
+
+    __slots__ = ["parameters", "model", "simulation", "trajectory", "positions", "target", "wake", "error",
+                 "thread"]
+
+    def __init__(self, parameters, model):
+        self.parameters = tuple(parameters)
+        self.model = model
+
+        self.simulation = Agents.Simulation(*self.parameters, **{"model": model})
+        self.trajectory = Solver.Trajectory()
+        self.trajectory.append(0, *self.simulation.counts())
+        self.positions = self.snapshot()
+        self.error = None
+
+        self.target = 0.0
+        self.wake = threading.Event()
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def snapshot(self):
+        """Координаты единиц обеих сторон: (x1, y1, x2, y2)"""
+
+        force1, force2 = self.simulation.forces
+
+        return force1.x, force1.y, force2.x, force2.y
+
+    def run(self):
+        simulation = self.simulation
+        trajectory = self.trajectory
+
+        try:
+            while not trajectory.cancelled and not simulation.over() and simulation.t < Solver.HORIZON:
+                self.wake.clear()
+                if simulation.t >= self.target:
+                    self.wake.wait(0.1)
+                    continue
+
+                simulation.step()
+                self.positions = self.snapshot()
+                trajectory.append(simulation.t, *simulation.counts())
+        except Exception as error:
+            self.error = error
+
+    def follow(self, time):
+        """Разрешает считать бой до момента time"""
+
+        self.target = time
+        self.wake.set()
+
+    def busy(self):
+        """Поток еще не дошел до разрешенного момента"""
+
+        return self.thread.is_alive() and self.simulation.t < self.target
+
+    def battle(self):
+        """Уже посчитанные численности сторон"""
+
+        return Solver.Battle(self.parameters, self.model, Agents.AGENTS, *self.trajectory.result())
+
+    def restart(self):
+        """Тот же бой заново, с начала"""
+
+        self.cancel()
+
+        return AgentComputation(self.parameters, self.model)
+
+    def cancel(self):
+        self.trajectory.cancelled = True
+        self.wake.set()
+
+
+class Solving(GameGUI.GameObject):
+    """Экран ожидания, пока не посчитан первый участок боя"""
+
+    __slots__ = ["game", "background_color", "computation", "agents", "army1", "army2", "title", "status", "bar"]
+
+    def __init__(self, display, game, x, y, background_color, computation, army1, army2, **kwargs):
+        super().__init__(display, x, y)
+
+        self.game = game
+        self.background_color = background_color
+        self.computation = computation
+        self.agents = kwargs.get("agents", None)
+        self.army1 = army1
+        self.army2 = army2
+        self.bar = pygame.Rect(x + 300, y + 280, 400, 20)
+
+        self.title = GameGUI.Text(display, x + 380, y + 200, "Идет расчет...", **{"size": 50})
+        self.status = GameGUI.Text(display, x + 300, y + 330, "", **{"size": 30})
+
+    def update(self):
+        computation = self.computation
+        trajectory = computation.trajectory
+
+        if computation.error is not None:
+            self.title.message = "Ошибка расчета"
+            self.status.message = str(computation.error)
+        elif computation.done() or trajectory.size > 1:
+            if self.game.objects[-1] is self:
+                self.game.objects.pop()
+                self.game.objects.append(FightActionModel(self.display, self.game, 0, 0, GameGUI.GRAY,
+                                                          computation.partial(), self.army1, self.army2,
+                                                          **{"computation": computation, "agents": self.agents}))
+        else:
+            self.status.message = "Посчитано точек: %d" % trajectory.size
+
+    def draw(self):
+        GameGUI.set_background(self.display, None, self.background_color)
+
+        self.title.draw()
+        self.status.draw()
+        self.draw_bar()
+
+    def draw_bar(self):
+        """Бегущая полоса: расчет идет, сколько он продлится - неизвестно"""
+
+        if self.computation.error is None:
+            bar = self.bar
+            GameGUI.Rectangle(self.display, bar.x, bar.y, bar.width, bar.height, GameGUI.GRAY).draw()
+            GameGUI.Rectangle(self.display, bar.x + pygame.time.get_ticks() // 5 % (bar.width - 80), bar.y, 80,
+                              bar.height, GameGUI.GREEN).draw()
+
+    def redraw(self):
+        if self.computation.error is not None:
+            self.draw()
+            return None
+
+        self.draw_bar()
+
+        return [self.bar] + GameGUI.refresh(self.display, self.background_color, self.title, self.status)
+
+    def close(self):
+        self.computation.cancel()
+        if self.agents is not None:
+            self.agents.cancel()
+
+    def animating(self):
+        return True
+
+
 class FightActionModel(GameGUI.GameObject):
-    """Модель боевых действий"""
+    """
+    Модель боевых действий.
 
-    __slots__ = ["N1", "N2", "t", "background_color", "iter", "army1", "army2", "information",
-                 "parameters", "isPlot", "button"]
+    Если задан бой отдельных единиц (agents), солдаты стоят там, где их поставил этот бой, а его численности
+    показываются на графиках рядом с решением уравнений. Положения единиц в прошлом не хранятся,
+    поэтому перемотка в этом режиме недоступна.
 
-    def __init__(self, display, x, y, background_color, parameters, army1, army2, N1, N2, t):
+    Кнопка "Что если" продолжает бой с текущего момента с другими коэффициентами (см. Solver.branch);
+    продолжения (ветви) показываются на графиках поверх боя.
+    """
+
+    # Цвета ветвей на графиках
+    BRANCHES = ((255, 200, 0), (200, 0, 200), (0, 200, 200), (255, 120, 0))
+
+    # Пока бой досчитывается, графики перестраиваются не чаще, чем раз в столько миллисекунд
+    REBUILD = 250
+
+    __slots__ = ["game", "battle", "computation", "agents", "positions", "N1", "N2", "t", "background_color",
+                 "playback", "army1", "army2", "information", "parameters", "isPlot", "plots", "button", "status",
+                 "clock", "scrub", "slower", "faster", "what_if", "branches", "outcomes", "field", "view"]
+
+    def __init__(self, display, game, x, y, background_color, battle, army1, army2, **kwargs):
         super().__init__(display, x, y)
 
-        self.N1 = N1
-        self.N2 = N2
-        self.t = t
+        self.game = game
+        self.battle = battle
+        # Пока расчет не закончен, бой показывается по уже посчитанной части
+        self.computation = kwargs.get("computation", None)
+        self.agents = kwargs.get("agents", None)
+        # Положения единиц, по которым расставлены солдаты
+        self.positions = None
+        self.N1, self.N2, self.t = battle
         self.background_color = background_color
-        self.iter = SimpleIterator(len(self.N1))
+        self.playback = Playback()
 
         self.army1 = army1
         self.army2 = army2
 
         self.isPlot = False
+        # (число отсчетов, по которым построены графики, графики, время построения в мс)
+        self.plots = None
 
         font_size = 35
         step_x = 200
@@ -128,7 +543,7 @@ class FightActionModel(GameGUI.GameObject):
 
         label_army1 = GameGUI.Rectangle(self.display, x - 30, y, 20, 20, army1.color)
         label_army2 = GameGUI.Rectangle(self.display, x - 30 + step_x * 2, y, 20, 20, army2.color) \
-            if isinstance(army2.soldiery[0], Soldier) \
+            if isinstance(army2.warrior, Soldier) \
             else GameGUI.Circle(self.display, x - 30 + step_x * 2, y + 10, 10, army2.color)
 
         self.information = [
@@ -149,6 +564,8 @@ class FightActionModel(GameGUI.GameObject):
             label_army2
         ]
 
+        parameters = battle.parameters
+
         self.parameters = [
             GameGUI.Text(self.display, x + step_x, y + step_y, str(parameters[0]), **{"font_size": font_size}),
             GameGUI.Text(self.display, x + step_x, y + step_y * 2, str(parameters[1]), **{"font_size": font_size}),
@@ -161,153 +578,603 @@ class FightActionModel(GameGUI.GameObject):
             GameGUI.Text(self.display, x + step_x * 3, y + step_y * 4, str(parameters[7]), **{"font_size": font_size})
         ]
 
-        self.button = GameGUI.Button(game.display, x + int(step_x * 3.5), y + step_y * 2, 200, 40,
+        self.button = GameGUI.Button(self.display, x + int(step_x * 3.5), y + step_y * 2, 200, 40,
                                      "Показать графики", self.click_button,
                                      **{"font_size": 36, "active_color": GameGUI.RED, "inactive_color": GameGUI.GREEN})
 
+        self.status = GameGUI.Text(self.display, x + int(step_x * 3.5), y + step_y * 4, "", **{"size": 24})
+        self.outcomes = GameGUI.Button(self.display, x + int(step_x * 3.5), y + step_y * 5, 200, 30, "Карта исходов",
+                                       self.click_outcomes, **{"font_size": 26, "active_color": GameGUI.RED,
+                                                               "inactive_color": GameGUI.GREEN, "step": 40})
+
+        self.clock = GameGUI.Text(self.display, x, y + step_y * 5, "", **{"size": 24})
+        self.scrub = GameGUI.Slider(self.display, x + 230, y + step_y * 5 + 5, 450, 8, self.seek)
+        self.slower = GameGUI.Button(self.display, x + 720, y + step_y * 5, 40, 25, "<<", self.click_slower,
+                                     **{"active_color": GameGUI.RED, "inactive_color": GameGUI.GREEN, "step": 8})
+        self.faster = GameGUI.Button(self.display, x + 770, y + step_y * 5, 40, 25, ">>", self.click_faster,
+                                     **{"active_color": GameGUI.RED, "inactive_color": GameGUI.GREEN, "step": 8})
+        self.what_if = GameGUI.Button(self.display, x + 830, y + step_y * 5, 110, 25, "Что если", self.click_what_if,
+                                      **{"font_size": 26, "active_color": GameGUI.RED,
+                                         "inactive_color": GameGUI.GREEN, "step": 12})
+        self.branches = []
+
+        # Поле боя и то, что было показано при последней полной отрисовке: бой или графики
+        self.field = army1.area().union(army2.area())
+        self.view = None
+
     def click_button(self):
         self.isPlot = True if not self.isPlot else False
 
-        pygame.time.delay(200)
+        # Бой, досмотренный до конца, показывается заново
+        if not self.isPlot and self.playback.time >= self.t[-1]:
+            self.playback.seek(0)
+            if self.agents is not None:
+                self.agents = self.agents.restart()
+        self.playback.stop()
+
+    def click_slower(self):
+        self.playback.slower()
+
+    def click_faster(self):
+        self.playback.faster()
+
+    def click_what_if(self):
+        """Запрашивает новые коэффициенты и считает с текущего момента ветвь боя"""
+
+        self.playback.stop()
+        battle, time = self.battle, self.playback.time
+
+        def branch(rates):
+            self.branches.append(Branching(battle, time, rates))
+            self.isPlot = True
+
+        width, height = self.game.display_width, self.game.display_height
+        self.game.objects.append(InputtingParameters(
+            self.display, self.game, int((width - 110) / 2), int(height / 2) - 120, GameGUI.BLUE,
+            *Solver.PARAMETERS[1:4], *Solver.PARAMETERS[5:], **{"action": branch}))
+
+    def click_outcomes(self):
+        """Показывает карту исходов с ходом боя и посчитанными ветвями поверх нее"""
+
+        branches = [branch.branch for branch in self.branches if branch.branch is not None]
+        curves = [(self.N1, self.N2)] + [(branch.x, branch.y) for branch in branches]
+        colors = [GameGUI.GREEN] + [self.BRANCHES[i % len(self.BRANCHES)] for i in range(len(branches))]
+
+        self.game.objects.append(OutcomeView(self.display, self.game, 0, 0, GameGUI.WHITE, self.battle, curves, colors))
+
+    def plotted(self):
+        """По какой части боя (и боя отдельных единиц) и по скольким ветвям строятся графики"""
+
+        return (len(self.t), self.agents.trajectory.size if self.agents is not None else 0,
+                sum(branch.branch is not None for branch in self.branches))
+
+    def stale(self):
+        """Графики пора перестроить: бой посчитан дальше, чем на них, а расчет закончен или REBUILD мс прошло"""
+
+        if self.plots is None:
+            return True
+        if self.plots[0] == self.plotted():
+            return False
+
+        running = (self.computation is not None or self.agents is not None and self.agents.busy()
+                   or not all(branch.done() for branch in self.branches))
+
+        return not running or pygame.time.get_ticks() - self.plots[2] >= self.REBUILD
+
+    def build_plots(self):
+        width, height = self.game.display_width, self.game.display_height
+
+        # Столбцы передаются как есть: они могут быть отображены на файл записи (см. Store)
+        phase = [(self.N1, self.N2)]
+        curves = [(self.t, self.N1), (self.t, self.N2)]
+        phase_colors = [GameGUI.GREEN]
+        colors = [self.army1.color, self.army2.color]
+
+        # Численности в бою отдельных единиц - теми же цветами, но темнее
+        if self.agents is not None:
+            N1, N2, t = self.agents.battle()
+            phase.append((N1, N2))
+            curves += [(t, N1), (t, N2)]
+            phase_colors.append(tuple(c // 2 for c in GameGUI.GREEN))
+            colors += [tuple(c // 2 for c in color) for color in colors]
+
+        # Ветви - только продолжения: общее начало уже нарисовано
+        for i, branch in enumerate(branch.branch for branch in self.branches if branch.branch is not None):
+            color = self.BRANCHES[i % len(self.BRANCHES)]
+            phase.append((branch.x, branch.y))
+            curves += [(branch.t, branch.x), (branch.t, branch.y)]
+            phase_colors.append(color)
+            colors += [color, color]
+
+        return (
+            GameGUI.Plot(self.display, 0, 200, int(width / 2), height, *phase,
+                         **{"plot_color": phase_colors, "label_x": "N1", "label_y": "N2"}),
+            GameGUI.Plot(self.display, int(width / 2), 200, width, height, *curves,
+                         **{"plot_color": colors, "label_x": "t", "label_y": "N"})
+        )
+
+    def seek(self, value):
+        """Перематывает бой в момент, соответствующий положению value полосы прокрутки"""
+
+        self.playback.seek(value * self.t[-1])
 
     def update(self):
+        if self.computation is not None:
+            self.battle = self.computation.partial()
+            self.N1, self.N2, self.t = self.battle
+
+            if self.computation.done():
+                self.computation = None
+                self.status.message = ""
+            else:
+                self.status.message = "Идет расчет: t = %.4g" % self.t[-1]
+
+        if self.branches:
+            running = sum(not branch.done() for branch in self.branches)
+            self.status.message = "Считается ветвей: %d" % running if running \
+                else "Ветвей: %d" % len(self.branches)
+
         self.army1.update()
         self.army2.update()
 
+    def close(self):
+        if self.computation is not None:
+            self.computation.cancel()
+        if self.agents is not None:
+            self.agents.cancel()
+        for branch in self.branches:
+            branch.cancel()
+
+    def animating(self):
+        return (not self.isPlot or self.computation is not None or self.agents is not None and self.agents.busy()
+                or not all(branch.done() for branch in self.branches))
+
+    def controls(self):
+        """Управление показом боя"""
+
+        if self.agents is not None:
+            return [self.slower, self.faster]
+
+        # Ветвь продолжает уже посчитанный бой
+        if self.computation is not None:
+            return [self.scrub, self.slower, self.faster]
+
+        return [self.scrub, self.slower, self.faster, self.what_if]
+
+    def widgets(self):
+        if self.isPlot:
+            return [self.button, self.outcomes]
+
+        return [self.button] + self.controls()
+
     def draw(self):
         GameGUI.set_background(self.display, None, self.background_color)
 
+        self.view = self.isPlot
+
+        if self.isPlot:
+            # Графики строятся один раз на весь бой (и заново - только если бой еще досчитывается)
+            if self.stale():
+                self.plots = self.plotted(), self.build_plots(), pygame.time.get_ticks()
+
+            for plot in self.plots[1]:
+                plot.draw()
+            self.outcomes.draw()
+        else:
+            self.play()
+            self.army1.draw()
+            self.army2.draw()
+
+            self.clock.draw()
+            for control in self.controls():
+                control.draw()
+
         for text in self.information:
             text.draw()
         for text in self.parameters:
             text.draw()
 
         self.button.draw()
+        self.status.draw()
 
-        if self.isPlot:
-            GameGUI.Plot(self.display, 0, 200, int(game.display_width / 2), game.display_height,
-                         list(zip(self.N1, self.N2)),
-                         **{"plot_color": [GameGUI.GREEN], "label_x": "N1", "label_y": "N2"})\
-                .draw()
-
-            GameGUI.Plot(self.display, int(game.display_width / 2), 200, game.display_width, game.display_height,
-                         list(zip(self.t, self.N1)), list(zip(self.t, self.N2)),
-                         **{"plot_color": [self.army1.color, self.army2.color], "label_x": "t", "label_y": "N"})\
-                .draw()
+    def play(self):
+        """Переходит к текущему моменту воспроизведения: обновляет численности армий и надписи"""
+
+        playback = self.playback
+        playback.advance(pygame.time.get_ticks())
+
+        if playback.time >= self.t[-1]:
+            # Дальше бой еще не посчитан - ждем следующий участок
+            playback.seek(self.t[-1])
+
+        number = playback.sample(self.t)
+        x, y = self.N1[number], self.N2[number]
+
+        if self.agents is not None:
+            self.place()
         else:
-            try:
-                number = next(self.iter)
-                x, y = self.N1[number], self.N2[number]
+            self.army1.number = round(x)
+            self.army2.number = round(y)
+
+        self.parameters[0].message = str(round(x))
+        self.parameters[4].message = str(round(y))
+
+        self.clock.message = "t = %.4g  x%g" % (self.t[number], playback.speed)
+        self.scrub.value = playback.time / self.t[-1] if self.t[-1] else 1
+
+        if playback.time >= self.t[-1] and self.computation is None:
+            self.isPlot = True
+
+    def place(self):
+        """Расставляет солдат по последнему посчитанному шагу боя отдельных единиц"""
+
+        agents = self.agents
+        agents.follow(self.playback.time)
+
+        positions = agents.positions
+        if positions is not self.positions:
+            x1, y1, x2, y2 = self.positions = positions
+            field = agents.simulation.width, agents.simulation.height
+
+            self.army1.place(x1, y1, field)
+            self.army2.place(x2, y2, field)
+
+        if self.computation is None:
+            self.status.message = "Единицы: %d и %d" % (len(positions[0]), len(positions[2]))
 
-                while self.parameters[0].message == str(round(x)) and self.parameters[4].message == str(round(y)):
-                    number = next(self.iter)
-                    x, y = self.N1[number], self.N2[number]
+    def redraw(self):
+        """Перерисовывает только поле боя (если солдаты сдвинулись) и меняющиеся надписи"""
 
-                self.army1.number = round(x)
-                self.army2.number = round(y)
+        if self.view != self.isPlot or self.isPlot and self.stale():
+            self.draw()
+            return None
 
-                self.parameters[0].message = str(round(x))
-                self.parameters[4].message = str(round(y))
+        rects = []
 
+        if self.isPlot:
+            widgets = self.button, self.status, self.outcomes
+        else:
+            widgets = (self.parameters[0], self.parameters[4], self.clock, *self.controls(), self.button, self.status)
+
+            self.play()
+
+            if self.army1.changed or self.army2.changed:
+                self.display.fill(self.background_color, self.field)
                 self.army1.draw()
                 self.army2.draw()
+                rects.append(self.field)
 
-            except StopIteration:
-                self.isPlot = True
+        return rects + GameGUI.refresh(self.display, self.background_color, *widgets)
+
+
+class OutcomeView(GameGUI.GameObject):
+    """
+    Карта исходов (см. Outcome.OutcomeMap) при коэффициентах боя battle: по горизонтали N1(0), по вертикали N2(0).
+
+    Цвет клетки - победитель, яркость - время окончания (чем дольше бой, тем темнее). Поверх карты
+    рисуются кривые curves - ход боя на фазовой плоскости. Нажатие на карту приближает ее вдвое
+    вокруг точки нажатия; подробные плитки досчитываются в фоне, а до тех пор видны более грубые.
+    """
+
+    # Цвета: не посчитано, нет победителя, победа первой стороны, победа второй
+    PALETTE = np.array((GameGUI.BLACK, GameGUI.GRAY, GameGUI.BLUE, GameGUI.RED), dtype=np.float32)
+
+    __slots__ = ["game", "background_color", "outcomes", "curves", "colors", "view", "drawn", "picture",
+                 "information", "status", "zoom_out", "reset"]
+
+    def __init__(self, display, game, x, y, background_color, battle, curves, colors):
+        super().__init__(display, x, y)
+
+        self.game = game
+        self.background_color = background_color
+        self.curves = curves
+        self.colors = colors
+
+        # Видно все начальные численности до двух наибольших численностей боя
+        extent = 2 * max(max(float(np.max(x)), float(np.max(y))) for x, y in curves) or 1
+        rates = battle.parameters[1:4] + battle.parameters[5:8]
+        self.outcomes = Outcome.OutcomeMap(rates, battle.model, (extent, extent), **{"horizon": Solver.HORIZON})
+
+        self.view = 0, extent, 0, extent
+        self.drawn = None
+
+        size = game.display_height - 60
+        self.picture = GameGUI.Picture(display, x + 20, y + 40, pygame.Surface((size, size)), self.zoom)
+
+        x = x + size + 50
+        self.information = [
+            GameGUI.Text(display, self.picture.x, y + 10, "Карта исходов: по горизонтали N1(0), по вертикали N2(0)",
+                         **{"size": 26}),
+            GameGUI.Rectangle(display, x, y + 60, 20, 20, GameGUI.BLUE),
+            GameGUI.Text(display, x + 30, y + 62, "победа первой стороны", **{"size": 24}),
+            GameGUI.Rectangle(display, x, y + 90, 20, 20, GameGUI.RED),
+            GameGUI.Text(display, x + 30, y + 92, "победа второй стороны", **{"size": 24}),
+            GameGUI.Rectangle(display, x, y + 120, 20, 20, GameGUI.GRAY),
+            GameGUI.Text(display, x + 30, y + 122, "нет победителя", **{"size": 24}),
+            GameGUI.Text(display, x, y + 152, "Чем темнее, тем дольше бой", **{"size": 24}),
+            GameGUI.Text(display, x, y + 182, "Нажатие на карту приближает ее", **{"size": 24})
+        ]
+
+        self.status = GameGUI.Text(display, x, y + 330, "", **{"size": 24})
+        self.zoom_out = GameGUI.Button(display, x, y + 230, 180, 40, "Отдалить", self.click_zoom_out,
+                                       **{"font_size": 36, "active_color": GameGUI.RED,
+                                          "inactive_color": GameGUI.GREEN, "step": 35})
+        self.reset = GameGUI.Button(display, x, y + 280, 180, 40, "Вся карта", self.click_reset,
+                                    **{"font_size": 36, "active_color": GameGUI.RED,
+                                       "inactive_color": GameGUI.GREEN, "step": 30})
+
+        self.outcomes.refine(self.view)
+
+    def show(self, view):
+        """Переходит к области view (не выходя за пределы карты) и заказывает ее досчет"""
+
+        x0, x1, y0, y1 = view
+        width, height = self.outcomes.extent
+        w, h = min(x1 - x0, width), min(y1 - y0, height)
+        x0, y0 = min(max(x0, 0), width - w), min(max(y0, 0), height - h)
+
+        self.view = x0, x0 + w, y0, y0 + h
+        self.outcomes.refine(self.view)
+
+    def zoom(self, position):
+        x0, x1, y0, y1 = self.view
+        size = self.picture.surface.get_size()
+        x = x0 + (position[0] + 0.5) / size[0] * (x1 - x0)
+        y = y1 - (position[1] + 0.5) / size[1] * (y1 - y0)
+
+        self.show((x - (x1 - x0) / 4, x + (x1 - x0) / 4, y - (y1 - y0) / 4, y + (y1 - y0) / 4))
+
+    def click_zoom_out(self):
+        x0, x1, y0, y1 = self.view
+        x, y = (x0 + x1) / 2, (y0 + y1) / 2
+
+        self.show((x - (x1 - x0), x + (x1 - x0), y - (y1 - y0), y + (y1 - y0)))
+
+    def click_reset(self):
+        self.show((0, self.outcomes.extent[0], 0, self.outcomes.extent[1]))
+
+    def render(self):
+        """Рисует видимую часть карты и кривые поверх нее"""
+
+        width, height = self.picture.surface.get_size()
+        end, winner = self.outcomes.sample(self.view, width, height)
+
+        finite = np.isfinite(end)
+        longest = float(end[finite].max()) if finite.any() else 1
+        shade = np.where(finite, 1 - 0.6 * np.log1p(np.where(finite, end, 0)) / np.log1p(longest or 1), 1)
+
+        image = (self.PALETTE[winner + 1] * shade[..., None].astype(np.float32)).astype(np.uint8)
+        # Пока плитки не посчитаны, вместо них видна сетка-заглушка
+        blank = winner < 0
+        if blank.any():
+            grid = (np.arange(width)[:, None] // 16 + np.arange(height)[None, :] // 16) % 2 == 1
+            image[blank & grid] = np.array(GameGUI.GRAY) // 3
+        surface = pygame.surfarray.make_surface(image)
+
+        x0, x1, y0, y1 = self.view
+        scale_x, scale_y = width / (x1 - x0), height / (y1 - y0)
+        for (x, y), color in zip(self.curves, self.colors):
+            parts = [GameGUI.Plot.downsample(
+                np.clip((x[start:start + GameGUI.Plot.CHUNK] - x0) * scale_x, -1e5, 1e5).astype(int),
+                np.clip((y1 - y[start:start + GameGUI.Plot.CHUNK]) * scale_y, -1e5, 1e5).astype(int))
+                for start in range(0, len(x), GameGUI.Plot.CHUNK)]
+            points = np.column_stack((np.concatenate([part[0] for part in parts]),
+                                      np.concatenate([part[1] for part in parts])))
+            if len(points) > 1:
+                pygame.draw.lines(surface, color, False, points.tolist(), 2)
+
+        self.picture.surface = surface
+        self.drawn = self.view, self.outcomes.version
+
+        pending = self.outcomes.pending
+        self.status.message = "N1(0): %.4g - %.4g, N2(0): %.4g - %.4g" % self.view + \
+            ("" if not pending else "  (считается)" if (winner < 0).all() else "  (досчитывается)")
+
+    def update(self):
+        super().update()
+
+    def close(self):
+        self.outcomes.cancel()
+
+    def animating(self):
+        return self.outcomes.busy() or self.drawn != (self.view, self.outcomes.version)
+
+    def widgets(self):
+        return [self.picture, self.zoom_out, self.reset]
+
+    def draw(self):
+        GameGUI.set_background(self.display, None, self.background_color)
+
+        self.render()
+
+        self.picture.draw()
+        for item in self.information:
+            item.draw()
+        self.zoom_out.draw()
+        self.reset.draw()
+        self.status.draw()
+
+    def redraw(self):
+        if self.drawn != (self.view, self.outcomes.version):
+            self.render()
+
+        return GameGUI.refresh(self.display, self.background_color, self.picture, self.status, self.zoom_out,
+                               self.reset)
+
+
+class ForcesModel(GameGUI.GameObject):
+    """
+    Бой многих армий (см. Forces.solve): численности всех армий на одном графике.
+
+    Цвет кривой - цвет коалиции армии, у разных армий одной коалиции - разной яркости.
+    """
+
+    SIDES = (GameGUI.BLUE, GameGUI.RED, GameGUI.GREEN, (255, 200, 0), (200, 0, 200), (0, 200, 200))
+
+    # Сколько армий помещается в подписи над графиком
+    LEGEND = 12
+
+    __slots__ = ["game", "background_color", "battle", "colors", "information", "plot"]
+
+    def __init__(self, display, game, x, y, background_color, battle):
+        super().__init__(display, x, y)
+
+        self.game = game
+        self.background_color = background_color
+        self.battle = battle
+
+        system = battle.system
+        sides, coalitions = system.sides, system.coalitions
+        self.colors = []
+        for i in range(len(system)):
+            same = np.flatnonzero(coalitions == coalitions[i])
+            shade = 1 - 0.5 * np.searchsorted(same, i) / len(same)
+            self.colors.append(tuple(int(c * shade) for c in self.SIDES[coalitions[i] % len(self.SIDES)]))
+
+        winner = battle.winner
+        result = "победила коалиция %s" % winner if winner else "победителя нет"
+        self.information = [
+            GameGUI.Text(display, x + 20, y + 10, "Армий: %d, коалиций: %d; t = %.4g, %s" %
+                         (len(system), len(np.unique(sides)), battle.end, result), **{"size": 30})
+        ]
+
+        for i in range(min(len(system), self.LEGEND)):
+            column, row = x + 20 + 490 * (i // (self.LEGEND // 2)), y + 45 + 25 * (i % (self.LEGEND // 2))
+            self.information += [
+                GameGUI.Rectangle(display, column, row, 16, 16, self.colors[i]),
+                GameGUI.Text(display, column + 25, row, "Армия %d (коалиция %s): %d -> %d" %
+                             (i + 1, sides[i], round(battle.N[0, i]), round(battle.N[-1, i])), **{"size": 24})
+            ]
+        if len(system) > self.LEGEND:
+            self.information.append(GameGUI.Text(display, x + 20, y + 45 + 25 * (self.LEGEND // 2),
+                                                 "и еще армий: %d" % (len(system) - self.LEGEND), **{"size": 24}))
+
+        width, height = game.display_width, game.display_height
+        self.plot = GameGUI.Plot(display, 0, 200, width, height,
+                                 *((battle.t, battle.N[:, i]) for i in range(len(system))),
+                                 **{"plot_color": list(self.colors), "label_x": "t", "label_y": "N"})
+
+    def update(self):
+        super().update()
+
+    def draw(self):
+        GameGUI.set_background(self.display, None, self.background_color)
+
+        for item in self.information:
+            item.draw()
+        self.plot.draw()
+
+    def redraw(self):
+        return []
+
+
+def forces_battle(game, parameters):
+    """
+    Считает и показывает бой многих армий по введенным параметрам: для каждой армии N(0), alpha, beta, gamma,
+    номер армии-цели, номер коалиции и признак партизан (1 - огонь по этой армии ведется по площади)
+    """
+
+    rows = np.asarray(parameters, dtype=np.float64).reshape(-1, 7)
+    n = len(rows)
+    N0, alpha, beta, gamma, target, sides, partisan = rows.T
+    target = target.astype(int) - 1
+
+    # Армия стреляет только по существующей чужой армии
+    shooter = np.flatnonzero((target >= 0) & (target < n) & (target != np.arange(n)))
+    row = target[shooter]
+    fire = row, shooter, beta[shooter]
+
+    battle = Forces.solve(N0, alpha, fire, gamma, (row, shooter, partisan[row]), sides.astype(int))
+
+    game.objects.append(ForcesModel(game.display, game, 0, 0, GameGUI.GRAY, battle))
+
+
+def new_forces(game):
+    """Ввод боя многих армий: сначала число армий, затем параметры каждой"""
+
+    x, y = int((game.display_width - 110) / 2), int(game.display_height / 2) - 120
+
+    def armies_entered(parameters):
+        titles = [title % (k + 1) for k in range(max(parameters[0], 1))
+                  for title in ("N(0) армии %d", "alpha армии %d", "beta армии %d", "gamma армии %d",
+                                "цель армии %d", "коалиция армии %d", "партизаны? армия %d")]
+
+        game.objects.append(InputtingParameters(game.display, game, x, y, GameGUI.BLUE, *titles,
+                                                **{"action": lambda values: forces_battle(game, values)}))
+
+    game.objects.append(InputtingParameters(game.display, game, x, y, GameGUI.BLUE, "Число армий",
+                                            **{"action": armies_entered}))
 
 
 class ModelType(GameGUI.GameObject):
     """Выбор типа модели"""
 
-    __slots__ = ["background_color", "parameters", "button1", "button2"]
+    __slots__ = ["game", "background_color", "parameters", "method", "agents", "button1", "button2", "button3",
+                 "button4"]
+
+    METHODS = {Solver.EULER: "Метод: Эйлер", Solver.ADAPTIVE: "Метод: Рунге-Кутта", Solver.ANALYTIC: "Метод: точный"}
+    AGENTS = {False: "Отдельные единицы: нет", True: "Отдельные единицы: да"}
 
-    def __init__(self, display, x, y, background_color, *args):
+    def __init__(self, display, game, x, y, background_color, *args):
         super().__init__(display, x, y)
 
+        self.game = game
         self.background_color = background_color
         self.parameters = args
+        self.method = Solver.METHOD
+        # Считать ли вместе с уравнениями бой отдельных единиц (см. Agents)
+        self.agents = False
 
-        self.button1 = GameGUI.Button(game.display, x + 300, y + 200, 370, 40, "Регулярные армии", self.click_button1,
+        self.button1 = GameGUI.Button(display, x + 300, y + 200, 370, 40, "Регулярные армии", self.click_button1,
                                       **{"font_size": 36, "active_color": GameGUI.RED,
                                          "inactive_color": GameGUI.GREEN, "step": 100})
-        self.button2 = GameGUI.Button(game.display, x + 300, y + 250, 370, 40, "Регулярные и партизанские части",
+        self.button2 = GameGUI.Button(display, x + 300, y + 250, 370, 40, "Регулярные и партизанские части",
                                       self.click_button2, **{"font_size": 36, "active_color": GameGUI.RED,
                                                              "inactive_color": GameGUI.GREEN})
+        self.button3 = GameGUI.Button(display, x + 300, y + 350, 370, 40, self.METHODS[self.method],
+                                      self.click_button3, **{"font_size": 36, "active_color": GameGUI.RED,
+                                                             "inactive_color": GameGUI.GREEN, "step": 70})
+        self.button4 = GameGUI.Button(display, x + 300, y + 400, 370, 40, self.AGENTS[self.agents],
+                                      self.click_button4, **{"font_size": 36, "active_color": GameGUI.RED,
+                                                             "inactive_color": GameGUI.GREEN, "step": 30})
 
     def click_button1(self):
-        x, y, t = self.solveODE_1(*self.parameters)
-        size = 20
-        soldiery1 = [
-            Soldier(self.display, random.randint(0, DISPLAY_WIDTH - size), random.randint(200, DISPLAY_HEIGHT - size),
-                    GameGUI.BLUE, size) for i in range(self.parameters[0])]
-        soldiery2 = [
-            Soldier(self.display, random.randint(0, DISPLAY_WIDTH) - size, random.randint(200, DISPLAY_HEIGHT - size),
-                    GameGUI.RED, size) for i in range(self.parameters[4])]
-
-        army1 = Army(self.display, (0, DISPLAY_WIDTH - size, 200, DISPLAY_HEIGHT - size),
-                     "Регулярная армия", soldiery1, GameGUI.BLUE)
-        army2 = Army(self.display, (0, DISPLAY_WIDTH - size, 200, DISPLAY_HEIGHT - size),
-                     "Регулярная армия", soldiery2, GameGUI.RED)
-
-        game.objects.pop()
-
-        game.objects.append(
-            FightActionModel(self.display, 0, 0, GameGUI.GRAY, self.parameters, army1, army2, x, y, t))
+        self.show_battle(Solver.REGULAR)
 
     def click_button2(self):
-        x, y, t = self.solveODE_2(*self.parameters)
-        size = 20
-        soldiery1 = [
-            Soldier(self.display, random.randint(0, DISPLAY_WIDTH - size), random.randint(200, DISPLAY_HEIGHT - size),
-                    GameGUI.BLUE, size) for i in range(self.parameters[0])]
-        soldiery2 = [
-            Partisan(self.display, random.randint(0, DISPLAY_WIDTH - size), random.randint(200, DISPLAY_HEIGHT - size),
-                     GameGUI.RED, size) for i in range(self.parameters[4])]
-
-        army1 = Army(self.display, (0, DISPLAY_WIDTH - size, 200, DISPLAY_HEIGHT - size),
-                     "Регулярная армия", soldiery1, GameGUI.BLUE)
-        army2 = Army(self.display, (0, DISPLAY_WIDTH - size, 200, DISPLAY_HEIGHT - size),
-                     "Партизанские формирования", soldiery2, GameGUI.RED)
+        self.show_battle(Solver.PARTISAN)
 
-        game.objects.pop()
-        game.objects.append(
-            FightActionModel(self.display, 0, 0, GameGUI.GRAY, self.parameters, army1, army2, x, y, t))
+    def show_battle(self, model):
+        """Запускает расчет боя в отдельном потоке и переходит к экрану ожидания"""
 
-    def solveODE_1(self, x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, tau=1e-5):
-        """Вычисляет ход боевых действий между регулярными армиями"""
+        computation = Computation(self.parameters, model, self.method)
+        army1, army2 = armies(self.game, model, self.parameters)
+        agents = AgentComputation(self.parameters, model) if self.agents else None
 
-        t, x, y = [0], [x0], [y0]
+        self.game.objects.pop()
+        self.game.objects.append(Solving(self.display, self.game, 0, 0, GameGUI.BLUE, computation, army1, army2,
+                                         **{"agents": agents}))
 
-        while True:
-            t.append(t[-1] + tau)
+    def click_button3(self):
+        methods = list(self.METHODS)
+        self.method = methods[(methods.index(self.method) + 1) % len(methods)]
+        self.button3.message = self.METHODS[self.method]
 
-            x.append(x[-1] + (-alpha1 * x[-1] - beta1 * y[-1] + gamma1) * tau)
-            y.append(y[-1] + (-alpha2 * y[-1] - beta2 * x[-1] + gamma2) * tau)
+    def click_button4(self):
+        self.agents = not self.agents
+        self.button4.message = self.AGENTS[self.agents]
 
-            if x[-1] < 1 or y[-1] < 1:
-                if x[-1] < 1:
-                    x[-1] = 0
-                if y[-1] < 1:
-                    y[-1] = 0
-                return x, y, t
+    @staticmethod
+    def solveODE_1(*parameters, **options):
+        """Вычисляет ход боевых действий между регулярными армиями (см. Solver.solve, Cache)"""
 
-    def solveODE_2(self, x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, tau=1e-5):
-        """Вычисляет ход боевых действий между регулярной армией и партизанским соединением"""
+        return tuple(Cache.RESULTS.battle(parameters, **dict(options, model=Solver.REGULAR)))
 
-        t, x, y = [0], [x0], [y0]
+    @staticmethod
+    def solveODE_2(*parameters, **options):
+        """Вычисляет ход боевых действий между регулярной армией и партизанским соединением (см. Solver.solve, Cache)"""
 
-        while True:
-            t.append(t[-1] + tau)
-
-            x.append(x[-1] + (-alpha1 * x[-1] - beta1 * y[-1] + gamma1) * tau)
-            y.append(y[-1] + (-alpha2 * y[-1] - beta2 * x[-1] * y[-1] + gamma2) * tau)
-
-            if x[-1] < 1 or y[-1] < 1:
-                if x[-1] < 1:
-                    x[-1] = 0
-                if y[-1] < 1:
-                    y[-1] = 0
-                return x, y, t
+        return tuple(Cache.RESULTS.battle(parameters, **dict(options, model=Solver.PARTISAN)))
 
     def update(self):
         super().update()
@@ -317,25 +1184,42 @@ class ModelType(GameGUI.GameObject):
 
         self.button1.draw()
         self.button2.draw()
+        self.button3.draw()
+        self.button4.draw()
+
+    def redraw(self):
+        return GameGUI.refresh(self.display, self.background_color, self.button1, self.button2, self.button3,
+                               self.button4)
+
+    def widgets(self):
+        return [self.button1, self.button2, self.button3, self.button4]
 
 
 class InputtingParameters(GameGUI.GameObject):
-    __slots__ = ["background_color", "iter", "input_cell_titles", "input_cell", "button", "parameters"]
+    """
+    Ввод параметров по одному. Введенные параметры передаются в action (если задан),
+    иначе по ним выбирается модель (ModelType).
+    """
 
-    def __init__(self, display, x, y, background_color, *args):
+    __slots__ = ["game", "background_color", "iter", "input_cell_titles", "input_cell", "button", "parameters",
+                 "action"]
+
+    def __init__(self, display, game, x, y, background_color, *args, **kwargs):
         super().__init__(display, x, y)
 
+        self.game = game
         self.background_color = background_color
         self.iter = SimpleIterator(len(args) - 1)
         self.input_cell_titles = args[1:]
-        self.input_cell = GameGUI.NumberCell(game.display, x, y, 110, 40, args[0], game,
+        self.input_cell = GameGUI.NumberCell(display, x, y, 110, 40, args[0], game,
                                              **{"active_color": GameGUI.GREEN, "inactive_color": GameGUI.RED,
                                                 "font_size": 30})
 
-        self.button = GameGUI.Button(game.display, x-40, y + 105, 185, 45, "Ввести параметр", self.input_parameters,
+        self.button = GameGUI.Button(display, x-40, y + 105, 185, 45, "Ввести параметр", self.input_parameters,
                                      **{"font_size": 36, "active_color": GameGUI.RED,
                                         "inactive_color": GameGUI.GREEN})
         self.parameters = []
+        self.action = kwargs.get("action", None)
 
     def input_parameters(self):
         if self.input_cell.number.message:
@@ -346,11 +1230,13 @@ class InputtingParameters(GameGUI.GameObject):
                 self.input_cell.title.message = self.input_cell_titles[next(self.iter)]
 
             except StopIteration:
-                game.objects.pop()
-
-                game.objects.append(ModelType(game.display, 0, 0, GameGUI.BLUE, *self.parameters))
+                self.game.objects.pop()
 
-                pygame.time.delay(1000)
+                if self.action is not None:
+                    self.action(self.parameters)
+                else:
+                    self.game.objects.append(ModelType(self.display, self.game, 0, 0, GameGUI.BLUE,
+                                                       *self.parameters))
 
     def update(self):
         self.input_cell.update()
@@ -361,12 +1247,47 @@ class InputtingParameters(GameGUI.GameObject):
         self.input_cell.draw()
         self.button.draw()
 
+    def redraw(self):
+        return GameGUI.refresh(self.display, self.background_color, self.input_cell, self.button)
+
+    def widgets(self):
+        return [self.button]
+
+
+def armies(game, model, parameters):
+    """Армии обеих сторон для показа боя модели model"""
+
+    width, height = game.display_width, game.display_height
+    size = 20
+    position = (0, width - size, 200, height - size)
+    warrior2, name2 = (Partisan, "Партизанские формирования") if model == Solver.PARTISAN \
+        else (Soldier, "Регулярная армия")
+
+    army1 = Army(game.display, position, "Регулярная армия", Soldier(game.display, 0, 0, GameGUI.BLUE, size),
+                 round(parameters[0]), GameGUI.BLUE)
+    army2 = Army(game.display, position, name2, warrior2(game.display, 0, 0, GameGUI.RED, size),
+                 round(parameters[4]), GameGUI.RED)
+
+    return army1, army2
+
 
-def new_model():
+def replay(game, path=Store.LAST):
+    """Показывает записанный бой (см. Store) без расчета: столбцы читаются прямо из файла"""
+
+    if not os.path.exists(path):
+        return
+
+    battle = Store.load(path)
+    army1, army2 = armies(game, battle.model, battle.parameters)
+
+    game.objects.append(FightActionModel(game.display, game, 0, 0, GameGUI.GRAY, battle, army1, army2))
+
+
+def new_model(game):
     game.objects.append(InputtingParameters(
-        game.display, int((game.display_width - 110) / 2),
+        game.display, game, int((game.display_width - 110) / 2),
         int(game.display_height / 2) - 120, GameGUI.BLUE,
-        *["N1(0)", "alpha1", "beta1", "gamma1", "N2(0)", "alpha2", "beta2", "gamma2"])
+        *Solver.PARAMETERS)
     )
 
 
@@ -374,13 +1295,19 @@ if __name__ == "__main__":
     DISPLAY_WIDTH = 1000
     DISPLAY_HEIGHT = 600
 
-    game = GameGUI.Game("Боевые действия двух армий", DISPLAY_WIDTH, DISPLAY_HEIGHT)
+    game = GameGUI.Game("Боевые действия двух армий", DISPLAY_WIDTH, DISPLAY_HEIGHT, stats=Cache.RESULTS.stats)
 
     menu = GameGUI.Menu(game.display, 0, 200, DISPLAY_WIDTH, DISPLAY_HEIGHT,
                         (
-                            GameGUI.Button(game.display, 0, 0, 210, 40, "Ввести параметры", new_model,
+                            GameGUI.Button(game.display, 0, 0, 210, 40, "Ввести параметры", lambda: new_model(game),
+                                           **{"font_size": 36, "active_color": GameGUI.RED,
+                                              "inactive_color": GameGUI.GREEN}),
+                            GameGUI.Button(game.display, 0, 0, 210, 40, "Несколько армий", lambda: new_forces(game),
                                            **{"font_size": 36, "active_color": GameGUI.RED,
                                               "inactive_color": GameGUI.GREEN}),
+                            GameGUI.Button(game.display, 0, 0, 210, 40, "Последний бой", lambda: replay(game),
+                                           **{"font_size": 36, "active_color": GameGUI.RED,
+                                              "inactive_color": GameGUI.GREEN, "step": 25}),
                             GameGUI.Button(game.display, 0, 0, 210, 40, "Выйти", quit,
                                            **{"font_size": 36, "active_color": GameGUI.RED,
                                               "inactive_color": GameGUI.GREEN, "step": 70})
@@ -0,0 +1,218 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import Solver
+
+
+# Плитка - квадрат TILE x TILE клеток сетки начальных численностей
+TILE = 64
+
+# Клеток на сторону видимой области; уровень 0 в 2 ** COARSE раз грубее и в фоне считается первым
+RESOLUTION = 1000
+COARSE = 3
+
+# Плиток в одном пакетном расчете и память под плитки
+BATCH = 16
+CAPACITY = 64 << 20
+
+
+class OutcomeMap:
+    """
+    Исходы боя на сетке начальных численностей (N1(0), N2(0)) при фиксированных коэффициентах rates
+    (alpha1, beta1, gamma1, alpha2, beta2, gamma2): победитель и время окончания для каждой клетки.
+
+    Область [0, extent[0]] x [0, extent[1]] на уровне level делится на cells(level) клеток по каждой оси,
+    клетки - на плитки по TILE x TILE. Каждый следующий уровень вдвое подробнее, так что при приближении
+    досчитываются только плитки видимой части, а посчитанные остаются в кэше (не больше capacity байт,
+    давно не использованные вытесняются). Клетки всех плиток одного расчета считаются одним вызовом Solver.batch.
+    """
+
+    __slots__ = ["rates", "model", "extent", "resolution", "capacity", "options", "tiles", "size", "version",
+                 "generation", "pending", "lock"]
+
+    def __init__(self, rates, model=Solver.REGULAR, extent=(1000, 1000), resolution=RESOLUTION, capacity=CAPACITY,
+                 **options):
+        self.rates = tuple(rates)
+        self.model = model
+        self.extent = extent
+        self.resolution = resolution
+        self.capacity = capacity
+        # Настройки Solver.batch
+        self.options = options
+
+        # (уровень, i, j) -> (время окончания, победитель); порядок - от давно использованных к недавним
+        self.tiles = OrderedDict()
+        self.size = 0
+        # Растет при каждой новой плитке: по нему видно, что карту пора перерисовать
+        self.version = 0
+
+        # Номер последнего запроса на досчет (см. refine) и сколько плиток он еще не посчитал
+        self.generation = 0
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def cells(self, level):
+        """Число клеток по каждой оси на уровне level"""
+
+        return self.resolution * 2 ** level >> COARSE
+
+    def level(self, view):
+        """Уровень, на котором в видимой области view = (x0, x1, y0, y1) не меньше resolution клеток по каждой оси"""
+
+        x0, x1, y0, y1 = view
+        zoom = max(self.extent[0] / (x1 - x0), self.extent[1] / (y1 - y0))
+
+        return COARSE + max(int(np.ceil(np.log2(zoom) - 1e-9)), 0)
+
+    def columns(self, level, low, high, axis):
+        """Номера клеток уровня level по оси axis для точек от low до high"""
+
+        size = self.extent[axis] / self.cells(level)
+
+        return np.clip(np.floor(np.asarray(low) / size).astype(np.int64), 0, self.cells(level) - 1), \
+            np.clip(np.floor(np.asarray(high) / size).astype(np.int64), 0, self.cells(level) - 1)
+
+    def covering(self, level, view):
+        """Плитки уровня level, покрывающие область view: от центра области к краям"""
+
+        x0, x1, y0, y1 = view
+        (i0, i1), (j0, j1) = self.columns(level, x0, x1, 0), self.columns(level, y0, y1, 1)
+        i0, i1, j0, j1 = i0 // TILE, i1 // TILE, j0 // TILE, j1 // TILE
+
+        keys = [(level, i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+        keys.sort(key=lambda key: (key[1] - (i0 + i1) / 2) ** 2 + (key[2] - (j0 + j1) / 2) ** 2)
+
+        return keys
+
+    def compute(self, keys):
+        """Считает плитки keys одним пакетом и кладет их в кэш"""
+
+        if not keys:
+            return
+
+        rows = []
+        for level, i, j in keys:
+            cells = self.cells(level)
+            x = (np.arange(i * TILE, (i + 1) * TILE) + 0.5) * self.extent[0] / cells
+            y = (np.arange(j * TILE, (j + 1) * TILE) + 0.5) * self.extent[1] / cells
+            x, y = np.meshgrid(x, y, indexing="ij")
+            rows.append((x.ravel(), y.ravel()))
+
+        x = np.concatenate([row[0] for row in rows])
+        y = np.concatenate([row[1] for row in rows])
+        alpha1, beta1, gamma1, alpha2, beta2, gamma2 = self.rates
+
+        parameters = np.empty((len(x), 8))
+        parameters[:, 0], parameters[:, 4] = x, y
+        parameters[:, [1, 2, 3, 5, 6, 7]] = alpha1, beta1, gamma1, alpha2, beta2, gamma2
+
+        result = Solver.batch(parameters, self.model, **self.options)
+        end = result.end.astype(np.float32).reshape(len(keys), TILE, TILE)
+        winner = result.winner.reshape(len(keys), TILE, TILE)
+
+        with self.lock:
+            for n, key in enumerate(keys):
+                self.remember(key, (end[n], winner[n]))
+            self.version += 1
+
+    def remember(self, key, tile):
+        """Кладет плитку в кэш, вытесняя давно не использованные (вызывается под lock)"""
+
+        if key in self.tiles:
+            return
+
+        self.tiles[key] = tile
+        self.size += tile[0].nbytes + tile[1].nbytes
+
+        while self.size > self.capacity and len(self.tiles) > 1:
+            end, winner = self.tiles.popitem(last=False)[1]
+            self.size -= end.nbytes + winner.nbytes
+
+    def missing(self, keys):
+        with self.lock:
+            return [key for key in keys if key not in self.tiles]
+
+    def refine(self, view):
+        """
+        Досчитывает в отдельном потоке плитки области view от грубого уровня к нужному.
+
+        Возвращается сразу: грубый уровень 0 считается первым в том же потоке, а до тех пор sample отдает
+        winner = -1. Новый запрос отменяет прежний: его поток останавливается после текущего пакета.
+        """
+
+        keys = [key for level in range(self.level(view) + 1) for key in self.covering(level, view)]
+        keys = self.missing(keys)
+
+        with self.lock:
+            self.generation += 1
+            self.pending = len(keys)
+            generation = self.generation
+
+        if keys:
+            threading.Thread(target=self.run, args=(keys, generation), daemon=True).start()
+
+    def run(self, keys, generation):
+        for start in range(0, len(keys), BATCH):
+            if self.generation != generation:
+                return
+
+            self.compute(self.missing(keys[start:start + BATCH]))
+
+            with self.lock:
+                if self.generation == generation:
+                    self.pending = max(len(keys) - start - BATCH, 0)
+
+    def cancel(self):
+        """Останавливает фоновый досчет"""
+
+        with self.lock:
+            self.generation += 1
+            self.pending = 0
+
+    def busy(self):
+        return self.pending > 0
+
+    def sample(self, view, width, height):
+        """
+        Исходы в центрах пикселей картинки width x height, показывающей область view (ось N2 - вверх).
+
+        Возвращает массивы (время окончания, победитель) формы (width, height). Для каждого пикселя берется
+        самый подробный из посчитанных уровней; пиксели, для которых ничего не посчитано, получают winner = -1.
+        """
+
+        x0, x1, y0, y1 = view
+        x = x0 + (np.arange(width) + 0.5) * (x1 - x0) / width
+        y = y1 - (np.arange(height) + 0.5) * (y1 - y0) / height
+
+        end = np.full((width, height), np.inf, dtype=np.float32)
+        winner = np.full((width, height), -1, dtype=np.int8)
+        filled = np.zeros((width, height), dtype=bool)
+
+        for level in range(self.level(view), -1, -1):
+            i, j = self.columns(level, x, x, 0)[0], self.columns(level, y, y, 1)[0]
+            # i растет, а j убывает вдоль картинки, так что пиксели одной плитки идут подряд
+            column_tiles, row_tiles = i // TILE, j // TILE
+            column_starts = np.flatnonzero(np.r_[True, column_tiles[1:] != column_tiles[:-1]])
+            row_starts = np.flatnonzero(np.r_[True, row_tiles[1:] != row_tiles[:-1]])
+
+            for a, b in zip(column_starts, np.r_[column_starts[1:], width]):
+                for c, d in zip(row_starts, np.r_[row_starts[1:], height]):
+                    with self.lock:
+                        tile = self.tiles.get((level, int(column_tiles[a]), int(row_tiles[c])))
+                        if tile is not None:
+                            self.tiles.move_to_end((level, int(column_tiles[a]), int(row_tiles[c])))
+                    if tile is None:
+                        continue
+
+                    block = np.ix_(i[a:b] % TILE, j[c:d] % TILE)
+                    empty = ~filled[a:b, c:d]
+                    end[a:b, c:d][empty] = tile[0][block][empty]
+                    winner[a:b, c:d][empty] = tile[1][block][empty]
+                    filled[a:b, c:d] = True
+
+            if filled.all():
+                break
+
+        return end, winner
@@ -0,0 +1,1177 @@
+import numpy as np
+
+
+REGULAR = "regular"
+PARTISAN = "partisan"
+
+PARAMETERS = ("N1(0)", "alpha1", "beta1", "gamma1", "N2(0)", "alpha2", "beta2", "gamma2")
+
+EULER = "euler"
+ADAPTIVE = "adaptive"
+ANALYTIC = "analytic"
+
+# Бой, не закончившийся к моменту HORIZON или пришедший в равновесие (скорость изменения численностей
+# не больше STEADY * (1 + N)), останавливается без победителя
+HORIZON = 1000
+STEADY = 1e-6
+
+# Метод и шаг, которыми бой считается по умолчанию - в окне программы и в Sweep
+METHOD = EULER
+TAU = 1e-5
+
+# Версия решателей: увеличивается при любом изменении, от которого меняются результаты (см. Cache)
+VERSION = 2
+
+# Метод Дормана-Принса 5(4): узлы, матрица Бутчера, веса решения 5-го порядка
+# и разность весов 5-го и 4-го порядков для оценки ошибки шага
+DOPRI_C = (0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1)
+DOPRI_A = ((),
+           (1 / 5,),
+           (3 / 40, 9 / 40),
+           (44 / 45, -56 / 15, 32 / 9),
+           (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+           (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656))
+DOPRI_B = (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84)
+DOPRI_E = (71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40)
+
+# Непрерывное продолжение 4-го порядка: z(t + theta * h) = z + h * sum(k[i] * P[i] . (theta, ..., theta^4))
+DOPRI_P = ((1, -8048581381 / 2820520608, 8663915743 / 2820520608, -12715105075 / 11282082432),
+           (0, 0, 0, 0),
+           (0, 131558114200 / 32700410799, -68118460800 / 10900136933, 87487479700 / 32700410799),
+           (0, -1754552775 / 470086768, 14199869525 / 1410260304, -10690763975 / 1880347072),
+           (0, 127303824393 / 49829197408, -318862633887 / 49829197408, 701980252875 / 199316789632),
+           (0, -282668133 / 205662961, 2019193451 / 616988883, -1453857185 / 822651844),
+           (0, 40617522 / 29380423, -110615467 / 29380423, 69997945 / 29380423))
+
+
+class Trajectory:
+    """
+    Растущие буферы для хранения хода боевых действий.
+
+    Пока расчет идет в другом потоке, result() возвращает уже посчитанную часть;
+    если выставить cancelled, расчет остановится и вернет то, что успел посчитать.
+    """
+
+    __slots__ = ["t", "x", "y", "size", "cancelled"]
+
+    def __init__(self, capacity=1 << 16, dtype=np.float64):
+        self.t = np.empty(capacity, dtype)
+        self.x = np.empty(capacity, dtype)
+        self.y = np.empty(capacity, dtype)
+        self.size = 0
+        self.cancelled = False
+
+    def reserve(self, capacity):
+        """Увеличивает буферы (вдвое) так, чтобы в них поместилось capacity значений"""
+
+        if capacity <= len(self.t):
+            return
+
+        new_capacity = len(self.t)
+        while new_capacity < capacity:
+            new_capacity *= 2
+
+        for name in ("t", "x", "y"):
+            old = getattr(self, name)
+            new = np.empty(new_capacity, old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def extend(self, t, x, y):
+        """Дописывает в конец буферов очередной участок траектории"""
+
+        end = self.size + len(t)
+        self.reserve(end)
+
+        self.t[self.size:end] = t
+        self.x[self.size:end] = x
+        self.y[self.size:end] = y
+        self.size = end
+
+    def append(self, t, x, y):
+        """Дописывает в конец буферов одно значение"""
+
+        if self.size == len(self.t):
+            self.reserve(self.size + 1)
+
+        self.t[self.size] = t
+        self.x[self.size] = x
+        self.y[self.size] = y
+        self.size += 1
+
+    def result(self):
+        """Возвращает заполненную часть буферов в виде (x, y, t)"""
+
+        # Размер читается до буферов: при расширении данные сначала копируются в новые буферы,
+        # и лишь потом увеличивается size, так что в любых прочитанных буферах есть size значений
+        size = self.size
+        return self.x[:size], self.y[:size], self.t[:size]
+
+
+def first_defeat(x, y):
+    """Возвращает первый индекс, на котором одна из сторон опустилась ниже 1 (или None)"""
+
+    defeat = (x < 1) | (y < 1)
+    index = int(np.argmax(defeat))
+
+    return index if defeat[index] else None
+
+
+class RegularEuler:
+    """
+    Схема Эйлера для двух регулярных армий.
+
+    Один шаг схемы - аффинное отображение z[n+1] = A z[n] + b с постоянными A и b,
+    поэтому степени A для блока шагов вычисляются один раз и затем применяются ко всему блоку сразу.
+    Таблица степеней удваивается по мере продолжения боя, пока не достигнет max_steps.
+    """
+
+    __slots__ = ["max_steps", "table", "size"]
+
+    def __init__(self, alpha1, beta1, gamma1, alpha2, beta2, gamma2, tau, max_steps):
+        # Длина блока ограничена ростом степеней A, чтобы не терять точность на вычитании
+        growth = max(np.sqrt(abs(beta1 * beta2)), abs(alpha1), abs(alpha2), 1e-12)
+        self.max_steps = int(min(max(2 / (growth * tau), 64), max_steps))
+
+        # Строки таблицы: A[0, 0], A[0, 1], A[1, 0], A[1, 1], b[0], b[1] для степеней 1..size.
+        # y[n+1] считается по уже обновленному x[n+1], как и в исходном цикле
+        self.table = np.empty((6, self.max_steps))
+        self.table[:, 0] = (1 - alpha1 * tau, -beta1 * tau,
+                            -beta2 * tau * (1 - alpha1 * tau), 1 - alpha2 * tau + beta1 * beta2 * tau ** 2,
+                            gamma1 * tau, (gamma2 - beta2 * gamma1 * tau) * tau)
+        self.size = 1
+
+        self.grow(min(1024, self.max_steps))
+
+    def grow(self, size):
+        """Удваивает таблицу степеней: z[m+k] = A^k (A^m z0 + b[m]) + b[k]"""
+
+        while self.size < size:
+            m = self.size
+            k = min(m, self.max_steps - m)
+
+            xx, xy, yx, yy, x1, y1 = self.table[:, :k]
+            mxx, mxy, myx, myy, mx1, my1 = self.table[:, m - 1]
+            new = self.table[:, m:m + k]
+
+            new[0] = xx * mxx + xy * myx
+            new[1] = xx * mxy + xy * myy
+            new[2] = yx * mxx + yy * myx
+            new[3] = yx * mxy + yy * myy
+            new[4] = xx * mx1 + xy * my1 + x1
+            new[5] = yx * mx1 + yy * my1 + y1
+
+            self.size = m + k
+
+    def advance(self, x0, y0):
+        """Делает блок шагов из состояния (x0, y0)"""
+
+        xx, xy, yx, yy, x1, y1 = self.table[:, :self.size]
+        xs, ys = xx * x0 + xy * y0 + x1, yx * x0 + yy * y0 + y1
+
+        self.grow(min(2 * self.size, self.max_steps))
+
+        return xs, ys
+
+
+class PartisanEuler:
+    """
+    Схема Эйлера для регулярной армии против партизан.
+
+    Внутри блока x и y по очереди пересчитываются друг через друга (итерации по блоку),
+    каждое пересчитывание - линейная рекуррента, которая решается без цикла по шагам.
+    Самое дорогое в итерации - накопленные суммы и произведения, поэтому итераций стараются сделать
+    как можно меньше: начальное приближение y берется из ряда Тейлора второго порядка, а итерации
+    заканчиваются, как только оценка следующей поправки (по скорости убывания поправок) меньше допуска.
+    """
+
+    TOLERANCE = 1e-12
+
+    __slots__ = ["alpha1", "beta1", "gamma1", "alpha2", "beta2", "gamma2", "tau", "max_steps"]
+
+    def __init__(self, alpha1, beta1, gamma1, alpha2, beta2, gamma2, tau, max_steps):
+        self.alpha1, self.beta1, self.gamma1 = alpha1, beta1, gamma1
+        self.alpha2, self.beta2, self.gamma2 = alpha2, beta2, gamma2
+        self.tau = tau
+        self.max_steps = max_steps
+
+    def steps(self, x0, y0):
+        """Подбирает длину блока так, чтобы итерации сходились за несколько проходов"""
+
+        coupling = np.sqrt(abs(self.beta1 * self.beta2 * y0))
+        decay = abs(self.alpha2) + abs(self.beta2 * x0)
+        duration = min(0.06 / max(coupling, 1e-12), 200 / max(decay, 1e-12))
+
+        return int(min(max(duration / self.tau, 64), self.max_steps))
+
+    def guess(self, x0, y0, t):
+        """Значения y в моменты t от начала блока по ряду Тейлора второго порядка"""
+
+        dx = -self.alpha1 * x0 - self.beta1 * y0 + self.gamma1
+        dy = -self.alpha2 * y0 - self.beta2 * x0 * y0 + self.gamma2
+        ddy = -(self.alpha2 + self.beta2 * x0) * dy - self.beta2 * dx * y0
+
+        return y0 + t * (dy + t * (ddy / 2))
+
+    def advance(self, x0, y0):
+        """Делает блок шагов из состояния (x0, y0)"""
+
+        tau = self.tau
+        steps = self.steps(x0, y0)
+
+        # x = px * (x0 + cumsum((gamma1 - beta1 * y_prev) * tau / px)), где px[n] = (1 - alpha1 * tau)^(n + 1);
+        # часть без y_prev (сумма геометрической прогрессии) считается один раз
+        t = np.arange(1, steps + 1) * tau
+        px = np.exp(t * (np.log1p(-self.alpha1 * tau) / tau))
+        base = px * x0
+        if self.gamma1:
+            base += self.gamma1 / self.alpha1 * (1 - px) if self.alpha1 else self.gamma1 * t
+        weight = self.beta1 * tau / px
+
+        y = self.guess(x0, y0, t)
+        # Промежуточные массивы переиспользуются между итерациями
+        y_prev, x, work = np.empty(steps), np.empty(steps), np.empty(steps)
+        previous = None
+
+        def scan_x():
+            y_prev[0] = y0
+            y_prev[1:] = y[:-1]
+            np.multiply(y_prev, weight, out=work)
+            np.cumsum(work, out=work)
+            np.multiply(px, work, out=x)
+            np.subtract(base, x, out=x)
+
+        with np.errstate(all="ignore"):
+            while True:
+                scan_x()
+
+                # Множители 1 - (alpha2 + beta2 * x) * tau и их накопленные произведения
+                np.multiply(x, -self.beta2 * tau, out=work)
+                work += 1 - self.alpha2 * tau
+                np.cumprod(work, out=work)
+                if self.gamma2:
+                    # Рекуррента y[n+1] = c[n] * y[n] + gamma2 * tau: y = py * (y0 + cumsum(gamma2 * tau / py))
+                    y_new = np.divide(self.gamma2 * tau, work)
+                    np.cumsum(y_new, out=y_new)
+                    y_new += y0
+                    y_new *= work
+                else:
+                    y_new = work * y0
+
+                end = first_defeat(x, y_new)
+                end = steps if end is None else end + 1
+                # Масштаб по концам блока: если внутри блока y больше, допуск только строже
+                scale = self.TOLERANCE * max(1.0, abs(y0), abs(float(y_new[end - 1])))
+                np.subtract(y_new[:end], y[:end], out=work[:end])
+                change = float(np.max(np.abs(work[:end], out=work[:end])))
+
+                y = y_new
+                if change <= scale:
+                    return x, y
+
+                # Поправки убывают не медленнее геометрической прогрессии: следующая не больше change^2 / previous,
+                # так что y уже точен, и остается пересчитать по нему x. Переставшие убывать поправки -
+                # это уже ошибки округления
+                if previous is not None and (change * change <= scale * previous or change >= previous):
+                    scan_x()
+                    return x, y
+
+                previous = change
+
+
+def euler(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, model=REGULAR, tau=TAU,
+          dtype=np.float64, max_chunk=1 << 16, trajectory=None, horizon=np.inf, steady=0):
+    """
+    Вычисляет ход боевых действий явной схемой Эйлера с постоянным шагом tau.
+
+    Бой заканчивается, когда численность одной из сторон становится меньше 1, - она обнуляется.
+    Расчет также останавливается в момент horizon или при равновесии (см. settled).
+    Значения сохраняются в растущие массивы типа dtype (или в переданный trajectory).
+    Возвращает массивы (x, y, t).
+    """
+
+    scheme = (PartisanEuler if model == PARTISAN else RegularEuler)(
+        alpha1, beta1, gamma1, alpha2, beta2, gamma2, tau, max_chunk)
+    f = derivatives((alpha1, beta1, gamma1, alpha2, beta2, gamma2), model)
+    last = int(np.ceil(horizon / tau - 1e-6)) if horizon < np.inf else None
+
+    trajectory = Trajectory(dtype=dtype) if trajectory is None else trajectory
+    trajectory.extend((0.0,), (x0,), (y0,))
+
+    x, y, n = float(x0), float(y0), 0
+
+    while not trajectory.cancelled:
+        xs, ys = scheme.advance(x, y)
+        if last is not None:
+            xs, ys = xs[:last - n], ys[:last - n]
+
+        end = first_defeat(xs, ys)
+        if end is not None:
+            xs, ys = xs[:end + 1], ys[:end + 1]
+            xs[-1] = 0 if xs[-1] < 1 else xs[-1]
+            ys[-1] = 0 if ys[-1] < 1 else ys[-1]
+
+        trajectory.extend(np.arange(n + 1, n + 1 + len(xs)) * tau, xs, ys)
+
+        x, y, n = xs[-1], ys[-1], n + len(xs)
+
+        if end is not None or n == last or settled(x, y, *f(x, y), steady):
+            break
+
+    return trajectory.result()
+
+
+def derivatives(params, model):
+    """Возвращает правую часть системы уравнений для скалярных x, y"""
+
+    alpha1, beta1, gamma1, alpha2, beta2, gamma2 = params
+
+    if model == PARTISAN:
+        return lambda x, y: (-alpha1 * x - beta1 * y + gamma1, -alpha2 * y - beta2 * x * y + gamma2)
+
+    return lambda x, y: (-alpha1 * x - beta1 * y + gamma1, -alpha2 * y - beta2 * x + gamma2)
+
+
+def settled(x, y, dx, dy, steady):
+    """Пришел ли бой в равновесие: скорость изменения численностей (dx, dy) не больше steady * (1 + N)"""
+
+    return abs(dx) <= steady * (1 + abs(x)) and abs(dy) <= steady * (1 + abs(y))
+
+
+def dopri_step(f, x, y, k1, h):
+    """Делает шаг h методом Дормана-Принса. Возвращает новое состояние, все стадии и оценку ошибки"""
+
+    k = [k1]
+    for c, a in zip(DOPRI_C[1:], DOPRI_A[1:]):
+        k.append(f(x + h * sum(ai * ki[0] for ai, ki in zip(a, k)),
+                   y + h * sum(ai * ki[1] for ai, ki in zip(a, k))))
+
+    x_new = x + h * sum(b * ki[0] for b, ki in zip(DOPRI_B, k))
+    y_new = y + h * sum(b * ki[1] for b, ki in zip(DOPRI_B, k))
+    k.append(f(x_new, y_new))
+
+    error_x = h * sum(e * ki[0] for e, ki in zip(DOPRI_E, k))
+    error_y = h * sum(e * ki[1] for e, ki in zip(DOPRI_E, k))
+
+    return x_new, y_new, k, error_x, error_y
+
+
+def interpolant(x, y, k, h):
+    """Строит многочлены непрерывного продолжения шага для x и y как функции от theta из [0, 1]"""
+
+    qx = [h * sum(ki[0] * p[j] for ki, p in zip(k, DOPRI_P)) for j in range(4)]
+    qy = [h * sum(ki[1] * p[j] for ki, p in zip(k, DOPRI_P)) for j in range(4)]
+
+    def polynomial(z, q):
+        return lambda theta: z + theta * (q[0] + theta * (q[1] + theta * (q[2] + theta * q[3])))
+
+    return polynomial(x, qx), polynomial(y, qy)
+
+
+def find_root(g, a, b, ga, gb, tolerance=1e-13):
+    """Находит корень g на отрезке [a, b] со сменой знака (метод Иллинойса)"""
+
+    side = 0
+    c = b
+
+    for _ in range(100):
+        c = (a * gb - b * ga) / (gb - ga)
+        gc = g(c)
+
+        if abs(gc) <= tolerance or b - a <= tolerance:
+            break
+
+        if gc * gb > 0:
+            b, gb = c, gc
+            if side == -1:
+                ga /= 2
+            side = -1
+        else:
+            a, ga = c, gc
+            if side == 1:
+                gb /= 2
+            side = 1
+
+    return c
+
+
+def adaptive(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, model=REGULAR, rtol=1e-8, atol=1e-8,
+             dtype=np.float64, trajectory=None, horizon=np.inf, steady=0):
+    """
+    Вычисляет ход боевых действий методом Рунге-Кутты 5(4) с автоматическим выбором шага.
+
+    Момент, когда численность одной из сторон становится равной 1, ищется как корень
+    непрерывного продолжения последнего шага, так что время окончания боя получается точным.
+    Расчет также останавливается в момент horizon или при равновесии (см. settled).
+    Возвращает массивы (x, y, t) в узлах принятых шагов.
+    """
+
+    f = derivatives((alpha1, beta1, gamma1, alpha2, beta2, gamma2), model)
+
+    trajectory = Trajectory(capacity=1024, dtype=dtype) if trajectory is None else trajectory
+    t, x, y = 0.0, float(x0), float(y0)
+
+    # Сторона, у которой с самого начала меньше 1, уже уничтожена (как в euler): бой кончается в момент 0
+    if x < 1 or y < 1:
+        trajectory.append(t, 0 if x < 1 else x, 0 if y < 1 else y)
+        return trajectory.result()
+
+    trajectory.append(t, x, y)
+    k1 = f(x, y)
+
+    scale = max(abs(x), abs(y)) * rtol + atol
+    speed = max(abs(k1[0]), abs(k1[1])) * rtol + atol
+    h = 0.01 * scale / speed
+
+    while not trajectory.cancelled and t < horizon and not settled(x, y, *k1, steady):
+        h = min(h, horizon - t)
+        x_new, y_new, k, error_x, error_y = dopri_step(f, x, y, k1, h)
+
+        error = np.sqrt(((error_x / (atol + rtol * max(abs(x), abs(x_new)))) ** 2 +
+                         (error_y / (atol + rtol * max(abs(y), abs(y_new)))) ** 2) / 2)
+
+        if error > 1:
+            h *= max(0.2, 0.9 * error ** -0.2)
+            continue
+
+        if x_new < 1 or y_new < 1:
+            px, py = interpolant(x, y, k, h)
+
+            # Корень ищется только там, где сторона на этом шаге пересекла 1 сверху вниз
+            theta_x = find_root(lambda theta: px(theta) - 1, 0, 1, x - 1, x_new - 1) if x_new < 1 <= x else 1
+            theta_y = find_root(lambda theta: py(theta) - 1, 0, 1, y - 1, y_new - 1) if y_new < 1 <= y else 1
+            theta = min(theta_x, theta_y)
+
+            x_end = 0 if x_new < 1 and theta_x == theta or px(theta) < 1 else px(theta)
+            y_end = 0 if y_new < 1 and theta_y == theta or py(theta) < 1 else py(theta)
+
+            trajectory.append(t + theta * h, x_end, y_end)
+            return trajectory.result()
+
+        t, x, y, k1 = t + h, x_new, y_new, k[-1]
+        trajectory.append(t, x, y)
+
+        h *= min(10, 0.9 * error ** -0.2) if error > 0 else 10
+
+    return trajectory.result()
+
+
+class ClosedForm:
+    """
+    Точное решение модели регулярных армий z' = M z + g.
+
+    Так как z'(t) = exp(M t) z'(0), то z(t) = z0 + Phi(t) z'(0), где Phi(t) - интеграл exp(M u) по [0, t].
+    Обе матричные функции для матрицы 2x2 выражаются через ее собственные числа s +- d:
+    f(M) = f_c I + f_s (M - s I). Требует вещественных собственных чисел, т.е. d^2 >= 0.
+    """
+
+    __slots__ = ["x0", "y0", "s", "d", "u", "v"]
+
+    def __init__(self, x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2):
+        self.x0, self.y0 = float(x0), float(y0)
+
+        self.s = -(alpha1 + alpha2) / 2
+        self.d = np.sqrt(self.discriminant(alpha1, beta1, alpha2, beta2))
+
+        # u = z'(0), v = (M - s I) z'(0)
+        self.u = (-alpha1 * x0 - beta1 * y0 + gamma1, -alpha2 * y0 - beta2 * x0 + gamma2)
+        self.v = ((alpha2 - alpha1) / 2 * self.u[0] - beta1 * self.u[1],
+                  -beta2 * self.u[0] + (alpha1 - alpha2) / 2 * self.u[1])
+
+    @staticmethod
+    def discriminant(alpha1, beta1, alpha2, beta2):
+        """Квадрат полуразности собственных чисел матрицы системы"""
+
+        return (alpha1 - alpha2) ** 2 / 4 + beta1 * beta2
+
+    @staticmethod
+    def phi(rate, t):
+        """Интеграл exp(rate * u) по [0, t]"""
+
+        return np.expm1(rate * t) / rate if rate else t
+
+    def integrals(self, t):
+        """Коэффициенты Phi(t) = c I + s (M - s I)"""
+
+        s, d = self.s, self.d
+
+        with np.errstate(all="ignore"):
+            if d:
+                phi1, phi2 = self.phi(s + d, t), self.phi(s - d, t)
+                return (phi1 + phi2) / 2, (phi1 - phi2) / (2 * d)
+
+            if s:
+                return self.phi(s, t), (np.exp(s * t) * (s * t - 1) + 1) / s ** 2
+
+            return t, t ** 2 / 2
+
+    def __call__(self, t):
+        """Численности сторон в моменты t (число или массив)"""
+
+        c, s = self.integrals(np.asarray(t, dtype=np.float64))
+
+        return self.x0 + c * self.u[0] + s * self.v[0], self.y0 + c * self.u[1] + s * self.v[1]
+
+    def derivative(self, t):
+        """Скорости изменения численностей в моменты t: z'(t) = exp(M t) z'(0)"""
+
+        t = np.asarray(t, dtype=np.float64)
+        s, d = self.s, self.d
+
+        # exp(M t) = c I + k (M - s I); через экспоненты собственных чисел, чтобы не переполнялись cosh и sinh
+        with np.errstate(all="ignore"):
+            if d:
+                fast, slow = np.exp((s + d) * t), np.exp((s - d) * t)
+                c, k = (fast + slow) / 2, (fast - slow) / (2 * d)
+            else:
+                c = np.exp(s * t)
+                k = c * t
+
+        return c * self.u[0] + k * self.v[0], c * self.u[1] + k * self.v[1]
+
+    def settling(self, steady, stop, points=4097):
+        """Первый момент до stop, в который бой приходит в равновесие (см. settled), или None"""
+
+        def calm(t):
+            x, y = self(t)
+            dx, dy = self.derivative(t)
+            return (np.abs(dx) <= steady * (1 + np.abs(x))) & (np.abs(dy) <= steady * (1 + np.abs(y)))
+
+        t = np.linspace(0, stop, points)
+        found = calm(t)
+        if not found.any():
+            return None
+
+        i = int(np.argmax(found))
+        if i == 0:
+            return 0.0
+
+        lo, hi = t[i - 1], t[i]
+        for _ in range(60):
+            middle = (lo + hi) / 2
+            lo, hi = (lo, middle) if calm(middle) else (middle, hi)
+
+        return hi
+
+    def extremum(self, i):
+        """Момент t > 0, в который производная i-й компоненты обращается в ноль (или None)"""
+
+        u, v, d = self.u[i], self.v[i], self.d
+
+        with np.errstate(all="ignore"):
+            if d:
+                ratio = -(u - v / d) / (u + v / d)
+                t = np.log(ratio) / (2 * d) if ratio > 0 else None
+            else:
+                t = -u / v if v else None
+
+        return t if t is not None and 0 < t < np.inf else None
+
+    def limit(self):
+        """Момент, дальше которого растущая экспонента решения близка к переполнению (inf, если роста нет)"""
+
+        largest = self.s + self.d
+
+        return 600 / largest if largest > 0 else np.inf
+
+    def crossing(self, i, horizon=1e6):
+        """Первый момент, в который i-я компонента опускается до 1 (или None); 0, если она меньше 1 с самого начала"""
+
+        def g(t):
+            return float(self(t)[i]) - 1
+
+        # Компонента - сумма двух экспонент и константы: у нее не больше одного экстремума,
+        # так что между точками 0, extremum и horizon она монотонна
+        horizon = min(horizon, self.limit())
+
+        points = [0.0, self.extremum(i), horizon]
+        points = sorted(t for t in points if t is not None and t <= horizon)
+
+        lo, g_lo = points[0], g(points[0])
+        if g_lo < 0:
+            return 0.0
+
+        for end in points[1:]:
+            # Отрезок [lo, end] монотонен: ищем смену знака, удваивая шаг
+            step = min(end - lo, 1 / max(abs(self.s) + self.d, 1e-6))
+            while lo < end:
+                hi = min(lo + step, end)
+                g_hi = g(hi)
+
+                if g_hi < 0 <= g_lo:
+                    return find_root(g, lo, hi, g_lo, g_hi, 1e-12)
+
+                lo, g_lo, step = hi, g_hi, step * 2
+
+        return None
+
+    def end(self):
+        """Время окончания боя (или None, если ни одна сторона не опускается до 1)"""
+
+        times = [t for t in (self.crossing(0), self.crossing(1)) if t is not None]
+
+        return min(times) if times else None
+
+    def stop(self, end, horizon, steady):
+        """
+        Момент, на котором расчет останавливается, как и у численных методов: окончание боя end, horizon
+        или равновесие (см. settled) - что раньше, но не позже limit(). None, если ничего из этого не наступает.
+        """
+
+        stop = min([t for t in (end, horizon) if t is not None] + [self.limit()])
+        if stop == np.inf:
+            return None
+
+        calm = self.settling(steady, stop) if steady else None
+
+        return calm if calm is not None and calm < stop else stop
+
+
+def analytic(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, samples=10001, t_eval=None,
+             dtype=np.float64, trajectory=None, horizon=None, steady=0):
+    """
+    Вычисляет ход боевых действий между регулярными армиями по точной формуле, без шагов по времени.
+
+    Значения считаются на сетке t_eval (по умолчанию - samples равноотстоящих точек до остановки расчета).
+    Расчет, как и у численных методов, останавливается в конце боя, в момент horizon или при равновесии
+    (см. settled), а также не идет дальше ClosedForm.limit(), где численности уже не представимы числами;
+    точки после остановки отбрасываются. Возвращает массивы (x, y, t).
+    """
+
+    solution = ClosedForm(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2)
+    end = solution.end()
+    stop = solution.stop(end, horizon, steady)
+
+    if t_eval is None:
+        if stop is None:
+            raise ValueError("Бой не заканчивается: задайте сетку t_eval")
+        t = np.linspace(0, stop, samples) if stop > 0 else np.zeros(1)
+    else:
+        t = np.asarray(t_eval, dtype=np.float64)
+        t = t[t <= stop] if stop is not None else t
+
+    x, y = solution(t)
+    x, y, t = x.astype(dtype), y.astype(dtype), t.astype(dtype)
+
+    if end is not None and len(t) and t[-1] == end:
+        x[-1] = 0 if x[-1] < 1 + 1e-9 else x[-1]
+        y[-1] = 0 if y[-1] < 1 + 1e-9 else y[-1]
+
+    if trajectory is not None:
+        trajectory.extend(t, x, y)
+        return trajectory.result()
+
+    return x, y, t
+
+
+class BatchResult:
+    """Результаты пакетного расчета: по одному значению на каждый сценарий"""
+
+    __slots__ = ["end", "winner", "x", "y", "trajectories"]
+
+    def __init__(self, end, winner, x, y, trajectories=None):
+        self.end = end
+        self.winner = winner
+        self.x = x
+        self.y = y
+        self.trajectories = trajectories
+
+
+class BatchModel:
+    """
+    Правая часть системы для многих сценариев сразу.
+
+    Состояния хранятся массивом z формы (2, n): f(z) = decay * z + fire * opponent + gain,
+    где opponent = (y, x) для регулярных армий и (y, x * y) для партизан.
+    """
+
+    __slots__ = ["decay", "fire", "gain", "partisan"]
+
+    def __init__(self, params, model):
+        alpha1, beta1, gamma1, alpha2, beta2, gamma2 = params
+
+        self.decay = -np.array((alpha1, alpha2))
+        self.fire = -np.array((beta1, beta2))
+        self.gain = np.array((gamma1, gamma2))
+        self.partisan = model == PARTISAN
+
+    def __call__(self, z):
+        opponent = np.array((z[1], z[0] * z[1])) if self.partisan else z[::-1]
+
+        return self.decay * z + self.fire * opponent + self.gain
+
+    def select(self, mask):
+        """Оставляет только сценарии, отмеченные mask"""
+
+        self.decay, self.fire, self.gain = self.decay[:, mask], self.fire[:, mask], self.gain[:, mask]
+
+
+def batch_crossing(z, q, iterations=12):
+    """
+    Для каждого сценария ищет theta из [0, 1], при котором многочлен z + q . (theta, ..., theta^4) равен 1.
+
+    На концах отрезка многочлен по разные стороны от 1; метод Ньютона страхуется делением отрезка пополам.
+    """
+
+    lo, hi = np.zeros(len(z)), np.ones(len(z))
+    end = z + q.sum(axis=0)
+    theta = np.clip((z - 1) / (z - end), 0, 1)
+
+    for _ in range(iterations):
+        value = z + theta * (q[0] + theta * (q[1] + theta * (q[2] + theta * q[3]))) - 1
+        slope = q[0] + theta * (2 * q[1] + theta * (3 * q[2] + theta * 4 * q[3]))
+
+        above = value >= 0
+        lo, hi = np.where(above, theta, lo), np.where(above, hi, theta)
+
+        step = theta - value / slope
+        theta = np.where((lo < step) & (step < hi), step, (lo + hi) / 2)
+
+    return theta
+
+
+def batch(parameters, model=REGULAR, rtol=1e-6, atol=1e-6, horizon=HORIZON, steady=STEADY, trajectories=False):
+    """
+    Вычисляет исходы сразу для многих сценариев методом Рунге-Кутты 5(4).
+
+    parameters - массив формы (M, 8) в порядке N1(0), alpha1, beta1, gamma1, N2(0), alpha2, beta2, gamma2.
+    Все сценарии считаются одновременно, у каждого свой шаг; закончившиеся сценарии исключаются из расчета.
+    Сценарии, не закончившиеся к моменту horizon или пришедшие в равновесие (скорость изменения
+    численностей меньше steady * (1 + N)), получают end = inf и winner = 0.
+    Если trajectories, то в результат добавляются массивы (x, y, t) формы (шаги, M), дополненные nan.
+    """
+
+    parameters = np.asarray(parameters, dtype=np.float64).reshape(-1, 8)
+    m = len(parameters)
+
+    end = np.full(m, np.inf)
+    winner = np.zeros(m, dtype=np.int8)
+    x_end, y_end = parameters[:, 0].copy(), parameters[:, 4].copy()
+    history = []
+
+    index = np.arange(m)
+    live = np.ones(m, dtype=bool)
+    f = BatchModel(parameters[:, [1, 2, 3, 5, 6, 7]].T, model)
+    z = parameters[:, [0, 4]].T.copy()
+    t = np.zeros(m)
+    k1 = f(z)
+
+    scale = np.max(np.abs(z), axis=0) * rtol + atol
+    speed = np.max(np.abs(k1), axis=0) * rtol + atol
+    h = 0.01 * scale / speed
+
+    a = [np.array(row) for row in DOPRI_A]
+    b, e, p = np.array(DOPRI_B), np.array(DOPRI_E), np.array(DOPRI_P)
+
+    if trajectories:
+        history.append((z[0].copy(), z[1].copy(), t.copy(), index))
+
+    with np.errstate(all="ignore"):
+        while live.any():
+            n = len(index)
+            h = np.minimum(h, horizon - t)
+
+            # Стадии хранятся строками (7, 2 * n), чтобы их линейные комбинации были одним умножением матриц
+            k = np.empty((7, 2 * n))
+            k[0] = k1.ravel()
+            for i, row in enumerate(a[1:], 1):
+                k[i] = f(z + h * (row @ k[:i]).reshape(2, n)).ravel()
+
+            z_new = z + h * (b @ k[:6]).reshape(2, n)
+            k[6] = f(z_new).ravel()
+
+            error = h * (e @ k).reshape(2, n) / (atol + rtol * np.maximum(np.abs(z), np.abs(z_new)))
+            error = np.sqrt((error[0] ** 2 + error[1] ** 2) / 2)
+
+            accepted = (error <= 1) & live
+            factor = np.where(error > 0, 0.9 * error ** -0.2, 10)
+            factor = np.where(accepted, np.minimum(factor, 10), np.maximum(factor, 0.2))
+
+            k7 = k[6].reshape(2, n)
+            defeated = accepted & ((z_new[0] < 1) | (z_new[1] < 1))
+            t_new = t + h
+
+            # Бой, пришедший в равновесие, уже не закончится
+            settled = np.all(np.abs(k7) <= steady * (1 + np.abs(z_new)), axis=0)
+            timeout = accepted & ~defeated & ((t_new >= horizon) | settled)
+
+            if defeated.any():
+                stages = k.reshape(7, 2, n)[:, :, defeated]
+                q = h[defeated] * np.tensordot(p.T, stages, axes=1)
+                theta = np.ones((2, len(q[0, 0])))
+
+                for i in (0, 1):
+                    crossed = z_new[i, defeated] < 1
+                    theta[i, crossed] = batch_crossing(z[i, defeated][crossed], q[:, i, crossed])
+
+                first = np.min(theta, axis=0)
+                z_end = z[:, defeated] + first * (q[0] + first * (q[1] + first * (q[2] + first * q[3])))
+                lost = (theta == first) & (z_new[:, defeated] < 1) | (z_end < 1)
+                z_end[lost] = 0
+
+                done = index[defeated]
+                end[done] = t[defeated] + first * h[defeated]
+                x_end[done], y_end[done] = z_end
+                winner[done] = np.where(lost[0] == lost[1], 0, np.where(lost[1], 1, 2))
+
+            if timeout.any():
+                x_end[index[timeout]], y_end[index[timeout]] = z_new[:, timeout]
+
+            z = np.where(accepted, z_new, z)
+            t = np.where(accepted, t_new, t)
+            k1 = np.where(accepted, k7, k1)
+            h = h * factor
+
+            if trajectories and accepted.any():
+                stored = accepted & ~defeated
+                history.append((z[0, stored], z[1, stored], t[stored], index[stored]))
+                if defeated.any():
+                    done = index[defeated]
+                    history.append((x_end[done], y_end[done], end[done], done))
+
+            # Закончившиеся сценарии выбрасываются из массивов не сразу, а когда их наберется достаточно
+            live &= ~(defeated | timeout)
+            if live.sum() < 0.75 * n:
+                f.select(live)
+                index, z, t, k1, h, live = index[live], z[:, live], t[live], k1[:, live], h[live], live[live]
+
+    result = BatchResult(end, winner, x_end, y_end)
+
+    if trajectories:
+        result.trajectories = padded(history, m)
+
+    return result
+
+
+def padded(history, m):
+    """Собирает записанные значения в массивы (x, y, t) формы (шаги, M), дополненные nan"""
+
+    counts = np.zeros(m, dtype=np.int64)
+    rows = []
+    for x, y, t, index in history:
+        rows.append(counts[index].copy())
+        counts[index] += 1
+
+    x_all, y_all, t_all = (np.full((counts.max(initial=0), m), np.nan) for _ in range(3))
+    for (x, y, t, index), row in zip(history, rows):
+        x_all[row, index], y_all[row, index], t_all[row, index] = x, y, t
+
+    return x_all, y_all, t_all
+
+
+def grid(start, stop, step):
+    """Точки сетки k * step из полуинтервала (start, stop]"""
+
+    return np.arange(np.floor(start / step) + 1, np.floor(stop / step) + 1) * step
+
+
+def stream_euler(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, model, step, tau, horizon, steady,
+                 max_chunk=1 << 16):
+    """Схема Эйлера (см. euler), из каждого блока шагов выдаются только шаги с номерами, кратными step / tau"""
+
+    scheme = (PartisanEuler if model == PARTISAN else RegularEuler)(
+        alpha1, beta1, gamma1, alpha2, beta2, gamma2, tau, max_chunk)
+    f = derivatives((alpha1, beta1, gamma1, alpha2, beta2, gamma2), model)
+    every = max(1, int(round(step / tau)))
+    last = int(np.ceil(horizon / tau - 1e-6)) if horizon < np.inf else None
+
+    yield np.array([x0], dtype=np.float64), np.array([y0], dtype=np.float64), np.zeros(1)
+
+    x, y, n = float(x0), float(y0), 0
+
+    while True:
+        xs, ys = scheme.advance(x, y)
+        if last is not None:
+            xs, ys = xs[:last - n], ys[:last - n]
+
+        end = first_defeat(xs, ys)
+        if end is not None:
+            xs, ys = xs[:end + 1], ys[:end + 1]
+            xs[-1] = 0 if xs[-1] < 1 else xs[-1]
+            ys[-1] = 0 if ys[-1] < 1 else ys[-1]
+
+        x, y = xs[-1], ys[-1]
+        finished = end is not None or n + len(xs) == last or settled(x, y, *f(x, y), steady)
+
+        # Шаг с номером n + 1 + i попадает на сетку, если номер кратен every; последний шаг выдается всегда
+        index = np.arange((-n - 1) % every, len(xs), every)
+        if finished and (not len(index) or index[-1] != len(xs) - 1):
+            index = np.append(index, len(xs) - 1)
+
+        if len(index):
+            yield xs[index], ys[index], (n + 1 + index) * tau
+
+        if finished:
+            return
+
+        n += len(xs)
+
+
+def stream_adaptive(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, model, step, rtol, atol, horizon,
+                    steady, chunk=1024):
+    """Метод Рунге-Кутты 5(4) (см. adaptive), значения на сетке берутся из непрерывного продолжения шагов"""
+
+    f = derivatives((alpha1, beta1, gamma1, alpha2, beta2, gamma2), model)
+
+    t, x, y = 0.0, float(x0), float(y0)
+
+    if x < 1 or y < 1:
+        yield np.array([0.0 if x < 1 else x]), np.array([0.0 if y < 1 else y]), np.zeros(1)
+        return
+
+    k1 = f(x, y)
+
+    scale = max(abs(x), abs(y)) * rtol + atol
+    speed = max(abs(k1[0]), abs(k1[1])) * rtol + atol
+    h = 0.01 * scale / speed
+
+    yield np.array([x]), np.array([y]), np.zeros(1)
+
+    parts, size, sampled = [], 0, 0.0
+
+    while t < horizon and not settled(x, y, *k1, steady):
+        h = min(h, horizon - t)
+        x_new, y_new, k, error_x, error_y = dopri_step(f, x, y, k1, h)
+
+        error = np.sqrt(((error_x / (atol + rtol * max(abs(x), abs(x_new)))) ** 2 +
+                         (error_y / (atol + rtol * max(abs(y), abs(y_new)))) ** 2) / 2)
+
+        if error > 1:
+            h *= max(0.2, 0.9 * error ** -0.2)
+            continue
+
+        times = grid(t, t + h, step)
+        px, py = interpolant(x, y, k, h)
+
+        if x_new < 1 or y_new < 1:
+            theta_x = find_root(lambda theta: px(theta) - 1, 0, 1, x - 1, x_new - 1) if x_new < 1 <= x else 1
+            theta_y = find_root(lambda theta: py(theta) - 1, 0, 1, y - 1, y_new - 1) if y_new < 1 <= y else 1
+            theta = min(theta_x, theta_y)
+
+            x_end = 0 if x_new < 1 and theta_x == theta or px(theta) < 1 else px(theta)
+            y_end = 0 if y_new < 1 and theta_y == theta or py(theta) < 1 else py(theta)
+
+            times = times[times < t + theta * h]
+            parts.append((px((times - t) / h), py((times - t) / h), times))
+            parts.append((np.array([x_end]), np.array([y_end]), np.array([t + theta * h])))
+            yield tuple(np.concatenate(column) for column in zip(*parts))
+            return
+
+        if len(times):
+            parts.append((px((times - t) / h), py((times - t) / h), times))
+            size, sampled = size + len(times), times[-1]
+
+        if size >= chunk:
+            yield tuple(np.concatenate(column) for column in zip(*parts))
+            parts, size = [], 0
+
+        t, x, y, k1 = t + h, x_new, y_new, k[-1]
+        h *= min(10, 0.9 * error ** -0.2) if error > 0 else 10
+
+    if sampled != t:
+        parts.append((np.array([x]), np.array([y]), np.array([t])))
+
+    if parts:
+        yield tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def stream_analytic(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, step, horizon, steady, chunk=4096):
+    """Точная формула (см. analytic), значения считаются участками по chunk точек сетки"""
+
+    solution = ClosedForm(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2)
+
+    end = solution.end()
+    stop = solution.stop(end, horizon, steady)
+    k = 0
+
+    while True:
+        t = np.arange(k, k + chunk) * step
+        t = t[t < stop]
+        x, y = solution(t)
+
+        finished = len(t) < chunk
+        if finished:
+            x_stop, y_stop = solution(stop)
+            if stop == end:
+                x_stop = 0 if x_stop < 1 + 1e-9 else x_stop
+                y_stop = 0 if y_stop < 1 + 1e-9 else y_stop
+            x, y, t = np.append(x, x_stop), np.append(y, y_stop), np.append(t, stop)
+
+        yield x, y, t
+
+        if finished:
+            return
+
+        k += chunk
+
+
+def stream(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, model=REGULAR, method=METHOD, step=0.01,
+           tau=TAU, rtol=1e-8, atol=1e-8, horizon=HORIZON, steady=STEADY, dtype=np.float64):
+    """
+    Вычисляет ход боевых действий по участкам: генератор массивов (x, y, t).
+
+    Значения выдаются только на сетке t = k * step (для метода Эйлера - ближайшей к ней сетке шагов tau)
+    и в последний момент расчета, так что память нужна лишь на текущий участок, сколько бы шагов ни сделал метод.
+    Расчет всегда заканчивается: поражением одной из сторон, в момент horizon или при равновесии (см. settled).
+    Выбор метода - как в solve.
+    """
+
+    if (method == ANALYTIC and model == REGULAR
+            and ClosedForm.discriminant(alpha1, beta1, alpha2, beta2) >= 0):
+        parts = stream_analytic(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, step, horizon, steady)
+    elif method in (ADAPTIVE, ANALYTIC):
+        parts = stream_adaptive(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, model, step, rtol, atol,
+                                horizon, steady)
+    else:
+        parts = stream_euler(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, model, step, tau, horizon,
+                             steady)
+
+    for x, y, t in parts:
+        yield x.astype(dtype, copy=False), y.astype(dtype, copy=False), t.astype(dtype, copy=False)
+
+
+def solve(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, model=REGULAR, method=METHOD, tau=TAU,
+          rtol=1e-8, atol=1e-8, dtype=np.float64, trajectory=None, horizon=HORIZON, steady=STEADY):
+    """
+    Вычисляет ход боевых действий выбранным методом: EULER (шаг tau), ADAPTIVE (точность rtol, atol)
+    или ANALYTIC. Точная формула есть только для регулярных армий, для партизан используется ADAPTIVE.
+    Бой, не закончившийся к моменту horizon или пришедший в равновесие, останавливается без победителя.
+
+    Если передан trajectory, значения пишутся в него по мере расчета (см. Trajectory).
+    """
+
+    if (method == ANALYTIC and model == REGULAR
+            and ClosedForm.discriminant(alpha1, beta1, alpha2, beta2) >= 0):
+        return analytic(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, dtype=dtype, trajectory=trajectory,
+                        horizon=horizon, steady=steady)
+
+    if method in (ADAPTIVE, ANALYTIC):
+        return adaptive(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, model=model, rtol=rtol, atol=atol,
+                        dtype=dtype, trajectory=trajectory, horizon=horizon, steady=steady)
+
+    return euler(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, model=model, tau=tau, dtype=dtype,
+                 trajectory=trajectory, horizon=horizon, steady=steady)
+
+
+class Battle:
+    """
+    Результат расчета боевых действий: параметры, модель, метод и ход боя (x, y, t).
+
+    Распаковывается как кортеж (x, y, t), который возвращают функции расчета.
+    """
+
+    __slots__ = ["parameters", "model", "method", "x", "y", "t"]
+
+    def __init__(self, parameters, model, method, x, y, t):
+        self.parameters = tuple(parameters)
+        self.model = model
+        self.method = method
+        self.x = x
+        self.y = y
+        self.t = t
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.t))
+
+    @property
+    def end(self):
+        """Время окончания боя"""
+
+        return self.t[-1]
+
+    @property
+    def winner(self):
+        """Номер победившей стороны: 1, 2 или 0, если победителя нет"""
+
+        x, y = self.x[-1], self.y[-1]
+
+        if (x == 0) == (y == 0):
+            return 0
+
+        return 1 if y == 0 else 2
+
+    def checkpoint(self, time):
+        """
+        Номер последней точки хода боя не позже time.
+
+        Каждая точка - полное состояние боя (t, x, y), так что записанный ход боя (на сетке Solver.stream
+        это снимки через равные промежутки времени) служит контрольными точками, с которых расчет
+        можно продолжить (см. branch). Поиск двоичный, O(log n).
+        """
+
+        return max(int(np.searchsorted(self.t, time, side="right")) - 1, 0)
+
+    def parts(self):
+        """Участки хода боя (x, y, t) от начала"""
+
+        return [(self.x, self.y, self.t)]
+
+
+class Branch(Battle):
+    """
+    Ветвь боя: бой parent, продолженный с контрольной точки index с другими коэффициентами.
+
+    x, y, t - только продолжение, начиная с самой контрольной точки. Общее с родителем начало
+    не копируется: parts() возвращает его срезами столбцов родителя.
+    """
+
+    __slots__ = ["parent", "index"]
+
+    def __init__(self, parent, index, parameters, model, method, x, y, t):
+        super().__init__(parameters, model, method, x, y, t)
+        self.parent = parent
+        self.index = index
+
+    def parts(self):
+        parts = self.parent.parts()
+        x, y, t = parts[-1]
+        parts[-1] = x[:self.index], y[:self.index], t[:self.index]
+
+        return parts + [(self.x, self.y, self.t)]
+
+
+def branch(parent, time, rates, horizon=HORIZON, trajectory=None, **options):
+    """
+    Продолжает бой parent (Battle) с момента time с коэффициентами rates
+    (alpha1, beta1, gamma1, alpha2, beta2, gamma2) и возвращает Branch.
+
+    Расчет начинается с последней контрольной точки не позже time (см. Battle.checkpoint) тем же методом,
+    что и у parent, и идет до horizon, так что стоит столько же, сколько оставшаяся часть боя.
+    Если задан options["step"], ход боя считается на сетке, как в stream, иначе - как в solve.
+    Если к контрольной точке бой уже закончился (или наступил horizon), ветвь состоит из нее одной.
+    Ветвь ветви до ее начала - это ветвь того боя, от которого она отходит. Время в trajectory -
+    от начала боя, как и у самой ветви.
+    """
+
+    while isinstance(parent, Branch) and time < parent.t[0]:
+        parent = parent.parent
+
+    index = parent.checkpoint(time)
+    start = float(parent.t[index])
+    alpha1, beta1, gamma1, alpha2, beta2, gamma2 = rates
+    parameters = (float(parent.x[index]), alpha1, beta1, gamma1, float(parent.y[index]), alpha2, beta2, gamma2)
+
+    trajectory = trajectory if trajectory is not None else Trajectory(dtype=parent.t.dtype)
+    settings = dict(options, model=parent.model, method=parent.method, horizon=horizon - start)
+
+    if parameters[0] < 1 or parameters[4] < 1 or start >= horizon:
+        trajectory.append(start, parameters[0], parameters[4])
+        x, y, t = trajectory.result()
+    elif "step" in options:
+        for x, y, t in stream(*parameters, **settings):
+            trajectory.extend(t + start, x, y)
+            if trajectory.cancelled:
+                break
+        x, y, t = trajectory.result()
+    else:
+        # solve записывает в trajectory время от контрольной точки: оно сдвигается на месте, в самом буфере
+        x, y, t = solve(*parameters, trajectory=trajectory, **settings)
+        t += start
+
+    return Branch(parent, index, parameters, parent.model, parent.method, x, y, t)
+
+
+def battle(parameters, model=REGULAR, method=METHOD, **options):
+    """Рассчитывает бой с параметрами в порядке PARAMETERS (см. solve) и возвращает Battle"""
+
+    return Battle(parameters, model, method, *solve(*parameters, model=model, method=method, **options))
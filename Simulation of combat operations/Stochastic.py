@@ -0,0 +1,235 @@
+import argparse
+
+import numpy as np
+
+import Solver
+
+
+GILLESPIE = "gillespie"
+TAU_LEAPING = "tau-leaping"
+
+# Доля численности стороны, на которую она может измениться за один шаг tau-leaping
+EPSILON = 0.03
+
+
+class Ensemble:
+    """
+    Исходы независимых реализаций одного боя: по одному значению на реализацию.
+
+    end - время окончания (inf, если бой не закончился к моменту horizon), winner - 1, 2 или 0,
+    x, y - численности сторон в конце.
+    """
+
+    __slots__ = ["parameters", "model", "method", "end", "winner", "x", "y"]
+
+    def __init__(self, parameters, model, method, end, winner, x, y):
+        self.parameters = tuple(parameters)
+        self.model = model
+        self.method = method
+        self.end = end
+        self.winner = winner
+        self.x = x
+        self.y = y
+
+    def __len__(self):
+        return len(self.end)
+
+    def probability(self):
+        """Доли реализаций, в которых победила первая сторона, вторая и никто"""
+
+        counts = np.bincount(self.winner, minlength=3) / len(self)
+
+        return float(counts[1]), float(counts[2]), float(counts[0])
+
+    def end_times(self, bins=50):
+        """Гистограмма времени окончания закончившихся боев: (число реализаций, границы интервалов)"""
+
+        return np.histogram(self.end[np.isfinite(self.end)], bins)
+
+    def percentiles(self, q=(5, 25, 50, 75, 95)):
+        """Процентили численностей сторон в конце боя: (для первой стороны, для второй)"""
+
+        return np.percentile(self.x, q), np.percentile(self.y, q)
+
+
+class Rates:
+    """
+    Интенсивности переходов случайного процесса для многих реализаций сразу.
+
+    Численности целые; сторона теряет одного бойца с интенсивностью, равной убыли в уравнениях
+    (alpha1 * x + beta1 * y и alpha2 * y + beta2 * x или beta2 * x * y для партизан), и получает
+    одного с интенсивностью gamma. Средние численности при больших x, y следуют уравнениям Ланчестера.
+    """
+
+    __slots__ = ["alpha1", "beta1", "gamma1", "alpha2", "beta2", "gamma2", "partisan"]
+
+    def __init__(self, alpha1, beta1, gamma1, alpha2, beta2, gamma2, model):
+        self.alpha1, self.beta1, self.gamma1 = alpha1, beta1, gamma1
+        self.alpha2, self.beta2, self.gamma2 = alpha2, beta2, gamma2
+        self.partisan = model == Solver.PARTISAN
+
+    def __call__(self, x, y):
+        """Интенсивности потерь первой и второй стороны"""
+
+        fire = x * y if self.partisan else x
+
+        return self.alpha1 * x + self.beta1 * y, self.alpha2 * y + self.beta2 * fire
+
+
+def initial(parameters, replicas):
+    """Начальные численности (целые, не меньше 0) и интенсивности переходов"""
+
+    x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2 = parameters
+
+    x = np.full(replicas, max(round(x0), 0), dtype=np.int64)
+    y = np.full(replicas, max(round(y0), 0), dtype=np.int64)
+
+    return x, y, alpha1, beta1, gamma1, alpha2, beta2, gamma2
+
+
+def finish(done, index, t, x, y, end, winner, x_end, y_end):
+    """Записывает исходы закончившихся реализаций (done - маска по текущим массивам)"""
+
+    rows = index[done]
+    x_end[rows], y_end[rows] = x[done], y[done]
+
+    defeated = done & ((x == 0) | (y == 0))
+    end[index[defeated]] = t[defeated]
+    winner[index[defeated]] = np.where(x[defeated] == y[defeated], 0, np.where(y[defeated] == 0, 1, 2))
+
+
+def started(x, y, end, winner, x_end, y_end):
+    """
+    Исключает реализации, в которых одной из сторон нет с самого начала: бой в них закончен в момент 0.
+    Возвращает номера, время и численности остальных реализаций.
+    """
+
+    index = np.arange(len(x))
+    t = np.zeros(len(x))
+
+    done = (x == 0) | (y == 0)
+    finish(done, index, t, x, y, end, winner, x_end, y_end)
+
+    return index[~done], t[~done], x[~done], y[~done]
+
+
+def gillespie(parameters, model=Solver.REGULAR, replicas=10000, seed=None, horizon=Solver.HORIZON):
+    """
+    Точное моделирование (алгоритм Гиллеспи) replicas реализаций боя.
+
+    На каждой итерации во всех еще идущих реализациях сразу происходит по одному событию:
+    время до него - экспоненциальное с суммарной интенсивностью, само событие выбирается
+    пропорционально интенсивностям. Закончившиеся реализации исключаются из массивов.
+    """
+
+    random = np.random.default_rng(seed)
+    x, y, alpha1, beta1, gamma1, alpha2, beta2, gamma2 = initial(parameters, replicas)
+    rates = Rates(alpha1, beta1, gamma1, alpha2, beta2, gamma2, model)
+
+    end = np.full(replicas, np.inf)
+    winner = np.zeros(replicas, dtype=np.int8)
+    x_end, y_end = x.copy(), y.copy()
+
+    index, t, x, y = started(x, y, end, winner, x_end, y_end)
+
+    with np.errstate(divide="ignore"):
+        while len(index):
+            loss1, loss2 = rates(x, y)
+            gain1 = loss1 + gamma1
+            loss2 = gain1 + loss2
+            total = loss2 + gamma2
+
+            # Если ничего не может произойти, бой не закончится никогда
+            t = t + random.exponential(1, len(index)) / total
+            live = t < horizon
+
+            u = random.random(len(index)) * total
+            x = x + live * ((u >= loss1) & (u < gain1)) - live * (u < loss1)
+            y = y + live * (u >= loss2) - live * ((u >= gain1) & (u < loss2))
+
+            done = ~live | (x == 0) | (y == 0)
+            if done.any():
+                finish(done, index, t, x, y, end, winner, x_end, y_end)
+
+                keep = ~done
+                index, t, x, y = index[keep], t[keep], x[keep], y[keep]
+
+    return Ensemble(parameters, model, GILLESPIE, end, winner, x_end, y_end)
+
+
+def tau_leaping(parameters, model=Solver.REGULAR, replicas=10000, seed=None, horizon=Solver.HORIZON,
+                epsilon=EPSILON):
+    """
+    Приближенное моделирование replicas реализаций боя методом tau-leaping.
+
+    За шаг tau число событий каждого вида распределено по Пуассону со средним интенсивность * tau.
+    Шаг у каждой реализации свой: такой, чтобы ожидаемое изменение каждой стороны было не больше
+    epsilon от ее численности (но не меньше одного бойца), так что при малых численностях
+    метод переходит почти к отдельным событиям. Обе стороны могут погибнуть за один шаг - тогда winner = 0.
+    """
+
+    random = np.random.default_rng(seed)
+    x, y, alpha1, beta1, gamma1, alpha2, beta2, gamma2 = initial(parameters, replicas)
+    rates = Rates(alpha1, beta1, gamma1, alpha2, beta2, gamma2, model)
+
+    end = np.full(replicas, np.inf)
+    winner = np.zeros(replicas, dtype=np.int8)
+    x_end, y_end = x.copy(), y.copy()
+
+    index, t, x, y = started(x, y, end, winner, x_end, y_end)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        while len(index):
+            loss1, loss2 = rates(x, y)
+
+            tau = epsilon * np.minimum(np.maximum(x, 1 / epsilon) / (loss1 + gamma1),
+                                       np.maximum(y, 1 / epsilon) / (loss2 + gamma2))
+            tau = np.minimum(tau, horizon - t)
+
+            # Если ничего не может произойти, бой не закончится никогда
+            tau[np.isnan(tau) | np.isinf(tau)] = horizon
+            t = t + tau
+            live = t < horizon
+
+            x = np.maximum(x + random.poisson(gamma1 * tau) - random.poisson(loss1 * tau), 0)
+            y = np.maximum(y + random.poisson(gamma2 * tau) - random.poisson(loss2 * tau), 0)
+
+            done = ~live | (x == 0) | (y == 0)
+            if done.any():
+                finish(done, index, t, x, y, end, winner, x_end, y_end)
+
+                keep = ~done
+                index, t, x, y = index[keep], t[keep], x[keep], y[keep]
+
+    return Ensemble(parameters, model, TAU_LEAPING, end, winner, x_end, y_end)
+
+
+def ensemble(parameters, model=Solver.REGULAR, method=GILLESPIE, replicas=10000, seed=None, **options):
+    """Моделирует replicas реализаций боя с параметрами в порядке PARAMETERS и возвращает Ensemble"""
+
+    if method == TAU_LEAPING:
+        return tau_leaping(parameters, model, replicas, seed, **options)
+
+    return gillespie(parameters, model, replicas, seed, **options)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Вероятности исходов боя при случайных потерях")
+    parser.add_argument("parameters", type=float, nargs=8, metavar="P", help=", ".join(Solver.PARAMETERS))
+    parser.add_argument("--model", default=Solver.REGULAR, choices=(Solver.REGULAR, Solver.PARTISAN))
+    parser.add_argument("--method", default=GILLESPIE, choices=(GILLESPIE, TAU_LEAPING))
+    parser.add_argument("--replicas", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--horizon", type=float, default=Solver.HORIZON)
+
+    arguments = parser.parse_args()
+
+    result = ensemble(arguments.parameters, arguments.model, arguments.method, arguments.replicas, arguments.seed,
+                      **{"horizon": arguments.horizon})
+
+    print("Победа первой стороны: %.4f, второй: %.4f, без победителя: %.4f" % result.probability())
+    ended = result.end[np.isfinite(result.end)]
+    if len(ended):
+        print("Время окончания: среднее %.4g, медиана %.4g" % (np.mean(ended), np.median(ended)))
+    for name, values in zip(("N1(end)", "N2(end)"), result.percentiles()):
+        print("%s, процентили 5, 25, 50, 75, 95: %s" % (name, " ".join("%g" % value for value in values)))
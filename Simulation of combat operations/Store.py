@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+import Solver
+
+
+# Файл записи: MAGIC, заголовок в JSON (дополненный пробелами до HEADER байт), затем столбцы t, N1, N2
+MAGIC = b"COMBATRUN\n"
+VERSION = 1
+HEADER = 4096
+
+# Столбцы записываются частями по CHUNK значений, чтобы не копировать их целиком при смене типа
+CHUNK = 1 << 20
+
+# Последний посчитанный бой, который можно посмотреть заново без расчета
+LAST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "last_battle.run")
+
+
+def save(path, battle, settings=None, dtype=None):
+    """
+    Записывает бой (Solver.Battle) и настройки метода settings в файл path.
+
+    Столбцы пишутся в типе dtype (по умолчанию - в типе battle.t). Запись атомарна:
+    файл появляется под именем path только целиком. Временный файл у каждой записи свой,
+    так что один и тот же path могут одновременно записывать несколько процессов.
+    """
+
+    dtype = np.dtype(dtype or battle.t.dtype)
+    parameters = [p.item() if isinstance(p, np.generic) else p for p in battle.parameters]
+
+    header = json.dumps({"version": VERSION, "parameters": parameters, "model": battle.model,
+                         "method": battle.method, "settings": settings or {}, "dtype": dtype.str,
+                         "size": len(battle.t)}, default=str).encode("utf-8")
+
+    if len(MAGIC) + len(header) > HEADER:
+        raise ValueError("Заголовок записи длиннее %d байт" % HEADER)
+
+    directory, name = os.path.split(os.path.abspath(path))
+    file = tempfile.NamedTemporaryFile(dir=directory, prefix=name + ".", suffix=".tmp", delete=False)
+
+    try:
+        with file:
+            file.write(MAGIC + header.ljust(HEADER - len(MAGIC)))
+
+            for column in (battle.t, battle.x, battle.y):
+                for start in range(0, len(column), CHUNK):
+                    np.asarray(column[start:start + CHUNK]).astype(dtype, copy=False).tofile(file)
+
+        os.replace(file.name, path)
+    except BaseException:
+        os.remove(file.name)
+        raise
+
+
+def header(path):
+    """Заголовок записи: параметры, модель, метод, настройки метода, тип и длина столбцов"""
+
+    with open(path, "rb") as file:
+        head = file.read(HEADER)
+
+    if not head.startswith(MAGIC):
+        raise ValueError("%s - не запись боя" % path)
+
+    head = json.loads(head[len(MAGIC):].decode("utf-8"))
+    if head["version"] != VERSION:
+        raise ValueError("Неподдерживаемая версия записи: %s" % head["version"])
+
+    return head
+
+
+def load(path):
+    """
+    Открывает запись боя и возвращает Solver.Battle, столбцы которого отображены на файл (numpy.memmap).
+
+    Файл не читается целиком: в памяти оказываются только те страницы, к которым обращаются.
+    """
+
+    head = header(path)
+    dtype, size = np.dtype(head["dtype"]), head["size"]
+
+    columns = [np.memmap(path, dtype, "r", HEADER + i * size * dtype.itemsize, (size,)) if size
+               else np.empty(0, dtype) for i in range(3)]
+    t, x, y = columns
+
+    return Solver.Battle(head["parameters"], head["model"], head["method"], x, y, t)
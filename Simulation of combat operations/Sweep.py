@@ -0,0 +1,243 @@
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import Solver
+
+
+BATCH = "batch"
+COLUMNS = ("index", "model") + Solver.PARAMETERS + ("end", "winner", "N1(end)", "N2(end)")
+MODELS = (Solver.REGULAR, Solver.PARTISAN)
+
+# Описание расчета в каталоге частей: по нему продолжение проверяет, что части от того же расчета
+MANIFEST = "manifest.json"
+
+# Не чаще, чем раз в столько секунд, готовые части переписываются в файл результатов
+FLUSH = 10
+
+
+def read_scenarios(path):
+    """
+    Читает сценарии из CSV (с заголовком) или JSON (список объектов). Возвращает массив (M, 8) и модели.
+
+    Пустая модель - REGULAR; неизвестная модель - ValueError с номером строки CSV (или элемента списка JSON).
+    """
+
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as file:
+            rows = [("элемент %d" % number, row) for number, row in enumerate(json.load(file), 1)]
+    else:
+        with open(path, newline="", encoding="utf-8") as file:
+            reader = csv.DictReader(file)
+            rows = [("строка %d" % reader.line_num, row) for row in reader]
+
+    for place, row in rows:
+        if (row.get("model") or Solver.REGULAR) not in MODELS:
+            raise ValueError("%s, %s: неизвестная модель %r (допустимы: %s)" %
+                             (path, place, row["model"], ", ".join(MODELS)))
+
+    parameters = np.array([[float(row[name]) for name in Solver.PARAMETERS] for place, row in rows]).reshape(-1, 8)
+    models = np.array([row.get("model") or Solver.REGULAR for place, row in rows])
+
+    return parameters, models
+
+
+def solve_chunk(parameters, models, method, tau, horizon):
+    """
+    Считает исходы для части сценариев. Возвращает столбцы end, winner, N1(end), N2(end).
+
+    Бой, не закончившийся к моменту horizon или пришедший в равновесие, получает end = inf и winner = 0.
+    """
+
+    end = np.full(len(parameters), np.inf)
+    winner = np.zeros(len(parameters), dtype=np.int8)
+    x_end, y_end = parameters[:, 0].copy(), parameters[:, 4].copy()
+
+    if method == BATCH:
+        for model in np.unique(models):
+            rows = models == model
+            result = Solver.batch(parameters[rows], model=model, horizon=horizon)
+            end[rows], winner[rows], x_end[rows], y_end[rows] = result.end, result.winner, result.x, result.y
+
+        return end, winner, x_end, y_end
+
+    for i, (params, model) in enumerate(zip(parameters, models)):
+        battle = Solver.battle(params, model, method, tau=tau, horizon=horizon)
+
+        x_end[i], y_end[i] = battle.x[-1], battle.y[-1]
+        if x_end[i] == 0 or y_end[i] == 0:
+            end[i], winner[i] = battle.end, battle.winner
+
+    return end, winner, x_end, y_end
+
+
+def save_chunk(directory, number, index, parameters, models, results):
+    """Атомарно сохраняет готовую часть: при перезапуске она уже не будет считаться"""
+
+    path = os.path.join(directory, "chunk_%06d.npz" % number)
+    end, winner, x_end, y_end = results
+
+    with open(path + ".tmp", "wb") as file:
+        np.savez(file, index=index, model=models, parameters=parameters,
+                 end=end, winner=winner, x_end=x_end, y_end=y_end)
+    os.replace(path + ".tmp", path)
+
+
+def load_chunks(directory):
+    """Собирает все сохраненные части в столбцы, упорядоченные по номеру сценария (без частей - пустые)"""
+
+    parts = [np.load(path) for path in sorted(glob.glob(os.path.join(directory, "chunk_*.npz")))]
+    if not parts:
+        return {"index": np.zeros(0, dtype=np.int64), "model": np.zeros(0, dtype=str),
+                "parameters": np.zeros((0, 8)), "end": np.zeros(0), "winner": np.zeros(0, dtype=np.int8),
+                "x_end": np.zeros(0), "y_end": np.zeros(0)}
+
+    columns = {name: np.concatenate([part[name] for part in parts])
+               for name in ("index", "model", "parameters", "end", "winner", "x_end", "y_end")}
+
+    order = np.argsort(columns["index"])
+    return {name: column[order] for name, column in columns.items()}
+
+
+def write_output(path, columns):
+    """Атомарно записывает результаты в .npz (по столбцу на массив) или в CSV"""
+
+    if path.endswith(".npz"):
+        with open(path + ".tmp", "wb") as file:
+            np.savez(file, **{name: columns["parameters"][:, i] for i, name in enumerate(Solver.PARAMETERS)},
+                     index=columns["index"], model=columns["model"], end=columns["end"],
+                     winner=columns["winner"], x_end=columns["x_end"], y_end=columns["y_end"])
+    else:
+        with open(path + ".tmp", "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(COLUMNS)
+            for i in range(len(columns["index"])):
+                writer.writerow([columns["index"][i], columns["model"][i], *columns["parameters"][i],
+                                 columns["end"][i], columns["winner"][i], columns["x_end"][i], columns["y_end"][i]])
+
+    os.replace(path + ".tmp", path)
+
+
+def manifest(parameters, models, method, tau, horizon, chunk_size):
+    """Описание расчета: размер части и хэш сценариев и настроек"""
+
+    digest = hashlib.sha256(np.ascontiguousarray(parameters, dtype=np.float64).tobytes())
+    digest.update("\n".join(models).encode("utf-8"))
+    digest.update(json.dumps([method, tau, horizon]).encode("utf-8"))
+
+    return {"chunk_size": chunk_size, "scenarios": len(parameters), "input": digest.hexdigest()}
+
+
+def check_manifest(directory, expected):
+    """
+    Записывает описание расчета в новый каталог частей или сверяет его с уже записанным.
+
+    Части другого расчета (другие сценарии, настройки или размер части) смешались бы с новыми
+    без всякой ошибки, поэтому при несовпадении - ValueError.
+    """
+
+    path = os.path.join(directory, MANIFEST)
+
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as file:
+            found = json.load(file)
+    elif glob.glob(os.path.join(directory, "chunk_*.npz")):
+        found = None
+    else:
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(expected, file)
+        os.replace(path + ".tmp", path)
+        return
+
+    if found != expected:
+        raise ValueError("Каталог %s остался от другого расчета (другие сценарии, настройки или --chunk-size): "
+                         "удалите его или запустите расчет с прежними параметрами" % directory)
+
+
+def available_cores():
+    """Число ядер, доступных процессу"""
+
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def sweep(source, output, method=Solver.METHOD, tau=Solver.TAU, chunk_size=10000, workers=None,
+          horizon=Solver.HORIZON):
+    """
+    Считает все сценарии из файла source на пуле процессов и записывает исходы в output.
+
+    По умолчанию бой считается так же, как в окне программы (Solver.METHOD, Solver.TAU, Solver.HORIZON),
+    так что исходы совпадают с ModelType.solveODE_1 и solveODE_2. BATCH быстрее, но считает другим методом:
+    время окончания может отличаться в пределах его точности.
+
+    Каждая готовая часть сразу сохраняется в каталог output + ".parts", так что прерванный расчет
+    при повторном запуске продолжается с несохраненных частей (если сценарии, настройки и размер части
+    те же, см. check_manifest). Готовые части не реже раза в FLUSH секунд переписываются в output,
+    так что по ходу расчета в нем уже есть исходы посчитанных сценариев (по порядку номеров, без пропущенных
+    строк для остальных). Каталог удаляется после записи всех частей.
+    """
+
+    parameters, models = read_scenarios(source)
+    directory = output + ".parts"
+    os.makedirs(directory, exist_ok=True)
+    check_manifest(directory, manifest(parameters, models, method, tau, horizon, chunk_size))
+
+    done = {int(os.path.basename(path)[6:12]) for path in glob.glob(os.path.join(directory, "chunk_*.npz"))}
+    chunks = [(number, start) for number, start in enumerate(range(0, len(parameters), chunk_size))
+              if number not in done]
+
+    print("Сценариев: %d, частей: %d, уже готово: %d" % (len(parameters), len(chunks) + len(done), len(done)))
+
+    with ProcessPoolExecutor(max_workers=workers or available_cores()) as pool:
+        futures = {pool.submit(solve_chunk, parameters[start:start + chunk_size], models[start:start + chunk_size],
+                               method, tau, horizon): (number, start)
+                   for number, start in chunks}
+
+        flushed = time.monotonic()
+
+        for completed, future in enumerate(as_completed(futures), 1):
+            number, start = futures[future]
+            stop = min(start + chunk_size, len(parameters))
+
+            save_chunk(directory, number, np.arange(start, stop), parameters[start:stop], models[start:stop],
+                       future.result())
+            print("Готова часть %d (%d из %d)" % (number, completed, len(chunks)))
+
+            if time.monotonic() - flushed >= FLUSH and completed < len(chunks):
+                write_output(output, load_chunks(directory))
+                flushed = time.monotonic()
+
+    write_output(output, load_chunks(directory))
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Расчет исходов боевых действий для набора сценариев")
+    parser.add_argument("source", help="CSV или JSON со столбцами " + ", ".join(Solver.PARAMETERS) + " и model")
+    parser.add_argument("output", help="файл результатов: .csv или .npz; по ходу расчета в нем исходы готовых частей")
+    parser.add_argument("--method", default=Solver.METHOD,
+                        choices=(BATCH, Solver.EULER, Solver.ADAPTIVE, Solver.ANALYTIC),
+                        help="по умолчанию - как в окне программы; batch быстрее, но время окончания чуть другое")
+    parser.add_argument("--tau", type=float, default=Solver.TAU, help="шаг метода Эйлера")
+    parser.add_argument("--horizon", type=float, default=Solver.HORIZON,
+                        help="момент, после которого бой считается ничьей")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=None)
+
+    arguments = parser.parse_args()
+
+    try:
+        sweep(arguments.source, arguments.output, arguments.method, arguments.tau, arguments.chunk_size,
+              arguments.workers, arguments.horizon)
+    except ValueError as error:
+        parser.error(str(error))
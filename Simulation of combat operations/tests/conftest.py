@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули программы лежат в каталоге выше и импортируются по имени, как в самой программе
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
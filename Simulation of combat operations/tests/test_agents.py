@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+import Agents
+import Solver
+
+
+def test_target_is_found_whenever_an_enemy_is_in_range():
+    # В квадрате 3x3 вокруг стрелков тысяча единиц, но в пределах дальности - только одна
+    random = np.random.default_rng(0)
+    x = np.concatenate(([0.5], random.uniform(0.46, 0.54, 1000)))
+    y = np.concatenate(([0.2], random.uniform(0.16, 0.24, 1000)))
+    far = np.hypot(x - 0.5, y - 0.2) > 0.003
+    keep = far | (np.arange(len(x)) == 0)
+    x, y = x[keep], y[keep]
+    grid = Agents.Grid(x, y, 0.02, 1.0, 0.4)
+
+    shooters_x, shooters_y = np.full(100, 0.501), np.full(100, 0.2)
+    cell = grid.locate(shooters_x, shooters_y)
+    targets = grid.target(shooters_x, shooters_y, cell, random, 0.002)
+
+    assert np.all(targets == 0)
+
+
+@pytest.mark.parametrize("model, parameters", [(Solver.REGULAR, (1000, 0, 1, 0, 800, 0, 1, 0)),
+                                               (Solver.PARTISAN, (1000, 0, 1, 0, 800, 0, 0.001, 0)),
+                                               (Solver.REGULAR, (500, 0.1, 1, 20, 400, 0.1, 1, 10))])
+def test_mean_field_matches_lanchester(model, parameters):
+    # Каждая единица достает до всех единиц противника: в среднем бой идет по уравнениям Ланчестера
+    ode = Solver.battle(parameters, model, Solver.ADAPTIVE)
+    runs = [Agents.battle(parameters, model, seed=seed, horizon=3 * ode.end, **{"range": 1.1}) for seed in range(8)]
+
+    assert all(run.winner == ode.winner != 0 for run in runs)
+    assert abs(np.mean([run.end for run in runs]) - ode.end) <= 0.15 * ode.end
+    np.testing.assert_allclose((np.mean([run.x[-1] for run in runs]), np.mean([run.y[-1] for run in runs])),
+                               (ode.x[-1], ode.y[-1]), rtol=0.1, atol=5)
@@ -0,0 +1,30 @@
+import json
+
+import Benchmark
+
+
+def write_results(path, results):
+    path.write_text(json.dumps({"results": {name: {"median": value} for name, value in results.items()}}),
+                    encoding="utf-8")
+
+
+def test_compare_reports_only_slowdowns_beyond_the_threshold(tmp_path):
+    baseline, current = tmp_path / "baseline.json", tmp_path / "current.json"
+    write_results(baseline, {"plot/build/1000": 1.0, "solve/a": 1.0, "solve/b": 1.0, "gone": 1.0})
+    write_results(current, {"plot/build/1000": 1.5, "solve/a": 1.1, "solve/b": 0.5, "new": 1.0})
+
+    assert Benchmark.compare(str(baseline), str(current), 0.2) == ["plot/build/1000"]
+
+
+def test_plot_build_is_measured_with_the_first_draw(tmp_path, monkeypatch):
+    output = tmp_path / "results.json"
+    # По одному вызову на замер: проверяется состав замеров, а не время
+    measure = Benchmark.measure
+    monkeypatch.setattr(Benchmark, "measure", lambda function: measure(function, repeat=1, budget=0))
+
+    Benchmark.run(str(output), quick=True, only="plot/build")
+    results = json.loads(output.read_text(encoding="utf-8"))["results"]
+
+    assert sorted(results, key=lambda name: int(name.split("/")[-1])) == \
+        ["plot/build/%d" % n for n in Benchmark.POINTS[:-1]]
+    assert all(value["median"] > 0 for value in results.values())
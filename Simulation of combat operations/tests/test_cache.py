@@ -0,0 +1,46 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import Cache
+import Solver
+import Store
+
+
+def test_disk_tier_evicts_least_recently_used_files(tmp_path):
+    # Бои одинаковой длины: файлы одного размера
+    scenarios = [(100, 0, 0.01, 0, 80 + i, 0, 0.01, 0) for i in range(4)]
+    options = {"tau": 1e-3, "horizon": 1}
+
+    cache, paths = Cache.Cache(directory=str(tmp_path)), []
+    for i, parameters in enumerate(scenarios[:3]):
+        cache.battle(parameters, **options)
+        paths += set(os.listdir(str(tmp_path))) - set(paths)
+        os.utime(os.path.join(str(tmp_path), paths[-1]), (i, i))
+    size = os.path.getsize(os.path.join(str(tmp_path), paths[0]))
+
+    # В каталоге помещаются три файла; самый старый только что прочитан, поэтому вытесняется второй
+    cache = Cache.Cache(directory=str(tmp_path), disk_capacity=3 * size)
+    cache.battle(scenarios[0], **options)
+    cache.battle(scenarios[3], **options)
+
+    left = os.listdir(str(tmp_path))
+    assert len(left) == 3 and paths[0] in left and paths[1] not in left
+    assert cache.stats()["disk_hits"] == 1 and cache.stats()["disk_evictions"] == 1
+    assert cache.stats()["disk_bytes"] == 3 * size
+
+
+def write_same_key(directory):
+    # Через Store.save, а не Cache.put: put молча пропускает ошибки записи на диск
+    battle = Solver.battle((100, 0, 1, 0, 80, 0, 1, 0), Solver.REGULAR, Solver.EULER, tau=1e-5)
+    for _ in range(20):
+        Store.save(Cache.Cache(directory=directory).path("key"), battle)
+
+
+def test_processes_writing_the_same_key_do_not_collide(tmp_path):
+    # Как у процессов Sweep: одна и та же запись пишется одновременно
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        for future in [pool.submit(write_same_key, str(tmp_path)) for _ in range(4)]:
+            future.result()
+
+    assert os.listdir(str(tmp_path)) == ["key.run"]
+    assert Cache.Cache(directory=str(tmp_path)).get("key").winner == 1
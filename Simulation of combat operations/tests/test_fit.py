@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import Fit
+import Solver
+
+
+SCENARIOS = [((100, 0.01, 1, 2, 80, 0.02, 0.6, 5), Solver.REGULAR),
+             ((100, 0.01, 0.5, 2, 60, 0.02, 0.01, 5), Solver.PARTISAN)]
+
+# Шаг сетки integrate - (последний момент) / STEPS: для коротких рядов хватает и такой
+STEPS = 100
+
+
+def series(parameters, model, step=0.05, count=15):
+    """Численности по точному решению (непрерывное продолжение DOPRI) в моменты k * step до окончания боя"""
+
+    parts = list(Solver.stream(*parameters, **{"model": model, "method": Solver.ADAPTIVE, "step": step,
+                                               "rtol": 1e-10, "atol": 1e-10}))
+    x, y, t = (np.concatenate([part[i] for part in parts]) for i in range(3))
+    grid = np.isclose(t / step, np.round(t / step))
+
+    return t[grid][:count], x[grid][:count], y[grid][:count]
+
+
+@pytest.mark.parametrize("parameters, model", SCENARIOS)
+def test_fit_recovers_parameters(parameters, model):
+    t, x, y = series(parameters, model)
+
+    result = Fit.fit(t, x, y, model, **{"starts_number": 8, "seed": 0, "steps": STEPS})
+
+    np.testing.assert_allclose(result.parameters, parameters, rtol=1e-5)
+    assert result.cost < 1e-10
+    assert result.free.all()
+
+
+@pytest.mark.parametrize("parameters, model", SCENARIOS)
+def test_fit_with_gaps_and_fixed_parameters(parameters, model):
+    t, x, y = series(parameters, model)
+    y[[3, 7, 8]] = np.nan
+    # alpha1 и alpha2 закреплены на верных значениях, остальные начинаются с ошибкой 30%
+    initial = np.array(parameters) * (1, 1, 1.3, 1.3, 1, 1, 1.3, 1.3)
+
+    result = Fit.fit(t, x, y, model, **{"fixed": ("alpha1", "alpha2"), "initial": initial, "starts_number": 8,
+                                        "seed": 0, "steps": STEPS})
+
+    np.testing.assert_allclose(result.parameters, parameters, rtol=1e-5)
+    assert result.parameters[1] == parameters[1] and result.parameters[5] == parameters[5]
+    assert result.errors[1] == 0 and result.errors[5] == 0
+    assert np.isnan(result.residuals[[3, 7, 8], 1]).all() and np.isfinite(result.residuals[:, 0]).all()
+
+
+@pytest.mark.parametrize("parameters, model", SCENARIOS)
+def test_generating_model_fits_best(parameters, model):
+    t, x, y = series(parameters, model)
+
+    results = Fit.fit_models(t, x, y, **{"starts_number": 4, "seed": 0, "steps": STEPS})
+
+    assert [result.model for result in results][0] == model
+    assert results[0].cost < 1e-6 * results[1].cost
+
+
+def test_intervals_cover_parameters_of_noisy_series():
+    parameters = 100, 0, 1, 0, 80, 0, 0.6, 0
+    t, x, y = series(parameters, Solver.REGULAR, 0.02, 40)
+    random = np.random.default_rng(1)
+    x, y = x + random.normal(0, 0.5, len(x)), y + random.normal(0, 0.5, len(y))
+
+    result = Fit.fit(t, x, y, Solver.REGULAR, **{"fixed": ("alpha1", "gamma1", "alpha2", "gamma2"),
+                                                 "initial": np.zeros(8), "starts_number": 8, "seed": 0,
+                                                 "steps": STEPS})
+
+    free = result.free
+    assert ((result.intervals[free, 0] <= np.array(parameters)[free]) &
+            (np.array(parameters)[free] <= result.intervals[free, 1])).all()
+    # При шуме 0.5 на 80 наблюдениях ошибки параметров - меньше процента-двух
+    assert (result.errors[free] < 0.02 * np.array(parameters)[free]).all()
+    np.testing.assert_allclose(result.rmse(), 0.5, rtol=0.3)
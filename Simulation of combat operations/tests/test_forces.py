@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import Forces
+import Solver
+
+
+PAIRS = [((100, 0, 1, 0, 80, 0, 1, 0), Solver.REGULAR), ((500, 0.1, 1, 20, 400, 0.1, 1, 10), Solver.REGULAR),
+         ((100, 0.01, 1, 2, 80, 0.02, 0.01, 5), Solver.PARTISAN), ((100, 0, 0.5, 0, 30, 0, 0.005, 0), Solver.PARTISAN)]
+
+# Две стороны первой коалиции против одной стороны второй, у всех прицельный огонь
+THREE = {"N0": (120, 80, 100), "alpha": 0, "gamma": 0, "sides": (1, 1, 2),
+         "beta": np.array(((0, 0, 1), (0, 0, 1), (1, 1, 0)))}
+
+
+@pytest.mark.parametrize("parameters, model", PAIRS)
+def test_pair_matches_solver(parameters, model):
+    x, y, t = Solver.solve(*parameters, **{"model": model, "method": Solver.ADAPTIVE})
+    battle = Forces.solve(**Forces.pair(parameters, model), **{"method": Solver.ADAPTIVE})
+
+    assert battle.winner == (1 if x[-1] > 0 else 2)
+    np.testing.assert_allclose(battle.end, t[-1], rtol=1e-6)
+    np.testing.assert_allclose(battle.N[-1], (x[-1], y[-1]), rtol=1e-5)
+
+    # В Solver y[n+1] считается по уже обновленному x[n+1], здесь - обе стороны по N[n]: расхождение O(tau)
+    x, y, t = Solver.solve(*parameters, **{"model": model, "method": Solver.EULER, "tau": 1e-4})
+    battle = Forces.solve(**Forces.pair(parameters, model), **{"method": Solver.EULER, "tau": 1e-4})
+
+    assert battle.winner == (1 if x[-1] > 0 else 2)
+    np.testing.assert_allclose(battle.end, t[-1], rtol=1e-3)
+    np.testing.assert_allclose(battle.N[-1], (x[-1], y[-1]), rtol=1e-2)
+
+
+@pytest.mark.parametrize("parameters, model", PAIRS)
+def test_blocks_match_single_steps(parameters, model):
+    system = Forces.System(**Forces.pair(parameters, model))
+
+    N, t = Forces.euler(system, 1e-3, 1e-2, Solver.HORIZON, Solver.STEADY)
+    expected_N, expected_t = Forces.stepwise(system, 1e-3, 1e-2, Solver.HORIZON, Solver.STEADY)
+
+    assert N.shape == expected_N.shape
+    np.testing.assert_allclose(t, expected_t, rtol=1e-9)
+    np.testing.assert_allclose(N, expected_N, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("method, rtol", [(Solver.ADAPTIVE, 1e-6), (Solver.EULER, 1e-3)])
+def test_three_forces_conserve_totals(method, rtol):
+    battle = Forces.solve(**THREE, **{"method": method, "tau": 1e-4})
+    N = battle.N[:-1]
+
+    # Обе стороны первой коалиции теряют одинаково, а по закону квадратов S^2 - 2 N2^2 не меняется, S = N0 + N1
+    np.testing.assert_allclose(N[:, 0] - N[:, 1], 40, rtol=1e-9)
+    np.testing.assert_allclose((N[:, 0] + N[:, 1]) ** 2 - 2 * N[:, 2] ** 2, 200 ** 2 - 2 * 100 ** 2, rtol=rtol)
+
+    assert battle.winner == 1
+    assert battle.N[-1, 2] == 0
+    np.testing.assert_allclose(battle.N[-1, :2].sum(), np.sqrt(200 ** 2 - 2 * 100 ** 2 + 2), rtol=rtol)
+
+
+def test_defeated_side_drops_out():
+    # Третья сторона слабее всех и выбывает первой, после чего бой продолжают двое
+    battle = Forces.solve(**{"N0": (100, 90, 20), "alpha": 0, "gamma": 0, "method": Solver.EULER, "tau": 1e-3,
+                             "beta": np.array(((0, 1, 1), (1, 0, 1), (1, 1, 0))) * 0.01})
+
+    third = int(np.argmax(battle.N[:, 2] == 0))
+    assert 0 < third < len(battle.N) - 1
+    assert (battle.N[third:, 2] == 0).all() and (battle.N[third, :2] >= 1).all()
+    assert battle.winner == 1
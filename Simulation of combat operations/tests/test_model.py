@@ -0,0 +1,22 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+import GameGUI
+import Model
+
+
+def test_army_keeps_only_drawable_soldiers():
+    display = pygame.Surface((1000, 600))
+    army = Model.Army(display, (0, 99, 200, 299), "", Model.Soldier(display, 0, 0, GameGUI.BLUE, 20), 10, GameGUI.BLUE)
+
+    # Численность может быть любой, но рисуется не больше detail солдат и по точке на пиксель области
+    army.number = 10 ** 8
+    army.moved = None
+    army.update()
+    army.draw()
+
+    assert army.number == 10 ** 8
+    assert len(army.x) == len(army.y) == army.shown() == Model.Army.DETAIL + 100 * 100
@@ -0,0 +1,75 @@
+import threading
+import time
+
+import numpy as np
+
+import Outcome
+import Solver
+
+
+# Партизанский бой, в котором на карте побеждают обе стороны
+RATES = (0, 0.5, 0, 0, 0.005, 0)
+
+
+def wait(outcomes, timeout=60):
+    deadline = time.monotonic() + timeout
+    while outcomes.busy():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_refine_does_not_block_and_tiles_match_batch(monkeypatch):
+    release = threading.Event()
+    batch = Solver.batch
+
+    # Пакет ждет разрешения теста, как долгий расчет, который иначе держал бы окно
+    def held(*args, **kwargs):
+        assert release.wait(60)
+        return batch(*args, **kwargs)
+
+    monkeypatch.setattr(Solver, "batch", held)
+
+    outcomes = Outcome.OutcomeMap(RATES, Solver.PARTISAN, (40, 40), resolution=64, **{"horizon": Solver.HORIZON})
+    view = 0, 40, 0, 40
+
+    start = time.monotonic()
+    outcomes.refine(view)
+    assert time.monotonic() - start < 0.5
+    assert outcomes.busy()
+
+    # Пока ничего не посчитано, карта пуста
+    end, winner = outcomes.sample(view, 32, 32)
+    assert (winner == -1).all() and np.isinf(end).all()
+
+    release.set()
+    wait(outcomes)
+
+    assert {key[0] for key in outcomes.tiles} == set(range(outcomes.level(view) + 1))
+    for (level, i, j), (end, winner) in outcomes.tiles.items():
+        cells = outcomes.cells(level)
+        x = (np.arange(i * Outcome.TILE, (i + 1) * Outcome.TILE) + 0.5) * 40 / cells
+        y = (np.arange(j * Outcome.TILE, (j + 1) * Outcome.TILE) + 0.5) * 40 / cells
+        x, y = np.meshgrid(x, y, indexing="ij")
+
+        parameters = np.empty((x.size, 8))
+        parameters[:, 0], parameters[:, 4] = x.ravel(), y.ravel()
+        parameters[:, [1, 2, 3, 5, 6, 7]] = RATES
+        result = batch(parameters, Solver.PARTISAN, horizon=Solver.HORIZON)
+
+        np.testing.assert_array_equal(winner.ravel(), result.winner)
+        np.testing.assert_allclose(end.ravel(), result.end, rtol=1e-4)
+
+    end, winner = outcomes.sample(view, 32, 32)
+    assert (winner >= 0).all() and {1, 2} <= set(np.unique(winner))
+
+
+def test_new_request_cancels_previous_one():
+    outcomes = Outcome.OutcomeMap((0, 1, 0, 0, 1, 0), extent=(100, 100), resolution=64)
+
+    outcomes.refine((0, 100, 0, 100))
+    outcomes.refine((0, 50, 0, 50))
+    wait(outcomes)
+
+    view = 0, 50, 0, 50
+    assert not outcomes.missing([key for level in range(outcomes.level(view) + 1)
+                                 for key in outcomes.covering(level, view)])
@@ -0,0 +1,172 @@
+import numpy as np
+import pytest
+
+import Solver
+
+
+def loop(x0, alpha1, beta1, gamma1, y0, alpha2, beta2, gamma2, model, tau, steps):
+    """Исходный пошаговый цикл ModelType.solveODE_1 и solveODE_2, остановленный не позже steps шагов"""
+
+    t, x, y = [0], [x0], [y0]
+
+    while len(t) <= steps:
+        t.append(t[-1] + tau)
+
+        x.append(x[-1] + (-alpha1 * x[-1] - beta1 * y[-1] + gamma1) * tau)
+        fire = x[-1] * y[-1] if model == Solver.PARTISAN else x[-1]
+        y.append(y[-1] + (-alpha2 * y[-1] - beta2 * fire + gamma2) * tau)
+
+        if x[-1] < 1 or y[-1] < 1:
+            if x[-1] < 1:
+                x[-1] = 0
+            if y[-1] < 1:
+                y[-1] = 0
+            break
+
+    return np.array(x), np.array(y), np.array(t)
+
+
+REGULAR_SCENARIOS = [
+    (100, 0, 1, 0, 80, 0, 1, 0),
+    (1000, 0.01, 0.02, 0, 990, 0.01, 0.02, 0),
+    (1000, 0.1, 0.5, 200, 900, 0.1, 0.5, 250),
+    (300, 0.3, 0.1, 5, 500, 0.05, 0.2, 40),
+]
+PARTISAN_SCENARIOS = [
+    (100, 0, 1, 0, 80, 0, 0.01, 0),
+    (1000, 0.01, 0.02, 0, 990, 0.01, 0.0002, 0),
+    (1000, 0.1, 0.5, 200, 900, 0.1, 0.005, 250),
+    (500, 0.05, 0.3, 10, 300, 0.02, 0.002, 5),
+]
+
+
+@pytest.mark.parametrize("model, parameters", [(Solver.REGULAR, p) for p in REGULAR_SCENARIOS] +
+                                              [(Solver.PARTISAN, p) for p in PARTISAN_SCENARIOS])
+def test_euler_matches_loop(model, parameters):
+    tau = 1e-4
+    x, y, t = Solver.euler(*parameters, model=model, tau=tau, horizon=5)
+    x_loop, y_loop, t_loop = loop(*parameters, model, tau, len(t) - 1)
+
+    assert len(t) == len(t_loop)
+    np.testing.assert_allclose(t, t_loop, rtol=1e-9)
+    np.testing.assert_allclose(x, x_loop, rtol=1e-8, atol=1e-8)
+    np.testing.assert_allclose(y, y_loop, rtol=1e-8, atol=1e-8)
+
+
+# Одна из сторон с самого начала меньше 1: бой должен закончиться сразу, а не "до начала"
+BELOW_ONE = [
+    (Solver.REGULAR, (100, 0, 1, 0, 0.5, 0, 0.02, 0)),
+    (Solver.REGULAR, (0, 0, 1, 0, 80, 0, 1, 0)),
+    (Solver.PARTISAN, (0.5, 0, 1, 0, 80, 0, 0.01, 0)),
+    (Solver.PARTISAN, (100, 0, 1, 0, 0, 0, 0.01, 0)),
+]
+
+
+@pytest.mark.parametrize("model, parameters", BELOW_ONE)
+def test_adaptive_matches_euler_when_a_side_starts_below_one(model, parameters):
+    tau = 1e-5
+    euler = Solver.battle(parameters, model, Solver.EULER, tau=tau)
+    adaptive = Solver.battle(parameters, model, Solver.ADAPTIVE)
+    streamed = [np.concatenate(column) for column in zip(*Solver.stream(*parameters, model=model,
+                                                                        method=Solver.ADAPTIVE))]
+
+    assert np.all(adaptive.t >= 0) and np.all(streamed[2] >= 0)
+    assert abs(adaptive.end - euler.end) <= tau and abs(streamed[2][-1] - euler.end) <= tau
+    assert adaptive.winner == euler.winner != 0
+    assert (adaptive.x[-1], adaptive.y[-1]) == (streamed[0][-1], streamed[1][-1])
+    np.testing.assert_allclose((adaptive.x[-1], adaptive.y[-1]), (euler.x[-1], euler.y[-1]), rtol=1e-6)
+
+
+@pytest.mark.parametrize("parameters", REGULAR_SCENARIOS + [p for model, p in BELOW_ONE if model == Solver.REGULAR])
+def test_analytic_is_a_reference_for_numeric_methods(parameters):
+    analytic = Solver.battle(parameters, Solver.REGULAR, Solver.ANALYTIC)
+    adaptive = Solver.battle(parameters, Solver.REGULAR, Solver.ADAPTIVE)
+    euler = Solver.battle(parameters, Solver.REGULAR, Solver.EULER, tau=1e-4)
+
+    assert np.all(np.isfinite(analytic.x)) and np.all(np.isfinite(analytic.y))
+    assert analytic.winner == adaptive.winner == euler.winner
+    assert abs(adaptive.end - analytic.end) <= 1e-6 * (1 + analytic.end)
+    assert abs(euler.end - analytic.end) <= 1e-3 * (1 + analytic.end)
+    np.testing.assert_allclose((adaptive.x[-1], adaptive.y[-1]), (analytic.x[-1], analytic.y[-1]), rtol=1e-5, atol=1e-5)
+
+    # Точная формула в точках, посчитанных адаптивным методом
+    x, y, t = Solver.analytic(*parameters, t_eval=adaptive.t[:-1])
+    np.testing.assert_allclose(x, adaptive.x[:len(t)], rtol=1e-6, atol=1e-6)
+    np.testing.assert_allclose(y, adaptive.y[:len(t)], rtol=1e-6, atol=1e-6)
+
+
+def test_every_method_stops_at_steady_state():
+    # Подкрепления уравновешивают потери: бой не заканчивается, а приходит в равновесие задолго до HORIZON
+    parameters = (100, 0.1, 0.01, 5, 80, 0.1, 0.01, 5)
+    euler = Solver.battle(parameters, Solver.REGULAR, Solver.EULER, tau=1e-4)
+    streamed = np.concatenate(list(zip(*Solver.stream(*parameters, method=Solver.ANALYTIC)))[2])
+
+    for method in (Solver.ADAPTIVE, Solver.ANALYTIC):
+        battle = Solver.battle(parameters, Solver.REGULAR, method)
+        assert battle.winner == euler.winner == 0
+        assert abs(battle.end - euler.end) <= 0.1 * euler.end < Solver.HORIZON / 5
+        np.testing.assert_allclose((battle.x[-1], battle.y[-1]), (euler.x[-1], euler.y[-1]), rtol=1e-4)
+
+    assert streamed[-1] == Solver.battle(parameters, Solver.REGULAR, Solver.ANALYTIC).end
+
+
+@pytest.mark.parametrize("method", [Solver.EULER, Solver.ADAPTIVE, Solver.ANALYTIC])
+@pytest.mark.parametrize("options", [{}, {"step": 0.01}])
+def test_branch_at_or_after_the_end_of_the_parent(method, options):
+    parent = Solver.battle((100, 0, 1, 0, 80, 0, 1, 0), Solver.REGULAR, method, tau=1e-4)
+
+    # Контрольная точка - конец боя: продолжать нечего, ветвь заканчивается там же, где родитель
+    for time in (parent.end, parent.end + 5):
+        branch = Solver.branch(parent, time, (0, 1, 0, 0, 0.5, 0), **options)
+
+        assert np.all(np.isfinite(branch.x)) and np.all(np.isfinite(branch.y))
+        assert np.all(branch.t >= parent.end) and branch.end == parent.end
+        assert (branch.x[-1], branch.y[-1], branch.winner) == (parent.x[-1], parent.y[-1], parent.winner)
+
+
+def random_scenarios(rng, m, model):
+    """Случайные сценарии: численности 50-1000, с потерями, огнем и подкреплениями"""
+
+    fire = 0.01 if model == Solver.PARTISAN else 1
+    return np.column_stack([rng.uniform(50, 1000, m), rng.uniform(0, 0.1, m), rng.uniform(0.1, 1, m),
+                            rng.uniform(0, 50, m), rng.uniform(50, 1000, m), rng.uniform(0, 0.1, m),
+                            rng.uniform(0.1, 1, m) * fire, rng.uniform(0, 50, m)])
+
+
+@pytest.mark.parametrize("model", [Solver.REGULAR, Solver.PARTISAN])
+def test_batch_matches_adaptive(model):
+    parameters = random_scenarios(np.random.default_rng(1), 100, model)
+    # Медленный бой заканчивается после t=100, но задолго до HORIZON: это победа, а не ничья
+    parameters[0] = (100, 0, 0.002, 0, 80, 0, 0.0001 if model == Solver.PARTISAN else 0.002, 0)
+    result = Solver.batch(parameters, model)
+
+    for i, scenario in enumerate(parameters):
+        battle = Solver.battle(scenario, model, Solver.ADAPTIVE)
+        assert result.winner[i] == battle.winner
+        if np.isfinite(result.end[i]):
+            assert abs(result.end[i] - battle.end) <= 1e-4 * (1 + battle.end)
+        else:
+            assert battle.winner == 0
+
+
+@pytest.mark.parametrize("method", [Solver.EULER, Solver.ADAPTIVE, Solver.ANALYTIC])
+@pytest.mark.parametrize("options", [{}, {"step": 0.01}])
+def test_branch_of_a_branch(method, options):
+    parent = Solver.battle((100, 0, 1, 0, 80, 0, 1, 0), Solver.REGULAR, method, tau=1e-4)
+    first = Solver.branch(parent, 0.4, (0, 0.5, 0, 0, 1, 0), **options)
+
+    trajectory = Solver.Trajectory()
+    second = Solver.branch(first, 0.7, (0, 1, 0, 0, 0.5, 0), trajectory=trajectory, **options)
+
+    # Контрольная точка - в самой ветви first, время в буфере - от начала боя
+    assert second.parent is first and second.t[0] == first.t[first.checkpoint(0.7)]
+    assert 0.6 < second.t[0] <= 0.7 and np.all(np.diff(second.t) >= 0)
+    np.testing.assert_array_equal(trajectory.result()[2], second.t)
+
+    t = np.concatenate([part[2] for part in second.parts()])
+    assert t[0] == 0 and np.all(np.diff(t) >= 0) and t[-1] == second.end
+    assert second.winner == 1
+
+    # До начала ветви - ветвь того боя, от которого она отходит
+    earlier = Solver.branch(first, 0.2, (0, 1, 0, 0, 0.5, 0), **options)
+    assert earlier.parent is parent and earlier.t[0] <= 0.2
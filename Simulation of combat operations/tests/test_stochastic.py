@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+import Solver
+import Stochastic
+
+
+METHODS = [Stochastic.GILLESPIE, Stochastic.TAU_LEAPING]
+MODELS = [Solver.REGULAR, Solver.PARTISAN]
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("model", MODELS)
+@pytest.mark.parametrize("y0", [0, 0.3])
+def test_side_missing_at_the_start_loses_at_once(method, model, y0):
+    result = Stochastic.ensemble((100, 0, 1, 0, y0, 0, 0.01, 0), model, method, replicas=20, seed=1)
+
+    assert np.all(result.end == 0) and np.all(result.winner == 1)
+    assert np.all(result.x == 100) and np.all(result.y == 0)
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_fixed_seed_is_reproducible(method):
+    parameters = (100, 0.01, 1, 2, 90, 0.01, 1, 3)
+    first, second, other = (Stochastic.ensemble(parameters, Solver.REGULAR, method, replicas=200, seed=seed)
+                            for seed in (7, 7, 8))
+
+    for name in ("end", "winner", "x", "y"):
+        np.testing.assert_array_equal(getattr(first, name), getattr(second, name))
+    assert not np.array_equal(first.end, other.end)
+
+
+@pytest.mark.parametrize("method, tolerance", [(Stochastic.GILLESPIE, 0.01), (Stochastic.TAU_LEAPING, 0.03)])
+@pytest.mark.parametrize("model, parameters", [(Solver.REGULAR, (10000, 0, 1, 0, 8000, 0, 1, 0)),
+                                               (Solver.PARTISAN, (10000, 0, 1, 0, 8000, 0, 0.0001, 0))])
+def test_large_forces_follow_the_equations_on_average(method, tolerance, model, parameters):
+    battle = Solver.battle(parameters, model, Solver.ADAPTIVE)
+    result = Stochastic.ensemble(parameters, model, method, replicas=100, seed=1)
+
+    assert np.all(result.winner == battle.winner)
+    assert abs(result.end.mean() - battle.end) <= tolerance * battle.end
+    np.testing.assert_allclose((result.x.mean(), result.y.mean()), (battle.x[-1], battle.y[-1]), rtol=tolerance, atol=1)
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+import Solver
+import Store
+
+
+def test_saved_battle_is_read_back_from_the_file(tmp_path):
+    path = str(tmp_path / "battle.run")
+    battle = Solver.battle((100, 0, 1, 0, 80, 0, 1, 0), Solver.REGULAR, Solver.EULER, tau=1e-4)
+
+    Store.save(path, battle, {"tau": 1e-4})
+    loaded = Store.load(path)
+
+    assert all(isinstance(column, np.memmap) for column in (loaded.x, loaded.y, loaded.t))
+    np.testing.assert_array_equal(loaded.t, battle.t)
+    np.testing.assert_array_equal(loaded.x, battle.x)
+    np.testing.assert_array_equal(loaded.y, battle.y)
+    assert (tuple(loaded.parameters), loaded.model, loaded.method) == (battle.parameters, battle.model, battle.method)
+    assert (loaded.end, loaded.winner) == (battle.end, battle.winner)
+    assert Store.header(path)["settings"] == {"tau": 1e-4}
+
+
+def test_columns_are_converted_and_foreign_files_rejected(tmp_path):
+    path = str(tmp_path / "battle.run")
+    battle = Solver.battle((100, 0, 1, 0, 80, 0, 1, 0), Solver.REGULAR, Solver.ANALYTIC)
+
+    Store.save(path, battle, dtype=np.float32)
+    loaded = Store.load(path)
+    assert loaded.t.dtype == np.float32
+    np.testing.assert_allclose(loaded.x, battle.x, rtol=1e-6)
+
+    (tmp_path / "other.run").write_bytes(b"not a battle" * 1000)
+    with pytest.raises(ValueError):
+        Store.load(str(tmp_path / "other.run"))
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pytest
+
+import Solver
+import Sweep
+
+
+def write_scenarios(path, rows):
+    path.write_text("model," + ",".join(Solver.PARAMETERS) + "\n" +
+                    "".join(model + "," + ",".join(map(str, parameters)) + "\n" for model, parameters in rows),
+                    encoding="utf-8")
+
+
+SCENARIOS = [(Solver.REGULAR, (100, 0, 1, 0, 80, 0, 1, 0)), (Solver.PARTISAN, (100, 0, 1, 0, 80, 0, 0.01, 0)),
+             ("", (90, 0, 1, 0, 100, 0, 1, 0))]
+
+
+def test_unknown_model_is_rejected_with_its_line(tmp_path):
+    source = tmp_path / "scenarios.csv"
+    write_scenarios(source, SCENARIOS + [("partizan", (100, 0, 1, 0, 80, 0, 1, 0))])
+
+    with pytest.raises(ValueError, match="строка 5.*partizan"):
+        Sweep.read_scenarios(str(source))
+
+
+def test_sweep_matches_gui_solver_and_refuses_foreign_parts(tmp_path):
+    source, output = tmp_path / "scenarios.csv", str(tmp_path / "outcomes.npz")
+    write_scenarios(source, SCENARIOS)
+
+    Sweep.sweep(str(source), output, tau=1e-4, chunk_size=2, workers=1)
+    result = np.load(output)
+
+    for i, (model, parameters) in enumerate(SCENARIOS):
+        battle = Solver.battle(parameters, model or Solver.REGULAR, tau=1e-4)
+        assert result["end"][i] == battle.end and result["winner"][i] == battle.winner
+
+    # Каталог частей прерванного расчета с другим размером части: продолжать его нельзя
+    directory = output + ".parts"
+    os.makedirs(directory)
+    Sweep.check_manifest(directory, Sweep.manifest(*Sweep.read_scenarios(str(source)), Solver.METHOD, 1e-4,
+                                                   Solver.HORIZON, 2))
+
+    with pytest.raises(ValueError, match="chunk-size"):
+        Sweep.sweep(str(source), output, tau=1e-4, chunk_size=3, workers=1)
+
+
+@pytest.mark.parametrize("name", ["outcomes.npz", "outcomes.csv"])
+def test_empty_scenarios_give_empty_columns(tmp_path, name):
+    source, output = tmp_path / "scenarios.csv", str(tmp_path / name)
+    write_scenarios(source, [])
+
+    Sweep.sweep(str(source), output, workers=1)
+
+    if name.endswith(".npz"):
+        result = np.load(output)
+        assert len(result["index"]) == len(result["end"]) == len(result[Solver.PARAMETERS[0]]) == 0
+    else:
+        assert open(output, encoding="utf-8").read().splitlines() == [",".join(Sweep.COLUMNS)]
+
+
+def test_finished_chunks_reach_the_output_during_the_sweep(tmp_path, monkeypatch):
+    source, output = tmp_path / "scenarios.csv", str(tmp_path / "outcomes.npz")
+    write_scenarios(source, SCENARIOS)
+
+    written = []
+    write_output = Sweep.write_output
+    monkeypatch.setattr(Sweep, "FLUSH", 0)
+    monkeypatch.setattr(Sweep, "write_output", lambda path, columns: (written.append(list(columns["index"])),
+                                                                      write_output(path, columns)))
+
+    Sweep.sweep(str(source), output, tau=1e-4, chunk_size=1, workers=1)
+
+    # Пока идет расчет, в файле - исходы уже готовых сценариев по порядку номеров
+    assert [len(index) for index in written] == [1, 2, 3]
+    assert all(index == sorted(index) for index in written)
+    assert list(np.load(output)["index"]) == [0, 1, 2]